@@ -0,0 +1,967 @@
+const SITE_CONFIG = {"workerFile": "catalog-worker.js", "serviceWorkerFile": "sw.js", "cardImage": {"width": 70, "height": 100}};
+let manifest = null;
+let translations = {};
+let sources = [];
+let productCategories = [];
+let saleProducts = [];
+let saleByName = new Map();
+const productsByName = new Map();
+const loadedShards = new Set();
+let shardObserver = null;
+let currentSort = 'latest_price';
+let favorites = [];
+let favoriteShards = {};
+let carouselPosition = 0;
+let touchStartX = 0;
+let touchEndX = 0;
+let activeStores = new Set();
+let activeProductCategories = new Set();
+let currentLang = 'et';
+let lastScrollTop = 0;
+let scrollTimeout;
+let ticking = false;
+function setLanguage(lang) {
+currentLang = lang;
+localStorage.setItem('priceTrackerLang', lang);
+document.querySelectorAll('.lang-btn').forEach(btn => {
+btn.classList.toggle('active', btn.dataset.lang === lang);
+});
+document.querySelectorAll('[data-i18n]').forEach(el => {
+const key = el.dataset.i18n;
+if (translations[lang] && translations[lang][key]) {
+el.textContent = translations[lang][key];
+}
+});
+document.querySelectorAll('[data-i18n-placeholder]').forEach(el => {
+const key = el.dataset.i18nPlaceholder;
+if (translations[lang] && translations[lang][key]) {
+el.placeholder = translations[lang][key];
+}
+});
+render();
+}
+function t(key) {
+return translations[currentLang] && translations[currentLang][key]
+? translations[currentLang][key]
+: key;
+}
+function loadLanguage() {
+const savedLang = localStorage.getItem('priceTrackerLang');
+if (savedLang && translations[savedLang]) {
+setLanguage(savedLang);
+} else {
+setLanguage('et');
+}
+}
+function getDisplayStoreName(store) {
+return store === 'Barbora' ? 'Maxima' : store;
+}
+function dataUrl(path) {
+return `data/${path}?v=${manifest.version}`;
+}
+async function fetchJson(path) {
+const response = await fetch(dataUrl(path));
+if (!response.ok) throw new Error(`${path}: HTTP ${response.status}`);
+return response.json();
+}
+let catalogWorker = null;
+let catalogHandle = null;
+let catalogFallback = null;
+let catalogSeq = 0;
+const catalogPending = new Map();
+function catalogRequest(type, payload = {}) {
+return new Promise((resolve, reject) => {
+const message = { id: ++catalogSeq, type, payload };
+catalogPending.set(message.id, { message, resolve, reject });
+if (catalogHandle) catalogHandle(message);
+else if (catalogWorker) catalogWorker.postMessage(message);
+});
+}
+function onCatalogMessage({ id, result, error, shards }) {
+Object.entries(shards || {}).forEach(([file, list]) => registerShard(file, list));
+const pending = catalogPending.get(id);
+if (!pending) return;
+catalogPending.delete(id);
+if (error) pending.reject(new Error(error));
+else pending.resolve(result);
+}
+function registerShard(file, list) {
+list.forEach(p => productsByName.set(p.name, p));
+loadedShards.add(file);
+}
+function startCatalog() {
+const url = `${SITE_CONFIG.workerFile}?v=${manifest.version}`;
+try {
+catalogWorker = new Worker(url);
+catalogWorker.onmessage = event => onCatalogMessage(event.data);
+catalogWorker.onerror = () => runCatalogInPage(url);
+} catch (err) {
+runCatalogInPage(url);
+}
+return catalogRequest('init', { version: manifest.version, shards: manifest.shards });
+}
+function runCatalogInPage(url) {
+if (catalogFallback) return catalogFallback;
+if (catalogWorker) catalogWorker.terminate();
+catalogWorker = null;
+catalogFallback = new Promise(resolve => {
+const script = document.createElement('script');
+script.src = url;
+script.onload = () => {
+catalogHandle = createCatalog(message => onCatalogMessage(message));
+catalogPending.forEach(({ message }) => catalogHandle(message));
+resolve();
+};
+document.head.appendChild(script);
+});
+return catalogFallback;
+}
+function catalogFilters(filters = currentFilters()) {
+return {
+...filters,
+stores: [...activeStores],
+categories: [...activeProductCategories],
+favorites,
+sort: currentSort
+};
+}
+function loadShards(shards) {
+const files = shards.filter(s => !loadedShards.has(s.file)).map(s => s.file);
+return files.length ? catalogRequest('load', { files }) : Promise.resolve();
+}
+function isLoaded(shards) {
+return shards.every(s => loadedShards.has(s.file));
+}
+function activeShards() {
+return manifest.shards.filter(s => activeStores.has(s.store));
+}
+function findProduct(name) {
+return productsByName.get(name) || saleByName.get(name);
+}
+function favoriteShardList() {
+if (favorites.some(name => !(name in favoriteShards))) return manifest.shards;
+const files = new Set(favorites.map(name => favoriteShards[name]));
+return manifest.shards.filter(s => files.has(s.file));
+}
+async function loadFavoriteShards() {
+if (favorites.length === 0) return;
+await loadShards(favoriteShardList());
+let changed = false;
+favorites.forEach(name => {
+if (name in favoriteShards) return;
+const p = findProduct(name);
+favoriteShards[name] = p ? p.shard : null;
+changed = true;
+});
+if (changed) saveFavorites();
+}
+function toggleMenu() {
+const sidebar = document.getElementById('sidebar');
+const overlay = document.getElementById('sidebar-overlay');
+const hamburger = document.getElementById('hamburger');
+sidebar.classList.toggle('active');
+overlay.classList.toggle('active');
+hamburger.classList.toggle('active');
+}
+function toggleCategories() {
+const categoriesDiv = document.getElementById('product-categories');
+const arrow = document.getElementById('categories-arrow');
+categoriesDiv.classList.toggle('collapsed');
+arrow.textContent = categoriesDiv.classList.contains('collapsed') ? '▶' : '▼';
+}
+function handleTouchStart(e) { touchStartX = e.touches[0].clientX; }
+function handleTouchMove(e) { touchEndX = e.touches[0].clientX; }
+function handleTouchEnd() {
+const swipeThreshold = 50;
+const diff = touchStartX - touchEndX;
+if (Math.abs(diff) > swipeThreshold) {
+if (diff > 0) { moveCarousel(1); } else { moveCarousel(-1); }
+}
+touchStartX = 0;
+touchEndX = 0;
+}
+function initCarouselTouch() {
+const carouselContainer = document.querySelector('.carousel-container');
+if (carouselContainer) {
+carouselContainer.addEventListener('touchstart', handleTouchStart, { passive: true });
+carouselContainer.addEventListener('touchmove', handleTouchMove, { passive: true });
+carouselContainer.addEventListener('touchend', handleTouchEnd);
+}
+}
+function loadFavorites() {
+const stored = localStorage.getItem('priceTrackerFavorites');
+if (stored) {
+try { favorites = JSON.parse(stored); }
+catch(e) { favorites = []; }
+}
+const storedShards = localStorage.getItem('priceTrackerFavoriteShards');
+if (storedShards) {
+try { favoriteShards = JSON.parse(storedShards); }
+catch(e) { favoriteShards = {}; }
+}
+}
+function saveFavorites() {
+localStorage.setItem('priceTrackerFavorites', JSON.stringify(favorites));
+localStorage.setItem('priceTrackerFavoriteShards', JSON.stringify(favoriteShards));
+}
+function toggleFavorite(productName, event) {
+event.preventDefault();
+event.stopPropagation();
+const index = favorites.indexOf(productName);
+if (index > -1) {
+favorites.splice(index, 1);
+delete favoriteShards[productName];
+} else {
+favorites.push(productName);
+const p = findProduct(productName);
+if (p) favoriteShards[productName] = p.shard;
+}
+saveFavorites();
+grids.forEach(grid => grid.invalidate(productName));
+render();
+return false;
+}
+function moveCarousel(direction) {
+const track = document.querySelector('.carousel-track');
+const cards = document.querySelectorAll('.carousel-card');
+if (!track || cards.length === 0) return;
+const firstCard = cards[0];
+const cardWidth = firstCard.offsetWidth + 15;
+carouselPosition += direction;
+const containerWidth = track.parentElement.offsetWidth;
+const visibleCards = Math.floor(containerWidth / cardWidth) || 1;
+const maxPosition = Math.max(0, cards.length - visibleCards);
+carouselPosition = Math.max(0, Math.min(carouselPosition, maxPosition));
+track.style.transform = `translateX(-${carouselPosition * cardWidth}px)`;
+const leftBtn = document.querySelector('.carousel-btn-left');
+const rightBtn = document.querySelector('.carousel-btn-right');
+if (leftBtn) leftBtn.disabled = carouselPosition === 0;
+if (rightBtn) rightBtn.disabled = carouselPosition >= maxPosition;
+}
+function filterByStore() {
+const checkboxes = document.querySelectorAll('input[data-store]');
+activeStores.clear();
+checkboxes.forEach(cb => {
+if (cb.checked) activeStores.add(cb.dataset.store);
+});
+render();
+}
+function filterByProductCategory() {
+const checkboxes = document.querySelectorAll('input[data-product-category]');
+activeProductCategories.clear();
+checkboxes.forEach(cb => {
+if (cb.checked) activeProductCategories.add(cb.dataset.productCategory);
+});
+render();
+}
+function applyFilters() { render(); }
+function setSort(key){
+currentSort = key;
+document.querySelectorAll('.btn').forEach(b=>b.classList.remove('btn-active'));
+document.getElementById(key==='latest_price'?'sort-total':'sort-unit').classList.add('btn-active');
+render();
+}
+function getActiveFilters() {
+const filters = {};
+const allCatsSelected = activeProductCategories.size === productCategories.length;
+if (!allCatsSelected && activeProductCategories.size > 0) {
+filters.categories = Array.from(activeProductCategories);
+}
+const allStores = new Set(sources.map(s => s.store));
+const allStoresSelected = activeStores.size === allStores.size;
+if (!allStoresSelected && activeStores.size > 0) {
+filters.stores = Array.from(activeStores);
+}
+filters.favorites = document.getElementById('filter-favorites')?.checked || false;
+filters.sales = document.getElementById('filter-sales')?.checked || false;
+return filters;
+}
+function removeFilter(type, value) {
+if (type === 'category') {
+activeProductCategories.delete(value);
+const checkbox = document.querySelector(`input[data-product-category="${value}"]`);
+if (checkbox) checkbox.checked = false;
+} else if (type === 'store') {
+activeStores.delete(value);
+const checkbox = document.querySelector(`input[data-store="${value}"]`);
+if (checkbox) checkbox.checked = false;
+} else if (type === 'favorites') {
+const checkbox = document.getElementById('filter-favorites');
+if (checkbox) checkbox.checked = false;
+} else if (type === 'sales') {
+const checkbox = document.getElementById('filter-sales');
+if (checkbox) checkbox.checked = false;
+}
+render();
+if (document.getElementById('search').value.length >= 2) {
+handleSearch();
+}
+}
+function clearAllFilters() {
+document.getElementById('search').value = '';
+activeProductCategories = new Set(productCategories);
+document.querySelectorAll('input[data-product-category]').forEach(cb => cb.checked = true);
+const allStores = sources.map(s => s.store);
+activeStores = new Set(allStores);
+document.querySelectorAll('input[data-store]').forEach(cb => cb.checked = true);
+const favCheckbox = document.getElementById('filter-favorites');
+if (favCheckbox) favCheckbox.checked = false;
+const salesCheckbox = document.getElementById('filter-sales');
+if (salesCheckbox) salesCheckbox.checked = false;
+const searchTitle = document.getElementById('search-results-title');
+const content = document.getElementById('content');
+if (searchGrid) searchGrid.setItems([]);
+searchTitle.style.display = "none";
+content.style.display = "block";
+render();
+}
+function updateFilterIndicator(isSearchActive = false) {
+const indicator = document.getElementById('filter-indicator');
+const filters = getActiveFilters();
+const hasFilters = filters.categories || filters.stores || filters.favorites || filters.sales;
+if (!hasFilters && !isSearchActive) {
+indicator.classList.remove('show');
+return;
+}
+let html = isSearchActive ? `<strong>${t('searching_in')}:</strong> ` : `<strong>${t('active_filters')}:</strong> `;
+const tags = [];
+if (filters.categories) {
+tags.push(...filters.categories.map(c => {
+const escaped = c.replace(/'/g, "\\'");
+return `<span class="filter-tag">🏷️ ${c} <span class="filter-tag-remove" onclick="removeFilter('category', '${escaped}')">×</span></span>`;
+}));
+}
+if (filters.stores) {
+tags.push(...filters.stores.map(s => {
+const escaped = s.replace(/'/g, "\\'");
+const displayName = getDisplayStoreName(s);
+return `<span class="filter-tag">${displayName} <span class="filter-tag-remove" onclick="removeFilter('store', '${escaped}')">×</span></span>`;
+}));
+}
+if (filters.favorites) {
+tags.push(`<span class="filter-tag">⭐ ${t('favorites')} <span class="filter-tag-remove" onclick="removeFilter('favorites')">×</span></span>`);
+}
+if (filters.sales) {
+tags.push(`<span class="filter-tag">🔥 ${t('on_sale')} <span class="filter-tag-remove" onclick="removeFilter('sales')">×</span></span>`);
+}
+if (tags.length === 0 && isSearchActive) {
+html += `<span class="filter-tag">${t('all_products')}</span>`;
+} else {
+html += tags.join(' ');
+}
+if (hasFilters || isSearchActive) {
+html += `<button class="clear-all-btn" onclick="clearAllFilters()">${t('clear_all')}</button>`;
+}
+indicator.innerHTML = html;
+indicator.classList.add('show');
+}
+const historyBuckets = new Map();
+function loadHistory(p) {
+if (p.history_bucket === undefined) return Promise.resolve(p.entries || []);
+if (!historyBuckets.has(p.history_bucket)) {
+const request = fetchJson(`history/${p.history_bucket}.json`).catch(err => {
+historyBuckets.delete(p.history_bucket);
+console.error('Could not load price history', err);
+return {};
+});
+historyBuckets.set(p.history_bucket, request);
+}
+return historyBuckets.get(p.history_bucket).then(bucket => bucket[p.name] || p.entries || []);
+}
+async function showHistory(productName, event) {
+if (event.target.closest('.fav-btn')) return;
+const p = findProduct(productName);
+if (!p) return;
+const modal = document.getElementById('historyModal');
+document.getElementById('modalTitle').innerText = p.name;
+document.getElementById('modalImg').src = p.img;
+document.getElementById('modalCurrentPrice').innerText = `€${p.latest_price.toFixed(2)}`;
+renderPriceStats(p);
+renderComparison(p);
+document.getElementById('modalStoreLink').href = p.url;
+const storeLabel = document.getElementById('modalStore');
+storeLabel.className = `store-label-sm store-label-${p.store}`;
+storeLabel.innerText = getDisplayStoreName(p.store);
+renderHistoryRows(p.entries || []);
+modal.dataset.product = p.name;
+modal.style.display = 'flex';
+document.body.style.overflow = 'hidden';
+const entries = await loadHistory(p);
+if (modal.dataset.product === p.name) renderHistoryRows(entries);
+}
+function renderPriceStats(p) {
+const s = p.stats;
+document.getElementById('modalStats').textContent = s ? [
+`${t('typical_price')}: €${s.typical.toFixed(2)}`,
+`${t('lowest_price')}: €${s.low.toFixed(2)}`,
+`${t('days_at_price')}: ${Math.floor(s.days_at_price)}`,
+].join(' · ') : '';
+}
+function renderComparison(p) {
+const others = p.compare || [];
+document.getElementById('modalCompare').innerHTML = others.length ? `
+        <div class="compare-title">${t('other_stores')}</div>
+        ${others.map(o => `<div class="compare-row">
+            <span class="store-label-sm store-label-${o.store}">${getDisplayStoreName(o.store)}</span>
+            <span>€${(o.latest_price || 0).toFixed(2)}</span>
+        </div>`).join('')}` : '';
+}
+function renderHistoryRows(entries) {
+const reversedEntries = [...entries].reverse();
+document.getElementById('historyBody').innerHTML = reversedEntries.map((entry, index) => {
+const price = entry.p;
+const prevEntry = reversedEntries[index + 1];
+let priceClass = '';
+let indicator = '';
+if (prevEntry) {
+if (price > prevEntry.p) {
+priceClass = 'price-up';
+indicator = ' ▲';
+} else if (price < prevEntry.p) {
+priceClass = 'price-down';
+indicator = ' ▼';
+}
+}
+const timestamp = entry.t || entry.d;
+let formattedDate = 'Unknown';
+if (timestamp) {
+const date = new Date(timestamp);
+const day = String(date.getDate()).padStart(2, '0');
+const month = String(date.getMonth() + 1).padStart(2, '0');
+const year = date.getFullYear();
+formattedDate = `${day}-${month}-${year}`;
+}
+return `<tr>
+            <td>${formattedDate}</td>
+            <td class="${priceClass}">€${price.toFixed(2)}${indicator}</td>
+        </tr>`;
+}).join('');
+}
+function closeHistory() {
+const modal = document.getElementById('historyModal');
+delete modal.dataset.product;
+modal.style.display = 'none';
+document.body.style.overflow = 'auto';
+}
+window.onclick = function(event) {
+const modal = document.getElementById('historyModal');
+if (event.target == modal) closeHistory();
+}
+function currentFilters() {
+return {
+favoritesOnly: document.getElementById('filter-favorites')?.checked || false,
+salesOnly: document.getElementById('filter-sales')?.checked || false
+};
+}
+function categoryActive(p) {
+return !p.productCategory || activeProductCategories.has(p.productCategory);
+}
+function passesFilters(p, filters) {
+if (!activeStores.has(p.store)) return false;
+if (filters.favoritesOnly && !favorites.includes(p.name)) return false;
+if (filters.salesOnly && !p.on_sale) return false;
+return true;
+}
+const SEARCH_DEBOUNCE_MS = 150;
+let searchTimer = null;
+function scheduleSearch() {
+clearTimeout(searchTimer);
+searchTimer = setTimeout(handleSearch, SEARCH_DEBOUNCE_MS);
+}
+const CARD_HEIGHT = { desktop: 130, mobile: 140 };
+const GRID_GAP = { desktop: 15, mobile: 12 };
+const MIN_CARD_WIDTH = 300;
+const OVERSCAN_ROWS = 3;
+const SECTION_PREVIEW = 10;
+const SALES_PREVIEW = 3;
+const grids = new Set();
+class VirtualGrid {
+constructor(renderCard = card, el = document.createElement('div')) {
+this.el = el;
+this.el.classList.add('grid');
+this.renderCard = renderCard;
+this.items = [];
+this.limit = Infinity;
+this.nodes = new Map();
+this.window = null;
+grids.add(this);
+}
+setItems(items, limit = Infinity) {
+this.items = items;
+this.limit = limit;
+const names = new Set(items.map(p => p.name));
+this.nodes.forEach((_, name) => { if (!names.has(name)) this.nodes.delete(name); });
+this.window = null;
+this.update();
+}
+invalidate(name) {
+if (this.nodes.delete(name)) this.window = null;
+}
+metrics() {
+const mobile = window.innerWidth <= 768;
+const gap = mobile ? GRID_GAP.mobile : GRID_GAP.desktop;
+const rowHeight = (mobile ? CARD_HEIGHT.mobile : CARD_HEIGHT.desktop) + gap;
+const template = window.getComputedStyle(this.el).getPropertyValue('grid-template-columns');
+const columns = template && template !== 'none'
+? template.trim().split(/\s+/).length
+: Math.max(1, Math.floor((this.el.clientWidth + gap) / (MIN_CARD_WIDTH + gap)));
+return { columns, rowHeight };
+}
+update() {
+if (!this.el.isConnected) return;
+const count = Math.min(this.items.length, this.limit);
+const { columns, rowHeight } = this.metrics();
+const rows = Math.ceil(count / columns);
+const top = this.el.getBoundingClientRect().top;
+const first = Math.min(rows, Math.max(0, Math.floor(-top / rowHeight) - OVERSCAN_ROWS));
+const last = Math.min(rows, Math.max(first, Math.ceil((window.innerHeight - top) / rowHeight) + OVERSCAN_ROWS));
+const key = `${columns}:${first}:${last}:${count}`;
+if (this.window === key) return;
+this.window = key;
+const visible = this.items.slice(first * columns, Math.min(count, last * columns));
+this.el.style.paddingTop = `${first * rowHeight}px`;
+this.el.style.paddingBottom = `${(rows - last) * rowHeight}px`;
+this.el.replaceChildren(...visible.map(p => this.node(p)));
+}
+node(p) {
+let node = this.nodes.get(p.name);
+if (!node) {
+const holder = document.createElement('div');
+holder.innerHTML = this.renderCard(p);
+node = holder.firstElementChild;
+this.nodes.set(p.name, node);
+}
+return node;
+}
+}
+function refreshGrids(force = false) {
+grids.forEach(grid => {
+if (force) grid.window = null;
+grid.update();
+});
+}
+let gridFrame = 0;
+function scheduleGridRefresh() {
+if (gridFrame) return;
+gridFrame = requestAnimationFrame(() => {
+gridFrame = 0;
+refreshGrids();
+});
+}
+window.addEventListener('scroll', scheduleGridRefresh, { passive: true });
+window.addEventListener('resize', () => {
+grids.forEach(grid => { grid.window = null; });
+scheduleGridRefresh();
+});
+const sectionViews = new Map();
+let renderedViews = [];
+let sectionsSeq = 0;
+let salesView = null;
+let searchGrid = null;
+let emptyState = null;
+function getSectionView(key, title, { collapsible = true, tip = '' } = {}) {
+let view = sectionViews.get(key);
+if (!view) {
+const el = document.createElement('div');
+el.className = 'product-cat-section';
+el.dataset.sectionKey = key;
+el.innerHTML = `
+            <div class="product-cat-title"${collapsible ? '' : ' style="border-left-color: #9ca3af;"'}>
+                <span class="section-name"></span>
+                <span class="section-count" style="font-size:14px; font-weight:normal; color:#9ca3af"></span>
+            </div>
+            <div class="expand-bar hidden"></div>
+            <div class="section-tip" style="font-size: 11px; color: #9ca3af; margin-top: 8px;"></div>`;
+view = { key, el, grid: new VirtualGrid(), collapsible, expanded: false, items: null, count: 0 };
+const bar = el.querySelector('.expand-bar');
+el.insertBefore(view.grid.el, bar);
+bar.addEventListener('click', () => {
+view.expanded = !view.expanded;
+setSectionItems(view, view.items, view.count);
+refreshGrids();
+});
+sectionViews.set(key, view);
+}
+view.el.querySelector('.section-name').textContent = title;
+view.el.querySelector('.section-tip').textContent = tip;
+return view;
+}
+function setSectionItems(view, items, count) {
+view.items = items;
+view.count = count;
+view.el.classList.toggle('hidden', count === 0);
+view.el.querySelector('.section-count').textContent = `(${count} ${t('products')})`;
+view.grid.el.style.minHeight = items ? '' : `${CARD_HEIGHT.desktop}px`;
+const hiddenCount = items && view.collapsible ? items.length - SECTION_PREVIEW : 0;
+view.grid.setItems(items || [], view.collapsible && !view.expanded ? SECTION_PREVIEW : Infinity);
+const bar = view.el.querySelector('.expand-bar');
+bar.classList.toggle('hidden', hiddenCount <= 0);
+bar.textContent = view.expanded ? `${t('collapse')} ▴` : `${t('show_more')} ${hiddenCount} ▾`;
+}
+function categorySectionView(prodCat, title, filters) {
+const shards = sectionShards(prodCat, filters);
+if (shards.length === 0) return null;
+const uncategorized = prodCat === '';
+const view = getSectionView(`cat:${prodCat}`, title, {
+collapsible: !uncategorized,
+tip: uncategorized ? t('tip_categories') : ''
+});
+view.group = prodCat;
+view.shards = shards;
+if (view.items === null || (!filters.salesOnly && !isLoaded(shards))) {
+setSectionItems(view, null, shards.reduce((n, s) => n + s.count, 0));
+}
+return view;
+}
+async function fillSections() {
+const seq = ++sectionsSeq;
+const filters = currentFilters();
+const ready = renderedViews.filter(v => filters.salesOnly || isLoaded(v.shards));
+if (ready.length === 0) return;
+let groups;
+try {
+groups = await catalogRequest('sections', {
+groupBy: productCategories.length > 0 ? 'productCategory' : 'category',
+files: [...new Set(ready.flatMap(v => v.shards.map(s => s.file)))],
+filters: catalogFilters(filters)
+});
+} catch (err) {
+console.error('Could not fill sections', err);
+return;
+}
+if (seq !== sectionsSeq) return;
+ready.forEach(view => {
+const items = (groups[view.group] || []).map(findProduct).filter(Boolean);
+setSectionItems(view, items, items.length);
+});
+getEmptyState().classList.toggle('hidden', renderedViews.some(v => v.count > 0));
+refreshGrids();
+}
+function getEmptyState() {
+if (!emptyState) {
+emptyState = document.createElement('div');
+emptyState.className = 'empty-state';
+emptyState.innerHTML = `<div class="empty-state-icon">🔍</div><p></p>`;
+}
+emptyState.querySelector('p').textContent = t('no_products');
+return emptyState;
+}
+async function handleSearch() {
+clearTimeout(searchTimer);
+const query = document.getElementById('search').value.trim();
+const searchTitle = document.getElementById('search-results-title');
+const content = document.getElementById('content');
+if (!searchGrid) searchGrid = new VirtualGrid(card, document.getElementById('search-grid'));
+if (query.length < 2) {
+searchGrid.setItems([]);
+searchTitle.style.display = "none";
+content.style.display = "block";
+updateFilterIndicator(false);
+refreshGrids(true);
+return;
+}
+const superseded = () => document.getElementById('search').value.trim() !== query;
+let names;
+try {
+names = await catalogRequest('search', { query, filters: catalogFilters() });
+} catch (err) {
+console.error('Search failed', err);
+return;
+}
+if (superseded()) return;
+const searchResults = names.map(findProduct).filter(Boolean);
+content.style.display = "none";
+searchTitle.style.display = "block";
+updateFilterIndicator(true);
+searchGrid.setItems(searchResults);
+}
+function render() {
+if (!manifest) return;
+const container = document.getElementById("content");
+carouselPosition = 0;
+if (shardObserver) shardObserver.disconnect();
+updateFilterIndicator(false);
+const filters = currentFilters();
+const allCategoriesSelected = activeProductCategories.size === productCategories.length;
+const hasCategoryFilter = !allCategoriesSelected && activeProductCategories.size > 0;
+const children = [renderFavorites(filters)];
+if (saleProducts.length > 0 && !filters.favoritesOnly && !hasCategoryFilter && !filters.salesOnly) {
+const sales = renderSales();
+if (sales) children.push(sales);
+}
+const views = [];
+if (productCategories.length > 0) {
+productCategories.forEach(prodCat => {
+if (!activeProductCategories.has(prodCat)) return;
+const view = categorySectionView(prodCat, prodCat, filters);
+if (view) views.push(view);
+});
+if (!hasCategoryFilter) {
+const view = categorySectionView('', t('uncategorized'), filters);
+if (view) views.push(view);
+}
+} else {
+const shards = activeShards();
+if (!isLoaded(shards)) {
+loadShards(shards).then(render);
+return;
+}
+views.push(...renderBySources(shards));
+}
+renderedViews = views;
+children.push(...views.map(v => v.el), getEmptyState());
+getEmptyState().classList.toggle('hidden', views.length > 0);
+container.replaceChildren(...children);
+refreshGrids(true);
+fillSections();
+shardObserver = new IntersectionObserver(entries => {
+entries.forEach(entry => {
+if (!entry.isIntersecting) return;
+shardObserver.unobserve(entry.target);
+loadShards(sectionViews.get(entry.target.dataset.sectionKey).shards).then(fillSections);
+});
+}, { rootMargin: '600px' });
+if (!filters.salesOnly) views.filter(v => !isLoaded(v.shards)).forEach(v => shardObserver.observe(v.el));
+if (document.getElementById('search').value.length >= 2) handleSearch();
+}
+function sectionShards(prodCat, filters) {
+let shards = manifest.shards.filter(s => s.productCategory === prodCat && activeStores.has(s.store));
+if (filters.favoritesOnly) {
+const favShards = new Set(favoriteShardList().map(s => s.file));
+shards = shards.filter(s => favShards.has(s.file));
+}
+return shards;
+}
+function byPrice(a, b) {
+const price = p => (p.latest_price > 0 ? p.latest_price : Infinity);
+return price(a) - price(b) || (a.name < b.name ? -1 : a.name > b.name ? 1 : 0);
+}
+function renderFavorites(filters) {
+const favSection = document.getElementById('favorites-section') || document.createElement('div');
+favSection.id = 'favorites-section';
+favSection.className = 'favorites-section';
+if (favorites.length > 0) {
+const favoriteProducts = favorites
+.map(findProduct)
+.filter(p => p && passesFilters(p, filters) && categoryActive(p))
+.sort(byPrice);
+if (favoriteProducts.length > 0) {
+const favCardsHtml = favoriteProducts.map(p => `<div class="carousel-card">${card(p)}</div>`).join('');
+const isMobile = window.innerWidth <= 768;
+const cardsVisible = isMobile ? 1 : 3;
+const hasMultiplePages = favoriteProducts.length > cardsVisible;
+favSection.innerHTML = `
+                <div class="section-title">
+                    <span>⭐</span>
+                    <span>${t('favorites')}</span>
+                </div>
+                <div class="section-subtitle">
+                    ${favoriteProducts.length} ${t('tracked')} · ${t('sorted_by_price')}
+                </div>
+                <div class="carousel-container">
+                    <button class="carousel-btn carousel-btn-left" onclick="moveCarousel(-1)" disabled>←</button>
+                    <div class="carousel-track">
+                        ${favCardsHtml}
+                    </div>
+                    <button class="carousel-btn carousel-btn-right" onclick="moveCarousel(1)" ${hasMultiplePages ? '' : 'disabled'}>→</button>
+                </div>
+            `;
+favSection.style.display = 'block';
+carouselPosition = 0;
+setTimeout(() => {
+initCarouselTouch();
+moveCarousel(0);
+}, 100);
+} else {
+favSection.style.display = 'none';
+}
+} else {
+favSection.style.display = 'none';
+}
+return favSection;
+}
+function renderSales() {
+const filteredSales = saleProducts.filter(p => activeStores.has(p.store) && categoryActive(p));
+if (filteredSales.length === 0) return null;
+if (!salesView) {
+const el = document.createElement('div');
+el.className = 'sales-section';
+el.id = 'sales-section';
+el.innerHTML = `
+            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;">
+                <div class="section-title">
+                    <span>🔥</span>
+                    <span class="sales-title"></span>
+                    <span class="sale-badge"></span>
+                </div>
+                <button class="expand-sales-btn" onclick="toggleAllSales()"></button>
+            </div>`;
+salesView = { el, grid: new VirtualGrid(cardWithDiscount), expanded: false, items: [] };
+el.appendChild(salesView.grid.el);
+}
+salesView.items = filteredSales;
+salesView.el.querySelector('.sales-title').textContent = t('on_sale');
+salesView.el.querySelector('.sale-badge').textContent = filteredSales.length;
+const btn = salesView.el.querySelector('.expand-sales-btn');
+btn.classList.toggle('hidden', filteredSales.length <= SALES_PREVIEW);
+btn.textContent = salesView.expanded ? t('show_less') : t('show_all');
+salesView.grid.setItems(filteredSales, salesView.expanded ? Infinity : SALES_PREVIEW);
+return salesView.el;
+}
+function renderBySources(shards) {
+return sources.filter(source => activeStores.has(source.store)).map(source => {
+const view = getSectionView(`source:${source.key}`, source.name);
+view.group = source.key;
+view.shards = shards.filter(s => s.store === source.store);
+if (view.items === null) setSectionItems(view, null, 0);
+return view;
+});
+}
+function toggleAllSales() {
+salesView.expanded = !salesView.expanded;
+renderSales();
+refreshGrids();
+}
+const NO_IMAGE = "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='70' height='100'%3E%3Crect width='70' height='100' rx='6' fill='%23f3f4f6'/%3E%3C/svg%3E";
+function cardImage(p) {
+const img = `<img src="${p.thumb || p.img || NO_IMAGE}" width="${SITE_CONFIG.cardImage.width}" height="${SITE_CONFIG.cardImage.height}" loading="lazy" decoding="async" alt="" onerror="imageFailed(this)">`;
+return p.thumb_avif ? `<picture><source type="image/avif" srcset="${p.thumb_avif}">${img}</picture>` : img;
+}
+function imageFailed(img) {
+img.onerror = null;
+img.parentElement.querySelectorAll('source').forEach(source => source.remove());
+img.src = NO_IMAGE;
+}
+function compareHint(p) {
+const cheapest = (p.compare || [])[0];
+if (!cheapest || !(cheapest.latest_price < p.latest_price)) return '';
+return ` <span class="compare-hint">· ${t('cheaper_at')} ${getDisplayStoreName(cheapest.store)} €${cheapest.latest_price.toFixed(2)}</span>`;
+}
+function cardWithDiscount(p) {
+const unitLabel = p.unit_label || 'L';
+const unitPrice = p.price_per_unit || p.price_per_litre || 0;
+const discountPct = p.stats.discount_pct;
+const isFav = favorites.includes(p.name);
+const safeName = p.name.replace(/'/g, "\\'").replace(/"/g, '&quot;');
+const displayStore = getDisplayStoreName(p.store);
+return `<div class="card" onclick="showHistory('${safeName}', event)">
+        <span class="discount-badge">-${discountPct.toFixed(0)}%</span>
+        <span class="store-badge store-${p.store}">${displayStore}</span>
+        <button class="fav-btn ${isFav ? 'active' : ''}" onclick="toggleFavorite('${safeName}', event); return false;">
+            ${isFav ? '⭐' : '☆'}
+        </button>
+        ${cardImage(p)}
+        <div class="info">
+            <div class="name">${p.name}</div>
+            <div class="price-container">
+                <span class="price price-sale">€${p.latest_price.toFixed(2)}</span>
+                <span class="price-old">€${p.stats.typical.toFixed(2)}</span>
+            </div>
+            <div class="per-l">€${unitPrice.toFixed(2)} / ${unitLabel}${compareHint(p)}</div>
+        </div>
+    </div>`;
+}
+function card(p) {
+const unitLabel = p.unit_label || 'L';
+const unitPrice = p.price_per_unit || p.price_per_litre || 0;
+const entries = p.entries || [];
+const isFav = favorites.includes(p.name);
+const safeName = p.name.replace(/'/g, "\\'").replace(/"/g, '&quot;');
+const displayStore = getDisplayStoreName(p.store);
+let priceDisplay = `<div class="price">€${p.latest_price.toFixed(2)}</div>`;
+if (p.on_sale) {
+priceDisplay = `
+            <div class="price-container">
+                <span class="price price-sale">€${p.latest_price.toFixed(2)}</span>
+                <span class="price-old">€${p.stats.typical.toFixed(2)}</span>
+            </div>`;
+} else if (entries.length > 1) {
+const currentP = p.latest_price;
+const previousP = entries[entries.length - 2].p;
+if (currentP > previousP) {
+priceDisplay = `
+                <div class="price-container">
+                    <span class="price">€${currentP.toFixed(2)}</span>
+                    <span style="font-size: 10px; color: #ef4444;">▲</span>
+                </div>`;
+}
+}
+return `<div class="card" onclick="showHistory('${safeName}', event)">
+        <span class="store-badge store-${p.store}">${displayStore}</span>
+        <button class="fav-btn ${isFav ? 'active' : ''}" onclick="toggleFavorite('${safeName}', event); return false;">
+            ${isFav ? '⭐' : '☆'}
+        </button>
+        ${cardImage(p)}
+        <div class="info">
+            <div class="name">${p.name}</div>
+            ${priceDisplay}
+            <div class="per-l">€${unitPrice.toFixed(2)} / ${unitLabel}${compareHint(p)}</div>
+        </div>
+    </div>`;
+}
+function handleScroll() {
+if (window.innerWidth > 768) return;
+if (!ticking) {
+window.requestAnimationFrame(() => {
+const header = document.getElementById('header');
+const hamburger = document.getElementById('hamburger');
+const currentScroll = window.pageYOffset || document.documentElement.scrollTop;
+if (currentScroll <= 0) {
+header.classList.remove('hide');
+hamburger.classList.remove('hide');
+lastScrollTop = currentScroll;
+ticking = false;
+return;
+}
+const scrollDifference = Math.abs(currentScroll - lastScrollTop);
+if (scrollDifference > 5) {
+if (currentScroll > lastScrollTop && currentScroll > 80) {
+header.classList.add('hide');
+hamburger.classList.add('hide');
+}
+else if (currentScroll < lastScrollTop) {
+header.classList.remove('hide');
+hamburger.classList.remove('hide');
+}
+lastScrollTop = currentScroll;
+}
+ticking = false;
+});
+ticking = true;
+}
+}
+window.addEventListener('scroll', handleScroll, { passive: true });
+function registerServiceWorker() {
+if (!('serviceWorker' in navigator) || !location.protocol.startsWith('http')) return;
+navigator.serviceWorker.register(SITE_CONFIG.serviceWorkerFile).catch(err => {
+console.error('Service worker registration failed', err);
+});
+}
+function showCounts() {
+document.querySelectorAll('[data-count-category]').forEach(el => {
+el.textContent = `(${manifest.counts.categories[el.dataset.countCategory] || 0})`;
+});
+document.querySelectorAll('[data-count-store]').forEach(el => {
+el.textContent = `(${manifest.counts.stores[el.dataset.countStore] || 0})`;
+});
+}
+async function init() {
+loadFavorites();
+const response = await fetch('data/manifest.json', { cache: 'no-cache' });
+manifest = await response.json();
+activeStores = new Set(manifest.sources.map(s => s.store));
+startCatalog();
+registerServiceWorker();
+translations = manifest.translations;
+sources = manifest.sources;
+productCategories = manifest.productCategories;
+activeProductCategories = new Set(productCategories);
+document.getElementById('last-run').textContent = (manifest.lastRun || '').slice(0, 10);
+showCounts();
+const sales = await fetchJson('sales.json');
+saleProducts = sales.products;
+saleByName = new Map(saleProducts.map(p => [p.name, p]));
+await loadFavoriteShards();
+loadLanguage();
+}
+init();
@@ -1,10 +1,32 @@
-from flask import Flask, render_template_string, request, jsonify, make_response
-import json, os, subprocess, sys, csv, io
+from flask import Flask, Response, g, render_template_string, request, jsonify, make_response
+import json, os, subprocess, sys, csv, base64, time
+from datetime import datetime
+from bisect import bisect_right
+from functools import wraps
+import history_store, http_cache, metrics, price_stats, product_matching
 
 app = Flask(__name__)
 
-HISTORY_FILE = "alcohol_history.json"
 CONFIG_FILE = "categories.json"
+MATCHES_FILE = product_matching.MATCHES_FILE
+
+# Product API
+API_SORT_KEYS = ("price_per_unit", "latest_price")
+API_DEFAULT_FIELDS = ["name", "url", "img", "store", "category", "latest_price", "price_per_unit", "unit_label", "is_sale", "stats"]
+API_DEFAULT_LIMIT = 20
+API_MAX_LIMIT = 200
+
+# Bumped whenever this file changes, so cached pages pick up template edits
+APP_VERSION = http_cache.file_version(os.path.abspath(__file__))
+
+_products_cache = {"version": None, "products": []}
+
+EXPORT_COLUMNS = {
+    "latest": ("name", "store", "category", "price", "unit_price", "unit", "price_since", "url"),
+    "history": ("name", "store", "category", "timestamp", "price", "unit_price", "unit"),
+}
+# /download-csv keeps the columns it has always had; /export/latest.csv has the full set
+LEGACY_CSV_COLUMNS = ("Store", "Category", "Name", "Price", "Price/L")
 
 # --- DATA HELPERS ---
 def get_store_from_url(url):
@@ -29,6 +51,10 @@ def load_config():
             with open(CONFIG_FILE, "r", encoding="utf-8") as f:
                 data = json.load(f)
                 
+            # Handle new format (object with productCategories and sources)
+            if isinstance(data, dict) and 'sources' in data:
+                return data.get('sources', [])
+
             # Convert old dict format to new list format
             if isinstance(data, dict):
                 new_format = []
@@ -56,26 +82,185 @@ def get_category_key(category_entry):
     store = get_store_from_url(category_entry.get("url", ""))
     return f"{store}:{category_entry['name']}"
 
+def data_version():
+    """Changes whenever the history, config or cross-store match files change"""
+    return http_cache.file_version(*history_store.history_files(), CONFIG_FILE, MATCHES_FILE)
+
 def load_products():
-    if not os.path.exists(HISTORY_FILE): return []
+    version = data_version()
+    if _products_cache["version"] == version:
+        metrics.inc("app_cache_total", cache="products", result="hit")
+        return _products_cache["products"]
+    metrics.inc("app_cache_total", cache="products", result="miss")
+    products = read_products()
+    _products_cache.update(version=version, products=products)
+    return products
+
+def read_products():
+    if not history_store.exists(): return []
     try:
         config = load_config()
         # Build set of valid category keys
         valid_keys = {get_category_key(cat) for cat in config}
         
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            raw_products = data.get("products", {})
-            # Filter products by valid category keys
-            return [{"name": k, **v} for k, v in raw_products.items() if v.get('category') in valid_keys]
+        data = history_store.load_history()
+        # Filter products by valid category keys, leaving out stale ones
+        products = [{"name": k, **v} for k, v in data["products"].items()
+                    if v.get('category') in valid_keys and not history_store.is_stale(v, data["meta"])]
+        price_stats.add_stats(products, data.get("meta", {}).get("generated_at"))
+        # Groups are kept up to date by the site build after every scrape
+        product_matching.add_comparisons(products, product_matching.load_matches(MATCHES_FILE)["groups"])
+        return products
     except: 
         return []
 
+def is_on_sale(product):
+    """A product is on sale if the store flags it or it is below its typical price"""
+    return bool(product.get("is_sale")) or price_stats.is_on_sale(product.get("stats"))
+
+def sort_key(product, key):
+    """Sort key that puts missing/zero values last, ties broken by name"""
+    value = product.get(key) or 0
+    return (0, value, product["name"]) if value > 0 else (1, 0, product["name"])
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    if not isinstance(key, list) or len(key) != 3:
+        raise ValueError("malformed cursor")
+    return tuple(key)
+
+def get_list_arg(name):
+    """Read a query arg given either repeated (?a=x&a=y) or comma separated (?a=x,y)"""
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(v.strip() for v in raw.split(",") if v.strip())
+    return values
+
+def unit_ratio(product):
+    """price_per_unit / price for a product, used to derive unit prices for past entries"""
+    price = product.get("latest_price") or 0
+    ppu = product.get("price_per_unit") or 0
+    return ppu / price if price > 0 and ppu > 0 else None
+
+def in_range(timestamp, since, until):
+    # ISO timestamps compare lexically; comparing only the prefix makes 'until' dates inclusive
+    if since and timestamp < since:
+        return False
+    if until and timestamp[:len(until)] > until:
+        return False
+    return True
+
+def export_rows(kind, products, since="", until=""):
+    """Yield export rows as tuples matching EXPORT_COLUMNS[kind]"""
+    for p in products:
+        ratio = unit_ratio(p)
+        entries = [e for e in (p.get("entries") or []) if e.get("t")]
+        if kind == "history":
+            for e in entries:
+                if in_range(e["t"], since, until):
+                    unit_price = round(e["p"] * ratio, 4) if ratio else None
+                    yield (p["name"], p.get("store", ""), p.get("category", ""), e["t"], e["p"], unit_price, p.get("unit_label", ""))
+        else:
+            price, changed = p.get("latest_price"), entries[-1]["t"] if entries else ""
+            if until:
+                past = [e for e in entries if in_range(e["t"], "", until)]
+                if not past:
+                    continue
+                price, changed = past[-1]["p"], past[-1]["t"]
+            # Leave out products whose price last changed before since
+            if since and not (changed and in_range(changed, since, "")):
+                continue
+            unit_price = round(price * ratio, 4) if ratio and price else None
+            yield (p["name"], p.get("store", ""), p.get("category", ""), price, unit_price, p.get("unit_label", ""), changed, p.get("url", ""))
+
+class _Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator"""
+    def write(self, value):
+        return value
+
+def stream_csv(columns, rows, batch=500):
+    writer = csv.writer(_Echo())
+    chunk = [writer.writerow(columns)]
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= batch:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+def stream_ndjson(columns, rows, batch=500):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+        if len(chunk) >= batch:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+def cacheable(view):
+    """Conditional GET and compression for views whose output depends only on the data files.
+
+    The strong ETag is derived from the data version, the request URL and the chosen
+    content-coding, so a matching If-None-Match is answered with 304 without running the view.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        encoding = http_cache.negotiate_encoding(request.headers.get("Accept-Encoding"))
+        modified = http_cache.last_modified(*history_store.history_files(), CONFIG_FILE, MATCHES_FILE)
+        etag = http_cache.make_etag(APP_VERSION, data_version(), request.full_path, encoding)
+
+        if http_cache.is_fresh(request.headers, etag, modified):
+            metrics.inc("app_cache_total", cache="http", result="hit")
+            response = make_response("", 304)
+        else:
+            metrics.inc("app_cache_total", cache="http", result="miss")
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if encoding != "identity" and http_cache.is_compressible(response.mimetype):
+                if response.is_streamed:
+                    response.response = http_cache.compress_stream(response.response, encoding)
+                    response.headers.pop("Content-Length", None)
+                    response.headers["Content-Encoding"] = encoding
+                else:
+                    body = response.get_data()
+                    if len(body) >= http_cache.MIN_COMPRESS_SIZE:
+                        response.set_data(http_cache.compress(body, encoding))
+                        response.headers["Content-Encoding"] = encoding
+
+        response.headers["ETag"] = etag
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        if modified:
+            response.headers["Last-Modified"] = http_cache.http_date(modified)
+        return response
+    return wrapper
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Latency up to the response being handed to the server; a streamed body's time to
+    finish isn't included"""
+    # The URL rule rather than the path, so /export/<kind>.<fmt> is one series
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    if "request_started" in g:
+        metrics.observe("app_request_seconds", time.perf_counter() - g.request_started, endpoint=endpoint)
+    metrics.inc("app_requests_total", endpoint=endpoint, status=response.status_code)
+    return response
+
 # --- ROUTES ---
 
 @app.route('/')
+@cacheable
 def index():
-    products = load_products()
     config = load_config()
     # Build categories with store info
     categories_with_stores = []
@@ -87,7 +272,64 @@ def index():
             "key": get_category_key(cat)
         })
     
-    return render_template_string(DASHBOARD_HTML, products_json=json.dumps(products), categories=categories_with_stores)
+    return render_template_string(DASHBOARD_HTML, categories=categories_with_stores)
+
+@app.route('/api/products')
+@cacheable
+def api_products():
+    """Filtered, sorted, cursor-paginated product listing.
+
+    Query args: store, category (category key), sale (true/false), sort
+    (price_per_unit | latest_price), limit, cursor, fields (comma separated;
+    "compare" adds the same product's prices at other stores).
+    """
+    sort = request.args.get("sort", "price_per_unit")
+    if sort not in API_SORT_KEYS:
+        return jsonify({"status": "error", "message": f"sort must be one of {', '.join(API_SORT_KEYS)}"}), 400
+    try:
+        limit = int(request.args.get("limit", API_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+    limit = max(1, min(limit, API_MAX_LIMIT))
+
+    stores = set(get_list_arg("store"))
+    categories = set(get_list_arg("category"))
+    sale = request.args.get("sale")
+    fields = get_list_arg("fields") or API_DEFAULT_FIELDS
+
+    products = load_products()
+    if stores:
+        products = [p for p in products if p.get("store") in stores]
+    if categories:
+        products = [p for p in products if p.get("category") in categories]
+    if sale is not None:
+        want_sale = sale.lower() in ("1", "true", "yes")
+        products = [p for p in products if is_on_sale(p) == want_sale]
+
+    keyed = sorted(((sort_key(p, sort), p) for p in products), key=lambda kp: kp[0])
+    keys = [k for k, _ in keyed]
+
+    start = 0
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            start = bisect_right(keys, decode_cursor(cursor))
+        except (ValueError, TypeError):
+            return jsonify({"status": "error", "message": "invalid cursor"}), 400
+
+    page = keyed[start:start + limit]
+    items = [{f: p.get(f) for f in fields} for _, p in page]
+    next_cursor = encode_cursor(page[-1][0]) if page and start + limit < len(keyed) else None
+
+    return jsonify({"items": items, "next_cursor": next_cursor, "total": len(keyed)})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """This process's metrics in the Prometheus text format, or as the JSON summary
+    with ?format=json"""
+    if request.args.get("format") == "json":
+        return jsonify(metrics.summary())
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/settings')
 def settings():
@@ -103,16 +345,56 @@ def update_config():
     return jsonify({"status": "success"})
 
 @app.route('/download-csv')
+@cacheable
 def download_csv():
-    products = load_products()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Store', 'Category', 'Name', 'Price', 'Price/L'])
-    for p in products:
-        writer.writerow([p.get('store',''), p.get('category',''), p['name'], p.get('latest_price',0), p.get('price_per_litre',0)])
-    response = make_response(output.getvalue())
+    rows = ((p.get("store", ""), p.get("category", ""), p["name"], p.get("latest_price", 0), p.get("price_per_litre", 0))
+            for p in load_products())
+    response = Response(stream_csv(LEGACY_CSV_COLUMNS, rows), mimetype="text/csv")
     response.headers["Content-Disposition"] = "attachment; filename=price_export.csv"
-    response.headers["Content-type"] = "text/csv"
+    return response
+
+@app.route('/export/<kind>.<fmt>')
+@cacheable
+def export(kind, fmt):
+    return export_response(kind, fmt)
+
+def export_response(kind, fmt):
+    """Streaming exports, for the routes above (which add caching and compression once).
+
+    kind: 'latest' (one row per product) or 'history' (one row per price entry, long format)
+    fmt:  'csv' or 'ndjson'
+    Filters: store, category (category key), since/until (ISO date or datetime, inclusive).
+    For 'latest', until gives the snapshot as of that moment, and since leaves out
+    products whose price (as of that snapshot) last changed before it.
+    """
+    if kind not in EXPORT_COLUMNS or fmt not in ("csv", "ndjson"):
+        return jsonify({"status": "error", "message": "unknown export"}), 404
+    since = request.args.get("since", "")
+    until = request.args.get("until", "")
+    try:
+        for value in (since, until):
+            if value:
+                datetime.fromisoformat(value)
+    except ValueError:
+        return jsonify({"status": "error", "message": "since/until must be ISO dates"}), 400
+
+    stores = set(get_list_arg("store"))
+    categories = set(get_list_arg("category"))
+    products = [
+        p for p in load_products()
+        if (not stores or p.get("store") in stores) and (not categories or p.get("category") in categories)
+    ]
+
+    rows = export_rows(kind, products, since, until)
+    columns = EXPORT_COLUMNS[kind]
+    if fmt == "csv":
+        body, mimetype = stream_csv(columns, rows), "text/csv"
+    else:
+        body, mimetype = stream_ndjson(columns, rows), "application/x-ndjson"
+
+    response = Response(body, mimetype=mimetype)
+    filename = "price_export.csv" if kind == "latest" and fmt == "csv" else f"price_{kind}.{fmt}"
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
     return response
 
 @app.route('/run-scan', methods=['POST'])
@@ -228,18 +510,32 @@ DASHBOARD_HTML = """
     <div class="main">
         <div class="header">
             <div>
-                <button class="btn btn-active" id="sort-unit" onclick="setSort('price_per_litre')">Value (€/L)</button>
+                <button class="btn btn-active" id="sort-unit" onclick="setSort('price_per_unit')">Value (€/unit)</button>
                 <button class="btn" id="sort-total" onclick="setSort('latest_price')">Price</button>
             </div>
-            <a href="/download-csv" class="btn">📥 Export CSV</a>
+            <div>
+                <a href="/download-csv" class="btn">📥 Export CSV</a>
+                <a href="/export/history.csv" class="btn">📈 History CSV</a>
+            </div>
+        </div>
+        <div id="content">
+            {% for cat in categories %}
+            <div class="cat-section" id="cat_{{ loop.index }}" data-key="{{ cat.key }}">
+                <div class="cat-title">{{ cat.name }} <span class="cat-count" style="font-size:13px; font-weight:normal; color:#718096"></span></div>
+                <div class="grid"></div>
+                <div class="expand-bar hidden" onclick="loadMore(this.parentElement)">Show more deals ▾</div>
+            </div>
+            {% endfor %}
         </div>
-        <div id="content"></div>
     </div>
 
 <script>
-const products = {{ products_json | safe }};
-const categoryOrder = {{ categories | tojson }};
-let currentSort = 'price_per_litre';
+const FIELDS = 'name,url,img,store,latest_price,price_per_unit,unit_label';
+const FIRST_PAGE = 5;
+const MORE_PAGE = 20;
+let currentSort = 'price_per_unit';
+let observer = null;
+const loading = new Map(); // section -> AbortController of the page it is loading
 
 function setSort(key){
     currentSort = key;
@@ -248,54 +544,74 @@ function setSort(key){
     render();
 }
 
+async function fetchPage(section, limit) {
+    if (loading.has(section)) return; // "show more" clicked again while its page loads
+    const controller = new AbortController();
+    loading.set(section, controller);
+    const params = new URLSearchParams({category: section.dataset.key, sort: currentSort, limit: limit, fields: FIELDS});
+    if (section.dataset.cursor) params.set('cursor', section.dataset.cursor);
+    let data;
+    try {
+        const response = await fetch('/api/products?' + params, {signal: controller.signal});
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        data = await response.json();
+    } catch (err) {
+        if (controller.signal.aborted) return; // render() started over
+        console.error(`Loading ${section.dataset.key} failed:`, err);
+        // Leave a way to try again
+        section.querySelector('.expand-bar').classList.remove('hidden');
+        return;
+    } finally {
+        if (loading.get(section) === controller) loading.delete(section);
+    }
+    if (controller.signal.aborted) return;
+
+    if (data.total === 0) {
+        section.classList.add('hidden');
+        return;
+    }
+    section.querySelector('.cat-count').textContent = `(${data.total} items)`;
+    section.querySelector('.grid').insertAdjacentHTML('beforeend', data.items.map(p=>card(p)).join(''));
+    section.dataset.cursor = data.next_cursor || '';
+    section.querySelector('.expand-bar').classList.toggle('hidden', !data.next_cursor);
+}
+
+function loadMore(section) {
+    fetchPage(section, MORE_PAGE);
+}
+
+// Only fetch a category once it scrolls near the viewport
 function render(){
-    const container = document.getElementById("content");
-    container.innerHTML = "";
-    const byCat = {};
-    products.forEach(p => {
-        if(!byCat[p.category]) byCat[p.category] = [];
-        byCat[p.category].push(p);
-    });
+    if (observer) observer.disconnect();
+    // Pages still loading are for the old sort; drop them so the sections can load afresh
+    loading.forEach(controller => controller.abort());
+    loading.clear();
+    observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            observer.unobserve(entry.target);
+            fetchPage(entry.target, FIRST_PAGE);
+        });
+    }, { rootMargin: '400px' });
 
-    // Render in the order from categoryOrder
-    categoryOrder.forEach((cat, index) => {
-        if (!byCat[cat.key]) return; // Skip if no products in this category
-        
-        const sorted = byCat[cat.key].sort((a,b)=> (a[currentSort] || 999) - (b[currentSort] || 999));
-        const top5 = sorted.slice(0, 5);
-        const rest = sorted.slice(5);
-        const sectionId = "cat_" + (index + 1);
-        const hiddenId = "hidden_" + sectionId;
-
-        let html = `
-            <div class="cat-section" id="${sectionId}">
-                <div class="cat-title">${cat.name} <span style="font-size:13px; font-weight:normal; color:#718096">(${sorted.length} items)</span></div>
-                <div class="grid">${top5.map(p=>card(p)).join('')}</div>
-        `;
-        if (rest.length > 0) {
-            html += `<div id="${hiddenId}" class="grid hidden" style="margin-top:15px">${rest.map(p=>card(p)).join('')}</div>
-                     <div class="expand-bar" onclick="toggle('${hiddenId}', this)">Show ${rest.length} more deals ▾</div>`;
-        }
-        html += `</div>`;
-        container.innerHTML += html;
+    document.querySelectorAll('.cat-section').forEach(section => {
+        section.querySelector('.grid').innerHTML = '';
+        section.dataset.cursor = '';
+        observer.observe(section);
     });
 }
 
-function toggle(id, btn) {
-    const el = document.getElementById(id);
-    const isHidden = el.classList.toggle('hidden');
-    btn.innerHTML = isHidden ? "Show more deals ▾" : "Collapse ▴";
-}
+const NO_IMAGE = "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='70' height='100'%3E%3Crect width='70' height='100' rx='6' fill='%23f3f4f6'/%3E%3C/svg%3E";
 
 function card(p){
     const storeClass = 'store-' + (p.store || 'Unknown');
     return `<a href="${p.url}" target="_blank" class="card">
         <span class="store-badge ${storeClass}">${p.store || 'UNK'}</span>
-        <img src="${p.img}" onerror="this.src='https://via.placeholder.com/60x90?text=No+Img'">
+        <img src="${p.img || NO_IMAGE}" width="70" height="100" loading="lazy" decoding="async" alt="" onerror="this.onerror=null; this.src=NO_IMAGE">
         <div class="info">
             <div class="name">${p.name}</div>
             <div class="price">€${p.latest_price.toFixed(2)}</div>
-            <div class="per-l">€${(p.price_per_litre||0).toFixed(2)} / L</div>
+            <div class="per-l">€${(p.price_per_unit||0).toFixed(2)} / ${p.unit_label || 'L'}</div>
         </div>
     </a>`;
 }
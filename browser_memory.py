@@ -0,0 +1,128 @@
+"""Browser memory governor: keeps long scrapes in flat memory.
+
+Chromium's memory creeps up over hundreds of navigations of image-heavy SPA pages.
+MemoryGovernor hands the scraper its page and replaces it
+
+    after PAGE_NAVIGATIONS navigations         a fresh page in the same context
+    after CONTEXT_NAVIGATIONS navigations      a fresh context (cookies, cache and all)
+    when renderer RSS exceeds RSS_LIMIT_MB     a fresh context before the next navigation
+
+and samples the browser's memory after every page, keeping the peak per category.
+
+Memory is read with psutil when it is installed, otherwise from /proc (Linux); with
+neither, only the navigation counts apply.
+"""
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PAGE_NAVIGATIONS = 25
+CONTEXT_NAVIGATIONS = 150
+RSS_LIMIT_MB = 1500
+MB = 1024 * 1024
+
+def _proc_children():
+    """{ppid: [pid, ...]} from /proc"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                # The command name is in parentheses and may contain spaces
+                fields = f.read().rsplit(b")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    return children
+
+def _proc_usage(pid):
+    """(rss bytes, is a renderer) of a process from /proc"""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            renderer = b"--type=renderer" in f.read()
+    except OSError:
+        return 0, False
+    return rss, renderer
+
+def browser_rss_mb():
+    """(total, renderer) RSS in MB of every process this one started (the Playwright
+    driver and Chromium), or None when it can't be measured"""
+    usage = []
+    if psutil is not None:
+        for child in psutil.Process().children(recursive=True):
+            try:
+                usage.append((child.memory_info().rss, "--type=renderer" in child.cmdline()))
+            except psutil.Error:
+                pass
+    elif os.path.isdir("/proc"):
+        children = _proc_children()
+        pending = list(children.get(os.getpid(), []))
+        while pending:
+            pid = pending.pop()
+            usage.append(_proc_usage(pid))
+            pending += children.get(pid, [])
+    else:
+        return None
+    total = sum(rss for rss, _ in usage)
+    renderer = sum(rss for rss, is_renderer in usage if is_renderer)
+    return round(total / MB), round(renderer / MB)
+
+class MemoryGovernor:
+    """Owns the browser context and page the scraper navigates with"""
+    def __init__(self, new_context, page_navigations=PAGE_NAVIGATIONS,
+                 context_navigations=CONTEXT_NAVIGATIONS, rss_limit_mb=RSS_LIMIT_MB):
+        self.new_context = new_context
+        self.page_navigations = page_navigations
+        self.context_navigations = context_navigations
+        self.rss_limit_mb = rss_limit_mb
+        self.context = new_context()
+        self.current = self.context.new_page()
+        self.on_page = self.on_context = 0
+        self.over_limit = False
+        self.peaks = {}
+        self.recycled = {"pages": 0, "contexts": 0}
+
+    def page(self):
+        """The page to navigate with next, recycled first if it is due"""
+        if self.over_limit or self.on_context >= self.context_navigations:
+            self.recycle_context()
+        elif self.on_page >= self.page_navigations:
+            self.recycle_page()
+        self.on_page += 1
+        self.on_context += 1
+        return self.current
+
+    def recycle_page(self):
+        self.current.close()
+        self.current = self.context.new_page()
+        self.on_page = 0
+        self.recycled["pages"] += 1
+
+    def recycle_context(self):
+        self.context.close()
+        self.context = self.new_context()
+        self.current = self.context.new_page()
+        self.on_page = self.on_context = 0
+        self.over_limit = False
+        self.recycled["contexts"] += 1
+
+    def sample(self, category):
+        """Measure memory after a page; returns the total MB (None if unknown)"""
+        usage = browser_rss_mb()
+        if usage is None:
+            return None
+        total, renderer = usage
+        self.peaks[category] = max(self.peaks.get(category, 0), total)
+        if renderer > self.rss_limit_mb:
+            print(f"  🧠 Renderer memory at {renderer} MB, recycling the browser context")
+            self.over_limit = True
+        return total
+
+    def close(self):
+        self.context.close()
@@ -1,8 +1,31 @@
-import json, os
+import argparse, json, os, re, hashlib, time, unicodedata, zlib
+import history_store, image_pipeline, metrics, price_stats, product_matching, site_assets
 
-HISTORY_FILE = "alcohol_history.json"
 CONFIG_FILE = "categories.json"
 OUTPUT_FILE = "index.html"
+DATA_DIR = "data"
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+MANIFEST_FILE = os.path.join(DATA_DIR, "manifest.json")
+SALES_FILE = os.path.join(DATA_DIR, "sales.json")
+SEARCH_FILE = os.path.join(DATA_DIR, "search.json")
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+HISTORY_BUCKETS = 64
+DELTA_DIR = os.path.join(DATA_DIR, "deltas")
+# Builds a returning visitor can be behind and still catch up from deltas
+DELTA_HISTORY = 14
+# Entries kept inline for the price-rise marker on cards; the rest is fetched on demand
+INLINE_ENTRIES = 2
+BUILD_CACHE_FILE = ".build_cache.json"
+# Served next to index.html so its data/ URLs resolve the same way as the page's
+WORKER_FILE = "catalog-worker.js"
+SERVICE_WORKER_FILE = "sw.js"
+
+def digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# Any change to this file (template, translations, payload format) invalidates cached outputs
+with open(os.path.abspath(__file__), "r", encoding="utf-8") as _f:
+    CODE_VERSION = digest(_f.read())
 
 # Translations
 TRANSLATIONS = {
@@ -36,6 +59,11 @@ TRANSLATIONS = {
         "all_products": "Kõik tooted",
         "history": "Hinna ajalugu",
         "date": "Kuupäev",
+        "typical_price": "Tavahind",
+        "lowest_price": "Madalaim",
+        "days_at_price": "Päevi selle hinnaga",
+        "cheaper_at": "Odavam:",
+        "other_stores": "Teistes poodides",
         "view_store": "Vaata poes"
     },
     "en": {
@@ -68,6 +96,11 @@ TRANSLATIONS = {
         "all_products": "All products",
         "history": "Price History",
         "date": "Date",
+        "typical_price": "Typical",
+        "lowest_price": "Lowest",
+        "days_at_price": "Days at this price",
+        "cheaper_at": "Cheaper at",
+        "other_stores": "Other stores",
         "view_store": "View on Store"
     }
 }
@@ -93,11 +126,10 @@ def get_category_key(name, url):
     return f"{store}:{name}"
 
 def load_data():
-    if not os.path.exists(HISTORY_FILE): 
+    if not history_store.exists():
         return [], [], [], "Never"
     
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = history_store.load_history()
     
     product_categories = []
     sources = []
@@ -144,1008 +176,1633 @@ def load_data():
             "productCategory": source.get("productCategory", "")
         })
     
-    # Load all products and filter out unavailable ones (price = 0.10)
-    raw_products = data.get("products", {})
-    products = []
-    for k, v in raw_products.items():
-        product = {"name": k, **v}
-        # Filter out products with price 0.10 (unavailable products)
-        if product.get('latest_price', 0) != 0.10:
-            products.append(product)
+    # Load all products, leaving out the stale ones (no longer found by the scraper)
+    meta = data.get("meta", {})
+    products = [{"name": k, **v} for k, v in data.get("products", {}).items()
+                if not history_store.is_stale(v, meta)]
     
     return products, sources_with_stores, product_categories, data.get("meta", {}).get("generated_at", "Unknown")
 
-def build():
-    products, sources, product_categories, last_run = load_data()
-    
-    # Calculate products on sale
-    sale_products = []
+def slugify(text):
+    """ASCII file-name-safe slug, folding diacritics (Õlled -> olled)"""
+    folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", folded.lower()).strip("-") or "x"
+
+def shard_file_name(product_category, store):
+    category_slug = slugify(product_category) if product_category else "_uncategorized"
+    return f"{category_slug}--{slugify(store)}.json"
+
+def to_json(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def read_text(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def write_file(path, text):
+    """Write text unless the file already holds exactly that. Returns True if the file changed."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+class BuildCache:
+    """Remembers, per output file, the digest of the inputs it was built from and of its content.
+
+    Outputs whose inputs are unchanged are neither regenerated nor rewritten.
+    """
+    def __init__(self, path=BUILD_CACHE_FILE):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.used = set()
+        self.reused = 0
+        self.written = 0
+
+    def emit(self, path, inputs, render, on_change=None):
+        """Return the content digest of path, calling render() only if its inputs changed.
+
+        on_change(path, old_text, new_text) is called when the file's content changes
+        (old_text is None for a new file).
+        """
+        self.used.add(path)
+        entry = self.entries.get(path)
+        if entry and entry["inputs"] == inputs and os.path.exists(path):
+            self.reused += 1
+            return entry["content"]
+        text = render()
+        old_text = read_text(path) if on_change else None
+        if write_file(path, text):
+            self.written += 1
+            if on_change:
+                on_change(path, old_text, text)
+        self.entries[path] = {"inputs": inputs, "content": digest(text)}
+        return self.entries[path]["content"]
+
+    def is_current(self, inputs):
+        """True if the last full build used the same inputs and all its outputs still exist"""
+        entry = self.entries.get("*")
+        return bool(entry) and entry["inputs"] == inputs and all(
+            os.path.exists(path) for path in self.entries if path != "*")
+
+    def save(self, inputs):
+        # Forget outputs that weren't produced this time
+        self.entries = {path: e for path, e in self.entries.items() if path in self.used}
+        self.entries["*"] = {"inputs": inputs, "content": ""}
+        write_file(self.path, json.dumps(self.entries, sort_keys=True, indent=0))
+
+def input_digest(*options):
+    """Digest over everything a build reads: history, config, the code (including the
+    modules that shape the output) and the build options"""
+    h = hashlib.sha1(CODE_VERSION.encode("ascii"))
+    for path in (*history_store.history_files(), CONFIG_FILE, site_assets.__file__, price_stats.__file__, product_matching.__file__):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(hashlib.sha1(f.read()).digest())
+    h.update(json.dumps(options).encode("utf-8"))
+    return h.hexdigest()
+
+def history_bucket(name):
+    """Stable bucket for a product's full price history"""
+    return zlib.crc32(name.encode("utf-8")) % HISTORY_BUCKETS
+
+def remove_stale_files(directory, keep):
+    """Delete .json files in directory that aren't in keep. Returns the removed paths."""
+    if not os.path.isdir(directory):
+        return []
+    removed = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json") and name not in keep:
+            os.remove(os.path.join(directory, name))
+            removed.append(os.path.join(directory, name))
+    return removed
+
+def diff_products(old_text, new_text):
+    """Products added or changed and names removed between two {"products": [...]} payloads"""
+    old = {p["name"]: p for p in json.loads(old_text)["products"]}
+    new = {p["name"]: p for p in json.loads(new_text)["products"]}
+    return {
+        "upsert": [p for name, p in new.items() if old.get(name) != p],
+        "remove": [name for name in old if name not in new],
+    }
+
+class DeltaLog:
+    """What changed in data/ since the previous build, so returning visitors can patch
+    their cached copy (see sw.js) instead of downloading everything again.
+
+    Shards and the sale list are diffed per product. Other changed files are only
+    listed under "refetch", and deleted ones under "removed".
+    """
+    def __init__(self):
+        try:
+            with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+        self.previous_version = previous.get("version")
+        self.history = previous.get("deltas", [])
+        self.files, self.refetch, self.removed = {}, [], []
+
+    @staticmethod
+    def data_path(path):
+        return os.path.relpath(path, DATA_DIR).replace(os.sep, "/")
+
+    def record(self, path, old_text, new_text):
+        name = self.data_path(path)
+        if old_text is None:
+            self.refetch.append(name)  # nobody can have it cached
+        elif name.startswith("shards/"):
+            self.files[name] = diff_products(old_text, new_text)
+        elif name == self.data_path(SALES_FILE):
+            # The sale list is ordered by discount, which clients can't recompute
+            change = diff_products(old_text, new_text)
+            order = [p["name"] for p in json.loads(new_text)["products"]]
+            if order != [p["name"] for p in json.loads(old_text)["products"]]:
+                change["order"] = order
+            self.files[name] = change
+        else:
+            self.refetch.append(name)
+
+    def record_removed(self, paths):
+        self.removed.extend(self.data_path(p) for p in paths)
+
+    def write(self, version):
+        """Write the delta from the previous build to version. Returns the manifest's delta list."""
+        if not self.previous_version:
+            return []
+        if self.previous_version != version:
+            delta_file = f"{version}.json"
+            payload = to_json({"from": self.previous_version, "to": version, "files": self.files,
+                               "refetch": self.refetch, "removed": self.removed})
+            write_file(os.path.join(DELTA_DIR, delta_file), payload)
+            self.history = (self.history + [{"from": self.previous_version, "to": version, "file": delta_file,
+                                              "bytes": len(payload.encode("utf-8"))}])[-DELTA_HISTORY:]
+        remove_stale_files(DELTA_DIR, {d["file"] for d in self.history})
+        return self.history
+
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9.%]+")
+SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)(l|cl|ml)$")
+SIZE_ML = {"l": 1000, "cl": 10, "ml": 1}
+
+def fold_text(text):
+    """Lowercase and strip diacritics so "Õlu" and "olu" compare equal. Mirrors foldText() in the page."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def search_tokens(text):
+    """Search tokens of a product name. Decimal commas become points ("0,5L" -> "0.5l")
+    and volumes are also indexed in ml and litres, so "500ml" finds "0,5L"."""
+    text = re.sub(r"(\d),(\d)", r"\1.\2", fold_text(text))
+    text = re.sub(r"(\d) (c?l|ml)\b", r"\1\2", text)
+    tokens = set()
+    for token in SEARCH_TOKEN_RE.findall(text):
+        token = token.strip(".")
+        if not token:
+            continue
+        tokens.add(token)
+        size = SIZE_RE.match(token)
+        if size:
+            ml = float(size.group(1)) * SIZE_ML[size.group(2)]
+            tokens.update((f"{ml:g}ml", f"{ml / 1000:g}l"))
+    return tokens
+
+def search_index(shards, groups):
+    """Prefix-searchable inverted index over all product names.
+
+    Doc ids number the products shard by shard in published order, so offsets[i] is the
+    id of the first product of shards[i]. tokens is sorted so the page can binary-search a
+    prefix range, and postings[i] holds the delta-encoded doc ids containing tokens[i].
+    """
+    offsets, postings, doc_id = [], {}, 0
+    for shard in shards:
+        offsets.append(doc_id)
+        for p in groups[(shard["productCategory"], shard["store"])]:
+            for token in search_tokens(p["name"]):
+                postings.setdefault(token, []).append(doc_id)
+            doc_id += 1
+    tokens = sorted(postings)
+    return {
+        "offsets": offsets,
+        "tokens": tokens,
+        "postings": [[ids[0]] + [b - a for a, b in zip(ids, ids[1:])] for ids in (postings[t] for t in tokens)],
+    }
+
+SORT_KEYS = ("latest_price", "price_per_unit")
+
+def published_product(p, on_sale):
+    """Product as published in shards: recent entries inline, full history in its bucket"""
+    published = {k: v for k, v in p.items() if k not in ("productCategory", "entries")}
+    published["entries"] = (p.get("entries") or [])[-INLINE_ENTRIES:]
+    published["history_bucket"] = history_bucket(p["name"])
+    published["on_sale"] = on_sale
+    return published
+
+def sort_value(p, key):
+    """Missing or zero prices sort last"""
+    value = p.get(key) or 0
+    return value if value > 0 else float("inf")
+
+def sort_orders(group):
+    """Indexes into group, pre-sorted by each sort key (ties by name)"""
+    return {key: sorted(range(len(group)), key=lambda i: (sort_value(group[i], key), group[i]["name"]))
+            for key in SORT_KEYS}
+
+def aggregate(products, sources):
+    """Everything the builder needs, gathered in a single pass over the products.
+
+    Returns shard groups, history buckets, per-category and per-store counts,
+    the source key -> productCategory map and the sale list (by discount).
+    """
+    groups, buckets, sale_products = {}, {}, []
+    category_counts, store_counts = {}, {}
     for p in products:
-        entries = p.get('entries', [])
-        if len(entries) > 1:
-            current_price = p.get('latest_price', 0)
-            previous_price = entries[-2].get('p', 0)
-            if current_price < previous_price:
-                discount_pct = ((previous_price - current_price) / previous_price) * 100
-                sale_products.append({
-                    **p,
-                    'previous_price': previous_price,
-                    'discount_pct': discount_pct,
-                    'savings': previous_price - current_price
-                })
-    
-    # Sort by discount percentage
-    sale_products.sort(key=lambda x: x['discount_pct'], reverse=True)
-    
-    # Build product category counts
-    product_category_counts = {}
+        product_category, store = p["productCategory"], p.get("store", "Unknown")
+        groups.setdefault((product_category, store), []).append(p)
+        if product_category:
+            category_counts[product_category] = category_counts.get(product_category, 0) + 1
+        store_counts[store] = store_counts.get(store, 0) + 1
+
+        entries = p.get('entries') or []
+        if entries:
+            buckets.setdefault(history_bucket(p["name"]), {})[p["name"]] = entries
+        if price_stats.is_on_sale(p.get("stats")):
+            sale_products.append(p)
+
+    # Biggest discount against the typical price first
+    sale_products.sort(key=lambda x: x["stats"]["discount_pct"], reverse=True)
+
+    return {
+        "groups": groups,
+        "buckets": buckets,
+        "sale_products": sale_products,
+        "sale_names": {p["name"] for p in sale_products},
+        "category_counts": category_counts,
+        "store_counts": store_counts,
+        "source_categories": {s["key"]: s.get("productCategory", "") for s in sources},
+    }
+
+def assign_product_categories(products, sources, product_categories):
+    """Set productCategory on every product from its source (case/whitespace-insensitive).
+    Products whose source has no known productCategory get ''."""
+    canonical = {c.strip().lower(): c for c in product_categories}
+    by_source = {}
     for source in sources:
-        cat = source.get('productCategory', '')
-        if cat:
-            if cat not in product_category_counts:
-                product_category_counts[cat] = 0
-            # Count products in this source
-            source_products = [p for p in products if p.get('category') == source['key']]
-            product_category_counts[cat] += len(source_products)
-    
-    # Generate sidebar with collapsible categories
-    sidebar_links = ""
-    
-    # Product Categories Section (collapsible)
-    if product_categories:
-        sidebar_links += '''
-        <div class="filter-section">
-            <div class="filter-title" onclick="toggleCategories()" style="cursor: pointer; display: flex; justify-content: space-between; align-items: center;">
-                <span data-i18n="categories">🏷️ Categories</span>
-                <span id="categories-arrow">▼</span>
-            </div>
-            <div id="product-categories" class="product-categories">'''
-        
-        for cat in product_categories:
-            count = product_category_counts.get(cat, 0)
-            sidebar_links += f'''
-                <label class="filter-checkbox">
-                    <input type="checkbox" checked onchange="filterByProductCategory()" data-product-category="{cat}">
-                    <span>{cat}</span>
-                    <span class="count">({count})</span>
-                </label>'''
-        
-        sidebar_links += '''
-            </div>
-        </div>'''
-    
-    # Stores Filter Section
-    stores = list(set([source['store'] for source in sources]))
-    stores.sort()
-    
-    sidebar_links += '<div class="filter-section">'
-    sidebar_links += '<div class="filter-title" data-i18n="stores">Stores</div>'
-    for store in stores:
-        display_name = "Maxima" if store == "Barbora" else store
-        sidebar_links += f'''
-        <label class="filter-checkbox">
-            <input type="checkbox" checked onchange="filterByStore()" data-store="{store}">
-            <span class="store-label-sm store-label-{store}">{display_name}</span>
-        </label>'''
-    sidebar_links += '</div>'
-    
-    # Quick Filters
-    sidebar_links += '<div class="filter-section">'
-    sidebar_links += '<div class="filter-title" data-i18n="quick_filters">Quick Filters</div>'
-    sidebar_links += '''
-        <label class="filter-checkbox">
-            <input type="checkbox" id="filter-favorites" onchange="applyFilters()">
-            <span data-i18n="favorites_only">⭐ Favorites only</span>
-        </label>
-        <label class="filter-checkbox">
-            <input type="checkbox" id="filter-sales" onchange="applyFilters()">
-            <span data-i18n="on_sale">🔥 On sale</span>
-        </label>
-    </div>'''
-    
-    # Admin link at bottom
-    sidebar_links += '''
-    <div class="filter-section" style="border-bottom: none; padding-top: 20px;">
-        <a href="admin.html" class="admin-link">
-            <span style="font-size: 18px;">⚙️</span>
-            <span data-i18n="admin">Admin</span>
-        </a>
-    </div>'''
-    
-    html_template = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <title data-i18n="title">Price Tracker</title>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>
-        * {{ box-sizing: border-box; }}
-        body {{ font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background:#f8f9fa; margin:0; display: flex; color: #1a1a1a; min-height: 100vh; }}
-        
-        /* Language Switcher */
-        .lang-switcher {{
-            display: flex;
-            gap: 8px;
-            padding: 15px 20px;
-            border-bottom: 1px solid #f3f4f6;
-        }}
-        
-        .lang-btn {{
-            background: none;
-            border: 2px solid transparent;
-            cursor: pointer;
-            font-size: 24px;
-            padding: 4px 8px;
-            border-radius: 6px;
-            transition: 0.15s;
-            opacity: 0.5;
-        }}
-        
-        .lang-btn:hover {{
-            opacity: 0.8;
-            background: #f9fafb;
-        }}
-        
-        .lang-btn.active {{
-            opacity: 1;
-            border-color: #10b981;
-            background: #f0fdf4;
-        }}
-        
-        /* Hamburger Menu */
-        .hamburger {{
-            display: none;
-            position: fixed;
-            top: 15px;
-            left: 15px;
-            z-index: 1001;
-            background: white;
-            border: 1px solid #e5e7eb;
-            border-radius: 8px;
-            width: 44px;
-            height: 44px;
-            cursor: pointer;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-            gap: 4px;
-            padding: 0;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-            transition: transform 0.3s ease, opacity 0.3s ease;
-        }}
-        
-        .hamburger.hide {{
-            transform: translateY(-80px);
-            opacity: 0;
-            pointer-events: none;
-        }}
-        
-        .hamburger span {{
-            display: block;
-            width: 20px;
-            height: 2px;
-            background: #374151;
-            border-radius: 2px;
-            transition: 0.3s;
-        }}
-        
-        .hamburger.active span:nth-child(1) {{
-            transform: rotate(45deg) translate(5px, 5px);
-        }}
-        
-        .hamburger.active span:nth-child(2) {{
-            opacity: 0;
-        }}
-        
-        .hamburger.active span:nth-child(3) {{
-            transform: rotate(-45deg) translate(6px, -6px);
-        }}
-        
-        .sidebar-overlay {{
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: rgba(0,0,0,0.5);
-            z-index: 999;
-        }}
-        
-        /* Sidebar */
-        .sidebar {{ 
-            width: 260px; 
-            background: white; 
-            color: #374151; 
-            height: 100vh; 
-            position: fixed; 
-            padding: 25px 0 0 0; 
-            box-sizing: border-box; 
-            overflow-y: auto; 
-            z-index: 10;
-            border-right: 1px solid #e5e7eb;
-            display: flex;
-            flex-direction: column;
-        }}
-        
-        .sidebar h2 {{ 
-            font-size: 18px; 
-            color: #111827; 
-            margin: 0 20px 5px; 
-            font-weight: 700;
-        }}
-        
-        .last-run {{ 
-            font-size: 11px; 
-            color: #9ca3af; 
-            margin: 0 20px 15px; 
-            display:block; 
-        }}
-        
-        .filter-section {{
-            padding: 15px 20px;
-            border-bottom: 1px solid #f3f4f6;
-        }}
-        
-        .filter-title {{
-            font-size: 12px;
-            font-weight: 700;
-            text-transform: uppercase;
-            color: #6b7280;
-            margin-bottom: 12px;
-            letter-spacing: 0.5px;
-        }}
-        
-        .product-categories {{
-            max-height: 300px;
-            overflow-y: auto;
-            transition: max-height 0.3s ease;
-        }}
-        
-        .product-categories.collapsed {{
-            max-height: 0;
-            overflow: hidden;
-        }}
-        
-        .filter-checkbox {{
-            display: flex;
-            align-items: center;
-            padding: 8px 0;
-            cursor: pointer;
-            font-size: 14px;
-            color: #374151;
-            transition: 0.15s;
-        }}
-        
-        .filter-checkbox:hover {{
-            color: #111827;
-        }}
-        
-        .filter-checkbox input[type="checkbox"] {{
-            width: 18px;
-            height: 18px;
-            margin-right: 10px;
-            cursor: pointer;
-            accent-color: #10b981;
-        }}
-        
-        .filter-checkbox .count {{
-            margin-left: auto;
-            font-size: 12px;
-            color: #9ca3af;
-        }}
-        
-        .store-label-sm {{ 
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 10px;
-            padding: 2px 8px;
-            border-radius: 4px;
-            font-weight: 600;
-            text-transform: uppercase;
-            margin-left: 4px;
-        }}
-        
-        .store-label-Barbora {{ background: #1e3a8a; color: #ffffff; }}
-        .store-label-Selver {{ background: #fef3c7; color: #92400e; }}
-        .store-label-Rimi {{ background: #fee2e2; color: #991b1b; }}
-        .store-label-Coop {{ background: #dbeafe; color: #1e40af; }}
-        .store-label-Unknown {{ background: #f3f4f6; color: #6b7280; }}
-        
-        .admin-link {{
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            padding: 12px 15px;
-            background: #f9fafb;
-            border: 1px solid #e5e7eb;
-            border-radius: 8px;
-            text-decoration: none;
-            color: #374151;
-            font-weight: 600;
-            font-size: 14px;
-            transition: 0.15s;
-        }}
-        
-        .admin-link:hover {{
-            background: #f3f4f6;
-            color: #111827;
-            border-color: #d1d5db;
-        }}
-        
-        .main {{ 
-            margin-left: 260px; 
-            flex: 1; 
-            padding: 0 40px 40px 40px; 
-            max-width: 100%;
-            width: calc(100% - 260px);
-            overflow-x: hidden;
-        }}
-
-        /* STICKY HEADER - Always sticky on desktop, smart hide on mobile */
-        .header {{ 
-            position: sticky; 
-            top: 0; 
-            background: #f8f9fa; 
-            padding: 20px 0; 
-            z-index: 100; 
-            display: flex; 
-            justify-content: space-between; 
-            align-items: center; 
-            border-bottom: 1px solid #e5e7eb;
-            transition: transform 0.3s ease;
-        }}
-        
-        /* Mobile only: hide on scroll down */
-        @media (max-width: 768px) {{
-            .header.hide {{
-                transform: translateY(-100%);
-            }}
-        }}
-        
-        .controls {{ 
-            display: flex; 
-            gap: 12px; 
-            background: white; 
-            padding: 6px; 
-            border-radius: 12px; 
-            box-shadow: 0 1px 3px rgba(0,0,0,0.05); 
-            align-items: center; 
-            width: 100%; 
-            justify-content: space-between;
-            border: 1px solid #e5e7eb;
-        }}
-        
-        .btn {{ 
-            padding: 10px 18px; 
-            border-radius: 8px; 
-            border: none; 
-            cursor: pointer; 
-            font-weight: 600; 
-            font-size: 14px; 
-            background: transparent; 
-            color: #6b7280; 
-            transition: 0.15s; 
-        }}
-        
-        .btn-active {{ 
-            background: #10b981; 
-            color: white; 
-        }}
-        
-        .btn:hover:not(.btn-active) {{
-            background: #f3f4f6;
-            color: #374151;
-        }}
-        
-        .search-box {{ 
-            padding: 10px 15px; 
-            border-radius: 8px; 
-            border: 1px solid #e5e7eb; 
-            width: 300px; 
-            font-size: 14px; 
-            outline: none; 
-        }}
-        
-        .search-box:focus {{ 
-            border-color: #10b981; 
-            box-shadow: 0 0 0 3px rgba(16, 185, 129, 0.1); 
-        }}
-
-        /* Filter Indicator */
-        .filter-indicator {{
-            background: white;
-            border: 1px solid #e5e7eb;
-            border-radius: 8px;
-            padding: 12px 16px;
-            margin-top: 20px;
-            font-size: 13px;
-            color: #6b7280;
-            display: none;
-            align-items: center;
-            gap: 10px;
-            flex-wrap: wrap;
-        }}
-        
-        .filter-indicator.show {{
-            display: flex;
-        }}
-        
-        .filter-tag {{
-            display: inline-flex;
-            align-items: center;
-            gap: 6px;
-            background: #f3f4f6;
-            padding: 6px 10px;
-            border-radius: 6px;
-            font-weight: 600;
-            color: #374151;
-            font-size: 13px;
-        }}
-        
-        .filter-tag-remove {{
-            cursor: pointer;
-            color: #6b7280;
-            font-weight: 700;
-            font-size: 16px;
-            line-height: 1;
-            transition: 0.15s;
-            margin-left: 2px;
-        }}
-        
-        .filter-tag-remove:hover {{
-            color: #ef4444;
-        }}
-        
-        .clear-all-btn {{
-            background: #ef4444;
-            color: white;
-            border: none;
-            padding: 6px 12px;
-            border-radius: 6px;
-            cursor: pointer;
-            font-weight: 600;
-            font-size: 13px;
-            transition: 0.15s;
-            margin-left: auto;
-        }}
-        
-        .clear-all-btn:hover {{
-            background: #dc2626;
-        }}
-
-        /* FAVORITES/SALES SECTIONS */
-        .favorites-section, .sales-section {{
-            margin-top: 30px;
-            scroll-margin-top: 100px;
-            background: white;
-            border-radius: 12px;
-            padding: 20px 25px;
-            border: 1px solid #e5e7eb;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.05);
-        }}
-        
-        .sales-section {{
-            border-color: #fee2e2;
-        }}
-        
-        .favorites-section {{
-            display: none;
-        }}
-        
-        .section-title {{
-            font-size: 16px;
-            font-weight: 700;
-            color: #374151;
-            margin-bottom: 5px;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }}
-        
-        .section-subtitle {{
-            color: #9ca3af;
-            font-size: 13px;
-            margin-bottom: 20px;
-        }}
-        
-        .sale-badge {{
-            background: #fee2e2;
-            color: #991b1b;
-            font-size: 11px;
-            font-weight: 700;
-            padding: 3px 8px;
-            border-radius: 4px;
-        }}
-        
-        .carousel-container {{
-            position: relative;
-            overflow: hidden;
-            touch-action: pan-y pinch-zoom;
-            cursor: grab;
-        }}
-        
-        .carousel-container:active {{
-            cursor: grabbing;
-        }}
-        
-        .carousel-track {{
-            display: flex;
-            gap: 15px;
-            transition: transform 0.3s ease;
-            user-select: none;
-        }}
-        
-        .carousel-card {{
-            min-width: 300px;
-            flex-shrink: 0;
-        }}
-        
-        .carousel-btn {{
-            position: absolute;
-            top: 50%;
-            transform: translateY(-50%);
-            background: white;
-            border: 1px solid #e5e7eb;
-            border-radius: 50%;
-            width: 36px;
-            height: 36px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            cursor: pointer;
-            font-size: 18px;
-            color: #6b7280;
-            transition: 0.15s;
-            z-index: 2;
-        }}
-        
-        .carousel-btn:hover {{
-            background: #f9fafb;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }}
-        
-        .carousel-btn-left {{ left: -15px; }}
-        .carousel-btn-right {{ right: -15px; }}
-        
-        .carousel-btn:disabled {{
-            opacity: 0.3;
-            cursor: not-allowed;
-        }}
-        
-        .expand-sales-btn {{
-            background: white;
-            border: 1px solid #e5e7eb;
-            color: #6b7280;
-            padding: 8px 14px;
-            border-radius: 8px;
-            cursor: pointer;
-            font-weight: 600;
-            font-size: 13px;
-            transition: 0.15s;
-        }}
-        
-        .expand-sales-btn:hover {{
-            background: #f9fafb;
-            color: #374151;
-        }}
-        
-        .discount-badge {{
-            position: absolute;
-            top: 8px;
-            left: 8px;
-            background: #ef4444;
-            color: white;
-            font-size: 12px;
-            font-weight: 700;
-            padding: 4px 8px;
-            border-radius: 6px;
-        }}
-
-        /* PRODUCT CATEGORY SECTIONS */
-        .product-cat-section {{ 
-            margin-top: 30px; 
-            scroll-margin-top: 100px; 
-        }}
-        
-        .product-cat-title {{ 
-            font-size: 20px; 
-            font-weight: 700; 
-            color: #111827; 
-            margin-bottom: 20px; 
-            padding-left: 12px;
-            border-left: 4px solid #10b981; 
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }}
-        
-        .grid {{ 
-            display: grid; 
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); 
-            gap: 15px; 
-            width: 100%;
-        }}
-        
-        .card {{ 
-            background:white; 
-            border-radius:10px; 
-            padding:15px; 
-            box-shadow:0 1px 3px rgba(0,0,0,0.05); 
-            display:flex; 
-            gap:15px; 
-            text-decoration:none; 
-            color:inherit; 
-            height: 130px; 
-            position: relative; 
-            transition: 0.15s; 
-            border: 1px solid #e5e7eb; 
-            cursor: pointer;
-        }}
-        
-        .card:hover {{ 
-            transform: translateY(-2px); 
-            box-shadow: 0 4px 12px rgba(0,0,0,0.08);
-            border-color: #d1d5db;
-        }}
-
-        .store-badge {{ 
-            position: absolute; 
-            top: 8px; 
-            right: 8px; 
-            font-size: 9px; 
-            padding: 3px 6px; 
-            border-radius: 4px; 
-            font-weight: 700; 
-            text-transform: uppercase; 
-        }}
-        
-        .store-Barbora {{ background: #1e3a8a; color: #ffffff; }}
-        .store-Selver {{ background: #fef3c7; color: #92400e; }}
-        .store-Rimi {{ background: #fee2e2; color: #991b1b; }}
-        .store-Coop {{ background: #dbeafe; color: #1e40af; }}
-
-        .card img {{ width:70px; height:100%; object-fit:contain; }}
-        .info {{ flex: 1; display: flex; flex-direction: column; justify-content: center; }}
-        .name {{ font-size:13px; font-weight:600; line-height:1.4; max-height: 2.8em; overflow: hidden; margin-bottom: 5px; color: #1f2937; }}
-        
-        .fav-btn {{
-            position: absolute;
-            bottom: 8px;
-            right: 8px;
-            background: white;
-            border: 1px solid #e5e7eb;
-            border-radius: 50%;
-            width: 32px;
-            height: 32px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            cursor: pointer;
-            font-size: 14px;
-            transition: 0.15s;
-            z-index: 5;
-            pointer-events: auto;
-        }}
-        
-        .fav-btn:hover {{
-            border-color: #fbbf24;
-            background: #fffbeb;
-            transform: scale(1.05);
-        }}
-        
-        .fav-btn.active {{
-            background: #fef3c7;
-            border-color: #f59e0b;
-        }}
-        
-        .price-container {{ display: flex; align-items: baseline; gap: 6px; }}
-        .price {{ font-size:20px; font-weight:700; color: #111827; }}
-        .price-sale {{ 
-            background-color: #d1fae5;
-            color: #065f46;
-            padding: 2px 6px;
-            border-radius: 4px;
-            font-weight: 700;
-        }}
-        
-        .price-old {{ font-size: 14px; color: #9ca3af; text-decoration: line-through; font-weight: 500; }}
-        .per-l {{ color:#059669; font-weight:600; font-size:12px; }}
-        
-        .expand-bar {{ 
-            grid-column: 1 / -1; 
-            background: #f9fafb; 
-            border: 1px solid #e5e7eb; 
-            color: #6b7280; 
-            text-align: center; 
-            padding: 12px; 
-            border-radius: 8px; 
-            cursor: pointer; 
-            font-weight: 600; 
-            margin-top: 10px; 
-            transition: 0.15s;
-        }}
-        
-        .expand-bar:hover {{
-            background: white;
-            color: #374151;
-        }}
-        
-        .hidden {{ display: none; }}
-        
-        #search-results-title {{ 
-            display: none; 
-            margin-top: 30px; 
-            color: #374151; 
-            border-left: 3px solid #10b981; 
-            padding-left: 12px; 
-            font-size: 18px; 
-            font-weight: 700; 
-        }}
-        
-        .empty-state {{
-            text-align: center;
-            padding: 60px 20px;
-            color: #9ca3af;
-        }}
-        
-        .empty-state-icon {{
-            font-size: 48px;
-            margin-bottom: 16px;
-        }}
-
-        /* MODAL STYLES */
-        .modal {{
-            display: none;
-            position: fixed;
-            z-index: 2000;
-            top: 0; left: 0;
-            width: 100%; height: 100%;
-            background: rgba(0,0,0,0.8);
-            align-items: center;
-            justify-content: center;
-            backdrop-filter: blur(4px);
-        }}
-        .modal-content {{
-            width: 90%;
-            max-width: 500px;
-            background: white;
-            padding: 25px;
-            border-radius: 16px;
-            position: relative;
-            max-height: 85vh;
-            overflow-y: auto;
-            box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.1);
-        }}
-        .modal-close {{
-            position: absolute;
-            top: 15px; right: 20px;
-            font-size: 28px;
-            cursor: pointer;
-            color: #9ca3af;
-            transition: 0.15s;
-        }}
-        .modal-close:hover {{ color: #111827; }}
-        .history-table {{
-            width: 100%;
-            border-collapse: collapse;
-            margin-top: 20px;
-        }}
-        .history-table th {{
-            text-align: left;
-            font-size: 12px;
-            text-transform: uppercase;
-            color: #6b7280;
-            padding: 10px;
-            border-bottom: 2px solid #f3f4f6;
-        }}
-        .history-table td {{
-            padding: 12px 10px;
-            border-bottom: 1px solid #f3f4f6;
-            font-size: 14px;
-        }}
-        .price-up {{ color: #ef4444; font-weight: 600; }}
-        .price-down {{ color: #10b981; font-weight: 600; }}
-        .view-store-btn {{
-            display: block;
-            width: 100%;
-            text-align: center;
-            background: #111827;
-            color: white;
-            text-decoration: none;
-            padding: 12px;
-            border-radius: 8px;
-            font-weight: 600;
-            margin-top: 25px;
-            transition: 0.15s;
-        }}
-        .view-store-btn:hover {{ background: #374151; }}
-        
-        /* MOBILE RESPONSIVE */
-        @media (max-width: 768px) {{
-            body {{ display: block; }}
-            .hamburger {{ display: flex; }}
-            
-            .sidebar {{
-                position: fixed;
-                left: -260px;
-                transition: left 0.3s ease;
-                z-index: 1000;
-            }}
-            
-            .sidebar.active {{ left: 0; }}
-            .sidebar-overlay.active {{ display: block; }}
-            
-            .main {{
-                margin-left: 0;
-                padding: 80px 15px 40px 15px;
-                width: 100%;
-            }}
-            
-            .header {{ padding: 15px 0; }}
-            
-            .controls {{
-                flex-direction: column;
-                gap: 12px;
-                padding: 12px;
-            }}
-            
-            .controls > div {{
-                width: 100%;
-                display: flex;
-                gap: 8px;
-            }}
-            
-            .btn {{
-                flex: 1;
-                padding: 12px 10px;
-                font-size: 15px;
-            }}
-            
-            .search-box {{
-                width: 100%;
-                padding: 12px 15px;
-                font-size: 16px;
-            }}
-            
-            .grid {{
-                grid-template-columns: 1fr;
-                gap: 12px;
-            }}
-            
-            .card {{
-                height: 140px;
-                padding: 15px;
-                gap: 12px;
-            }}
-            
-            .card img {{ width: 80px; }}
-            .name {{ font-size: 14px; line-height: 1.5; }}
-            .price {{ font-size: 22px; }}
-            .price-old {{ font-size: 16px; }}
-            .per-l {{ font-size: 13px; }}
-            
-            .fav-btn {{
-                width: 38px;
-                height: 38px;
-                font-size: 16px;
-            }}
-            
-            .carousel-card {{
-                min-width: calc(100% - 70px);
-                max-width: calc(100% - 70px);
-            }}
-            
-            .carousel-track {{ padding: 0 5px; }}
-            
-            .carousel-btn {{
-                width: 32px;
-                height: 32px;
-                font-size: 16px;
-            }}
-            
-            .carousel-btn-left {{ left: 0; }}
-            .carousel-btn-right {{ right: 0; }}
-        }}
-        
-        /* Desktop responsiveness fixes */
-        @media (min-width: 769px) and (max-width: 1400px) {{
-            .main {{
-                padding: 0 30px 40px 30px;
-            }}
-            
-            .grid {{
-                grid-template-columns: repeat(auto-fill, minmax(280px, 1fr));
-            }}
-        }}
-        
-        @media (min-width: 1401px) {{
-            .main {{
-                padding: 0 50px 40px 50px;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <button class="hamburger" id="hamburger" onclick="toggleMenu()">
-        <span></span>
-        <span></span>
-        <span></span>
-    </button>
-    
-    <div class="sidebar-overlay" id="sidebar-overlay" onclick="toggleMenu()"></div>
-    
-    <div class="sidebar" id="sidebar">
-        <h2>📊 <span data-i18n="title">Price Tracker</span></h2>
-        <span class="last-run"><span data-i18n="updated">Updated</span>: {last_run[:10]}</span>
-        
-        <div class="lang-switcher">
-            <button class="lang-btn" data-lang="et" onclick="setLanguage('et')" title="Eesti">🇪🇪</button>
-            <button class="lang-btn" data-lang="en" onclick="setLanguage('en')" title="English">🇬🇧</button>
-        </div>
-        
-        {sidebar_links}
-    </div>
+        cat = (source.get("productCategory") or "").strip().lower()
+        by_source[source["key"].strip().lower()] = canonical.get(cat, "")
+    for p in products:
+        p["productCategory"] = by_source.get((p.get("category") or "").strip().lower(), "")
+
+def write_data_files(cache, agg, sources, product_categories, last_run):
+    """Write the catalogue as per productCategory/store shards plus the sale list and a manifest.
+
+    The page only fetches the manifest up front and pulls shards as their sections are needed.
+    """
+    category_order = {c: i for i, c in enumerate(product_categories)}
+    groups, sale_names = agg["groups"], agg["sale_names"]
+    delta = DeltaLog()
+
+    shards = []
+    digests = []
+    for (product_category, store), group in sorted(
+            groups.items(), key=lambda kv: (category_order.get(kv[0][0], len(category_order)), kv[0][1])):
+        file_name = shard_file_name(product_category, store)
+        group.sort(key=lambda p: p["name"])
+        inputs = digest(CODE_VERSION + json.dumps(group, sort_keys=True, ensure_ascii=False))
+        digests.append(cache.emit(os.path.join(SHARD_DIR, file_name), inputs, lambda group=group: to_json({
+            "products": [published_product(p, p["name"] in sale_names) for p in group],
+            "order": sort_orders(group),
+        }), delta.record))
+        shards.append({"file": file_name, "productCategory": product_category, "store": store, "count": len(group)})
+
+    # Drop shards of categories/stores that no longer have products
+    delta.record_removed(remove_stale_files(SHARD_DIR, {s["file"] for s in shards}))
+
+    buckets = agg["buckets"]
+    for bucket, histories in sorted(buckets.items()):
+        histories = dict(sorted(histories.items()))
+        inputs = digest(CODE_VERSION + json.dumps(histories, ensure_ascii=False))
+        digests.append(cache.emit(os.path.join(HISTORY_DIR, f"{bucket}.json"), inputs,
+                                  lambda histories=histories: to_json(histories), delta.record))
+    delta.record_removed(remove_stale_files(HISTORY_DIR, {f"{b}.json" for b in buckets}))
+
+    index_payload = to_json(search_index(shards, groups))
+    digests.append(cache.emit(SEARCH_FILE, digest(CODE_VERSION + index_payload), lambda: index_payload, delta.record))
+
+    shard_by_product = {}
+    for shard in shards:
+        for p in groups[(shard["productCategory"], shard["store"])]:
+            shard_by_product[p["name"]] = shard["file"]
+    sales_payload = to_json({"products": [
+        {**published_product(p, True), "productCategory": p["productCategory"], "shard": shard_by_product[p["name"]]}
+        for p in agg["sale_products"]
+    ]})
+    digests.append(cache.emit(SALES_FILE, digest(CODE_VERSION + sales_payload), lambda: sales_payload, delta.record))
+
+    # The worker is versioned together with the data it reads
+    digests.append(cache.emit(WORKER_FILE, digest(CATALOG_WORKER_JS), lambda: CATALOG_WORKER_JS))
+    # The service worker must keep a stable URL; browsers re-check it on every visit
+    cache.emit(SERVICE_WORKER_FILE, digest(SERVICE_WORKER_JS), lambda: SERVICE_WORKER_JS)
+
+    version = hashlib.sha1("".join(digests).encode("ascii")).hexdigest()[:12]
+    manifest = {
+        "version": version,
+        "lastRun": last_run,
+        "translations": TRANSLATIONS,
+        "sources": sources,
+        "productCategories": product_categories,
+        "shards": shards,
+        "sourceCategories": agg["source_categories"],
+        "counts": {"categories": agg["category_counts"], "stores": agg["store_counts"]},
+        "deltas": delta.write(version),
+    }
+    manifest_payload = to_json(manifest)
+    cache.emit(MANIFEST_FILE, digest(manifest_payload), lambda: manifest_payload)
+    return manifest
+
+# Filtering, sorting and search for the page, run in a Web Worker
+CATALOG_WORKER_JS = r"""// Catalogue worker for index.html, written by build_site.py.
+// Holds the loaded shards, the sale list and the search index, and answers filter, sort
+// and search queries with ordered lists of product names, so the page only paints.
+// Shards are sent to the page once, with the first response after they load.
+// Where workers are unavailable (e.g. file://) the page runs createCatalog() itself.
+
+function createCatalog(post) {
+    const SEARCH_EXACT_SCORE = 3;
+    const SEARCH_PREFIX_SCORE = 1;
+
+    let version = '';
+    let shards = [];                  // manifest.shards
+    const shardOrders = new Map();    // shard file -> {sortKey: products pre-sorted by the builder}
+    const shardProducts = new Map();  // shard file -> products in published (name) order
+    const shardRequests = new Map();  // shard file -> pending/settled Promise
+    const undelivered = new Map();    // shard file -> products not yet sent to the page
+    let salesRequest = null;
+    let searchIndexRequest = null;
+
+    function dataUrl(path) {
+        return `data/${path}?v=${version}`;
+    }
+
+    async function fetchJson(path) {
+        const response = await fetch(dataUrl(path));
+        if (!response.ok) throw new Error(`${path}: HTTP ${response.status}`);
+        return response.json();
+    }
+
+    function loadShard(shard) {
+        if (!shardRequests.has(shard.file)) {
+            const request = fetchJson(`shards/${shard.file}`).then(data => {
+                data.products.forEach(p => {
+                    p.shard = shard.file;
+                    p.productCategory = shard.productCategory;
+                });
+                const orders = {};
+                Object.entries(data.order).forEach(([key, indexes]) => {
+                    orders[key] = indexes.map(i => data.products[i]);
+                });
+                shardOrders.set(shard.file, orders);
+                shardProducts.set(shard.file, data.products);
+                undelivered.set(shard.file, data.products);
+            }).catch(err => {
+                shardRequests.delete(shard.file); // allow a retry on the next request
+                console.error('Could not load shard', shard.file, err);
+            });
+            shardRequests.set(shard.file, request);
+        }
+        return shardRequests.get(shard.file);
+    }
+
+    function loadShards(files) {
+        const wanted = new Set(files);
+        return Promise.all(shards.filter(s => wanted.has(s.file)).map(loadShard));
+    }
+
+    function loadSearchIndex() {
+        if (!searchIndexRequest) {
+            searchIndexRequest = fetchJson('search.json').then(index => {
+                // Postings are delta-encoded
+                index.postings = index.postings.map(deltas => {
+                    let id = 0;
+                    return deltas.map(d => (id += d));
+                });
+                return index;
+            }).catch(err => {
+                searchIndexRequest = null;
+                throw err;
+            });
+        }
+        return searchIndexRequest;
+    }
+
+    // FILTERS AND SORTING
+    // filters: {stores, categories, favorites, favoritesOnly, salesOnly, sort}
+    function matcher(filters) {
+        const stores = new Set(filters.stores);
+        const categories = new Set(filters.categories);
+        const favorites = new Set(filters.favorites);
+        return p => stores.has(p.store)
+            && (!p.productCategory || categories.has(p.productCategory))
+            && (!filters.favoritesOnly || favorites.has(p.name))
+            && (!filters.salesOnly || p.on_sale);
+    }
+
+    // Missing or zero prices sort last, as in the builder's pre-sorted orders
+    function comparator(sort) {
+        const value = p => (p[sort] > 0 ? p[sort] : Infinity);
+        return (a, b) => value(a) - value(b) || (a.name < b.name ? -1 : a.name > b.name ? 1 : 0);
+    }
+
+    // Merge the builder's per-shard orders for one sort key (no re-sorting)
+    function mergeShards(files, sort) {
+        const compare = comparator(sort);
+        const lists = files.map(file => shardOrders.get(file)[sort]);
+        if (lists.length === 1) return lists[0].slice();
+        const merged = [];
+        const pos = lists.map(() => 0);
+        for (;;) {
+            let best = -1;
+            for (let i = 0; i < lists.length; i++) {
+                if (pos[i] < lists[i].length && (best < 0 || compare(lists[i][pos[i]], lists[best][pos[best]]) < 0)) best = i;
+            }
+            if (best < 0) return merged;
+            merged.push(lists[best][pos[best]++]);
+        }
+    }
+
+    // SEARCH
+    // Mirrors fold_text()/search_tokens() in build_site.py
+    function foldText(text) {
+        return text.normalize('NFKD').replace(/\p{M}/gu, '').toLowerCase();
+    }
+
+    function searchTokens(text) {
+        const folded = foldText(text).replace(/(\d),(\d)/g, '$1.$2').replace(/(\d) (c?l|ml)\b/g, '$1$2');
+        return (folded.match(/[a-z0-9.%]+/g) || []).map(t => t.replace(/^\.+|\.+$/g, '')).filter(Boolean);
+    }
+
+    // First index in a sorted array whose value is >= target
+    function lowerBound(values, target) {
+        let lo = 0, hi = values.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (values[mid] < target) lo = mid + 1; else hi = mid;
+        }
+        return lo;
+    }
+
+    // Doc ids number products shard by shard, in the order the shards list them
+    function docShard(index, id) {
+        const i = lowerBound(index.offsets, id + 1) - 1;
+        return { shard: shards[i], position: id - index.offsets[i] };
+    }
+
+    // Doc ids matching every query token (as a word prefix), with their scores
+    function searchIndex(index, query) {
+        let scores = null;
+        for (const q of new Set(searchTokens(query))) {
+            const matches = new Map();
+            for (let i = lowerBound(index.tokens, q); i < index.tokens.length && index.tokens[i].startsWith(q); i++) {
+                const score = index.tokens[i] === q ? SEARCH_EXACT_SCORE : SEARCH_PREFIX_SCORE;
+                index.postings[i].forEach(id => {
+                    if (!(matches.get(id) >= score)) matches.set(id, score);
+                });
+            }
+            if (scores) {
+                scores.forEach((score, id) => {
+                    if (matches.has(id)) scores.set(id, score + matches.get(id)); else scores.delete(id);
+                });
+            } else {
+                scores = matches;
+            }
+            if (scores.size === 0) break;
+        }
+        return scores || new Map();
+    }
+
+    // REQUESTS
+    const handlers = {
+        init(payload) {
+            version = payload.version;
+            shards = payload.shards;
+            salesRequest = fetchJson('sales.json').then(data => data.products);
+            return null;
+        },
+
+        async load({ files }) {
+            await loadShards(files);
+            return null;
+        },
+
+        // Product names per group (productCategory or source key), in sort order.
+        // Sections of shards that aren't loaded yet are left out.
+        async sections({ groupBy, files, filters }) {
+            const keep = matcher(filters);
+            let ordered;
+            if (filters.salesOnly) {
+                // The sale list is complete on its own
+                const wanted = new Set(files);
+                ordered = (await salesRequest).filter(p => wanted.has(p.shard)).sort(comparator(filters.sort));
+            } else {
+                ordered = mergeShards(files.filter(file => shardOrders.has(file)), filters.sort);
+            }
+            const groups = {};
+            ordered.forEach(p => {
+                if (!keep(p)) return;
+                const key = p[groupBy] || '';
+                (groups[key] || (groups[key] = [])).push(p.name);
+            });
+            return groups;
+        },
+
+        // Product names matching the query, best match first, then in sort order.
+        // Only the shards holding hits (in active stores and categories) are loaded.
+        async search({ query, filters }) {
+            const index = await loadSearchIndex();
+            const scores = searchIndex(index, query);
+            const stores = new Set(filters.stores);
+            const categories = new Set(filters.categories);
+            const files = new Set();
+            scores.forEach((_, id) => {
+                const { shard } = docShard(index, id);
+                if (stores.has(shard.store) && (!shard.productCategory || categories.has(shard.productCategory))) {
+                    files.add(shard.file);
+                }
+            });
+            await loadShards([...files]);
+
+            const keep = matcher(filters);
+            const score = new Map();
+            scores.forEach((value, id) => {
+                const { shard, position } = docShard(index, id);
+                const p = shardProducts.has(shard.file) && shardProducts.get(shard.file)[position];
+                if (p && keep(p)) score.set(p, value);
+            });
+            const compare = comparator(filters.sort);
+            return [...score.keys()].sort((a, b) => score.get(b) - score.get(a) || compare(a, b)).map(p => p.name);
+        },
+    };
+
+    return async function handle({ id, type, payload }) {
+        let message;
+        try {
+            message = { id, result: await handlers[type](payload) };
+        } catch (err) {
+            message = { id, error: String((err && err.message) || err) };
+        }
+        // Results may name products of shards the page hasn't seen yet, so send those along
+        message.shards = Object.fromEntries(undelivered);
+        undelivered.clear();
+        post(message);
+    };
+}
+
+if (typeof WorkerGlobalScope !== 'undefined' && self instanceof WorkerGlobalScope) {
+    const handle = createCatalog(message => self.postMessage(message));
+    self.onmessage = event => handle(event.data);
+}
+"""
+
+# Caches data files in IndexedDB and patches them with the per-build deltas
+SERVICE_WORKER_JS = r"""// Service worker for index.html, written by build_site.py.
+// Keeps the data files a visitor has fetched in IndexedDB. When a new build is published
+// it patches them with the deltas listed in the manifest, so a returning visitor only
+// downloads what changed. Too far behind (or on a first visit) files are fetched normally.
+
+const DB_NAME = 'price-tracker-data';
+const DB_VERSION = 1;
+const FILES = 'files'; // data file path (e.g. "shards/x.json") -> JSON text at the cached version
+const META = 'meta';   // "version" -> version of the cached files, "manifest" -> last manifest seen
+
+let dbRequest = null;
+const syncs = new Map(); // target version -> Promise of bringing the cache to it
+
+self.addEventListener('install', () => self.skipWaiting());
+self.addEventListener('activate', event => event.waitUntil(self.clients.claim()));
+
+self.addEventListener('fetch', event => {
+    if (event.request.method !== 'GET') return;
+    const url = new URL(event.request.url);
+    const dataRoot = new URL('data/', self.registration.scope);
+    if (!url.href.startsWith(dataRoot.href)) return;
+    const path = url.pathname.slice(dataRoot.pathname.length);
+    if (path === 'manifest.json') {
+        event.respondWith(manifestResponse(event));
+    } else if (url.searchParams.has('v') && !path.startsWith('deltas/')) {
+        event.respondWith(dataResponse(path, url.searchParams.get('v')));
+    }
+});
+
+// INDEXEDDB
+function openDb() {
+    if (!dbRequest) {
+        dbRequest = new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, DB_VERSION);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(FILES);
+                request.result.createObjectStore(META);
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return dbRequest;
+}
+
+async function transaction(store, mode, action) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(store, mode);
+        const request = action(tx.objectStore(store));
+        tx.oncomplete = () => resolve(request ? request.result : undefined);
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+const dbGet = (store, key) => transaction(store, 'readonly', s => s.get(key));
+const dbPut = (store, key, value) => transaction(store, 'readwrite', s => s.put(value, key));
+const dbDelete = (store, key) => transaction(store, 'readwrite', s => s.delete(key));
+const dbClear = store => transaction(store, 'readwrite', s => s.clear());
+
+// RESPONSES
+function dataUrl(path, version) {
+    const url = new URL(`data/${path}`, self.registration.scope);
+    if (version) url.searchParams.set('v', version);
+    return url.href;
+}
+
+function jsonResponse(text) {
+    return new Response(text, { headers: { 'Content-Type': 'application/json' } });
+}
+
+// Always ask the network for the manifest, falling back to the last one seen (offline)
+async function manifestResponse(event) {
+    try {
+        const response = await fetch(event.request);
+        if (response.ok) {
+            const text = await response.clone().text();
+            const manifest = JSON.parse(text);
+            await dbPut(META, 'manifest', text);
+            event.waitUntil(syncTo(manifest.version).catch(err => console.error('Delta sync failed', err)));
+        }
+        return response;
+    } catch (err) {
+        const text = await dbGet(META, 'manifest');
+        if (text) return jsonResponse(text);
+        throw err;
+    }
+}
+
+async function dataResponse(path, version) {
+    try {
+        await syncTo(version);
+        if (await dbGet(META, 'version') === version) {
+            const text = await dbGet(FILES, path);
+            if (text !== undefined) return jsonResponse(text);
+            const response = await fetch(dataUrl(path, version));
+            if (response.ok) {
+                const text = await response.clone().text();
+                // A newer build may have been synced in the meantime
+                if (await dbGet(META, 'version') === version) await dbPut(FILES, path, text);
+            }
+            return response;
+        }
+    } catch (err) {
+        console.error('Data cache unavailable', path, err);
+    }
+    return fetch(dataUrl(path, version));
+}
+
+// DELTAS
+// Deltas from version `from` to `to`, or null if the manifest doesn't reach back that far
+function deltaChain(deltas, from, to) {
+    const chain = [];
+    let version = from;
+    while (version !== to) {
+        const step = deltas.find(d => d.from === version);
+        if (!step) return null;
+        chain.push(step);
+        version = step.to;
+    }
+    return chain;
+}
+
+// Bring the cached files to version, if it's the version of the newest manifest
+function syncTo(version) {
+    if (!syncs.has(version)) {
+        const sync = (async () => {
+            const cached = await dbGet(META, 'version');
+            if (cached === version) return;
+            const text = await dbGet(META, 'manifest');
+            const manifest = text ? JSON.parse(text) : null;
+            if (!manifest || manifest.version !== version) return; // an older page; leave the cache alone
+            const chain = cached ? deltaChain(manifest.deltas || [], cached, version) : null;
+            if (chain) {
+                for (const step of chain) {
+                    const response = await fetch(dataUrl(`deltas/${step.file}`));
+                    if (!response.ok) throw new Error(`deltas/${step.file}: HTTP ${response.status}`);
+                    await applyDelta(await response.json());
+                }
+            } else {
+                await dbClear(FILES); // too far behind: start over, file by file
+            }
+            await dbPut(META, 'version', version);
+        })();
+        syncs.set(version, sync);
+        sync.catch(() => syncs.delete(version)); // retry on the next request
+    }
+    return syncs.get(version);
+}
+
+async function applyDelta(delta) {
+    for (const [path, change] of Object.entries(delta.files)) {
+        const text = await dbGet(FILES, path);
+        if (text === undefined) continue; // never fetched, nothing to patch
+        const data = JSON.parse(text);
+        patchProducts(data, change);
+        if (change.order) {
+            const position = new Map(change.order.map((name, i) => [name, i]));
+            data.products.sort((a, b) => position.get(a.name) - position.get(b.name));
+        } else if (path.startsWith('shards/')) {
+            sortShard(data);
+        }
+        await dbPut(FILES, path, JSON.stringify(data));
+    }
+    for (const path of [...delta.refetch, ...delta.removed]) {
+        await dbDelete(FILES, path);
+    }
+}
+
+function patchProducts(data, change) {
+    const products = new Map(data.products.map(p => [p.name, p]));
+    change.remove.forEach(name => products.delete(name));
+    change.upsert.forEach(p => products.set(p.name, p)); // changed products keep their place
+    data.products = [...products.values()];
+}
+
+// Shards list products by name, with indexes pre-sorted per sort key as sort_orders() does
+function sortShard(data) {
+    const byName = (a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : 0);
+    data.products.sort(byName);
+    const value = (p, key) => (p[key] > 0 ? p[key] : Infinity);
+    Object.keys(data.order || {}).forEach(key => {
+        data.order[key] = data.products.map((_, i) => i).sort((i, j) =>
+            value(data.products[i], key) - value(data.products[j], key) || byName(data.products[i], data.products[j]));
+    });
+}
+"""
+
+# Page stylesheet and script, written minified under content-hashed names (see site_assets)
+APP_CSS = r"""
+* { box-sizing: border-box; }
+body { font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background:#f8f9fa; margin:0; display: flex; color: #1a1a1a; min-height: 100vh; }
+
+/* Language Switcher */
+.lang-switcher {
+    display: flex;
+    gap: 8px;
+    padding: 15px 20px;
+    border-bottom: 1px solid #f3f4f6;
+}
+
+.lang-btn {
+    background: none;
+    border: 2px solid transparent;
+    cursor: pointer;
+    font-size: 24px;
+    padding: 4px 8px;
+    border-radius: 6px;
+    transition: 0.15s;
+    opacity: 0.5;
+}
+
+.lang-btn:hover {
+    opacity: 0.8;
+    background: #f9fafb;
+}
+
+.lang-btn.active {
+    opacity: 1;
+    border-color: #10b981;
+    background: #f0fdf4;
+}
+
+/* Hamburger Menu */
+.hamburger {
+    display: none;
+    position: fixed;
+    top: 15px;
+    left: 15px;
+    z-index: 1001;
+    background: white;
+    border: 1px solid #e5e7eb;
+    border-radius: 8px;
+    width: 44px;
+    height: 44px;
+    cursor: pointer;
+    flex-direction: column;
+    align-items: center;
+    justify-content: center;
+    gap: 4px;
+    padding: 0;
+    box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+    transition: transform 0.3s ease, opacity 0.3s ease;
+}
+
+.hamburger.hide {
+    transform: translateY(-80px);
+    opacity: 0;
+    pointer-events: none;
+}
+
+.hamburger span {
+    display: block;
+    width: 20px;
+    height: 2px;
+    background: #374151;
+    border-radius: 2px;
+    transition: 0.3s;
+}
+
+.hamburger.active span:nth-child(1) {
+    transform: rotate(45deg) translate(5px, 5px);
+}
+
+.hamburger.active span:nth-child(2) {
+    opacity: 0;
+}
+
+.hamburger.active span:nth-child(3) {
+    transform: rotate(-45deg) translate(6px, -6px);
+}
+
+.sidebar-overlay {
+    display: none;
+    position: fixed;
+    top: 0;
+    left: 0;
+    right: 0;
+    bottom: 0;
+    background: rgba(0,0,0,0.5);
+    z-index: 999;
+}
+
+/* Sidebar */
+.sidebar { 
+    width: 260px; 
+    background: white; 
+    color: #374151; 
+    height: 100vh; 
+    position: fixed; 
+    padding: 25px 0 0 0; 
+    box-sizing: border-box; 
+    overflow-y: auto; 
+    z-index: 10;
+    border-right: 1px solid #e5e7eb;
+    display: flex;
+    flex-direction: column;
+}
+
+.sidebar h2 { 
+    font-size: 18px; 
+    color: #111827; 
+    margin: 0 20px 5px; 
+    font-weight: 700;
+}
+
+.last-run { 
+    font-size: 11px; 
+    color: #9ca3af; 
+    margin: 0 20px 15px; 
+    display:block; 
+}
+
+.filter-section {
+    padding: 15px 20px;
+    border-bottom: 1px solid #f3f4f6;
+}
+
+.filter-title {
+    font-size: 12px;
+    font-weight: 700;
+    text-transform: uppercase;
+    color: #6b7280;
+    margin-bottom: 12px;
+    letter-spacing: 0.5px;
+}
+
+.product-categories {
+    max-height: 300px;
+    overflow-y: auto;
+    transition: max-height 0.3s ease;
+}
+
+.product-categories.collapsed {
+    max-height: 0;
+    overflow: hidden;
+}
+
+.filter-checkbox {
+    display: flex;
+    align-items: center;
+    padding: 8px 0;
+    cursor: pointer;
+    font-size: 14px;
+    color: #374151;
+    transition: 0.15s;
+}
+
+.filter-checkbox:hover {
+    color: #111827;
+}
+
+.filter-checkbox input[type="checkbox"] {
+    width: 18px;
+    height: 18px;
+    margin-right: 10px;
+    cursor: pointer;
+    accent-color: #10b981;
+}
+
+.filter-checkbox .count {
+    margin-left: auto;
+    font-size: 12px;
+    color: #9ca3af;
+}
+
+.store-label-sm { 
+    display: inline-flex;
+    align-items: center;
+    justify-content: center;
+    font-size: 10px;
+    padding: 2px 8px;
+    border-radius: 4px;
+    font-weight: 600;
+    text-transform: uppercase;
+    margin-left: 4px;
+}
+
+.store-label-Barbora { background: #1e3a8a; color: #ffffff; }
+.store-label-Selver { background: #fef3c7; color: #92400e; }
+.store-label-Rimi { background: #fee2e2; color: #991b1b; }
+.store-label-Coop { background: #dbeafe; color: #1e40af; }
+.store-label-Unknown { background: #f3f4f6; color: #6b7280; }
+
+.admin-link {
+    display: flex;
+    align-items: center;
+    gap: 10px;
+    padding: 12px 15px;
+    background: #f9fafb;
+    border: 1px solid #e5e7eb;
+    border-radius: 8px;
+    text-decoration: none;
+    color: #374151;
+    font-weight: 600;
+    font-size: 14px;
+    transition: 0.15s;
+}
+
+.admin-link:hover {
+    background: #f3f4f6;
+    color: #111827;
+    border-color: #d1d5db;
+}
+
+.main { 
+    margin-left: 260px; 
+    flex: 1; 
+    padding: 0 40px 40px 40px; 
+    max-width: 100%;
+    width: calc(100% - 260px);
+    overflow-x: hidden;
+}
+
+/* STICKY HEADER - Always sticky on desktop, smart hide on mobile */
+.header { 
+    position: sticky; 
+    top: 0; 
+    background: #f8f9fa; 
+    padding: 20px 0; 
+    z-index: 100; 
+    display: flex; 
+    justify-content: space-between; 
+    align-items: center; 
+    border-bottom: 1px solid #e5e7eb;
+    transition: transform 0.3s ease;
+}
+
+/* Mobile only: hide on scroll down */
+@media (max-width: 768px) {
+    .header.hide {
+        transform: translateY(-100%);
+    }
+}
+
+.controls { 
+    display: flex; 
+    gap: 12px; 
+    background: white; 
+    padding: 6px; 
+    border-radius: 12px; 
+    box-shadow: 0 1px 3px rgba(0,0,0,0.05); 
+    align-items: center; 
+    width: 100%; 
+    justify-content: space-between;
+    border: 1px solid #e5e7eb;
+}
+
+.btn { 
+    padding: 10px 18px; 
+    border-radius: 8px; 
+    border: none; 
+    cursor: pointer; 
+    font-weight: 600; 
+    font-size: 14px; 
+    background: transparent; 
+    color: #6b7280; 
+    transition: 0.15s; 
+}
+
+.btn-active { 
+    background: #10b981; 
+    color: white; 
+}
+
+.btn:hover:not(.btn-active) {
+    background: #f3f4f6;
+    color: #374151;
+}
+
+.search-box { 
+    padding: 10px 15px; 
+    border-radius: 8px; 
+    border: 1px solid #e5e7eb; 
+    width: 300px; 
+    font-size: 14px; 
+    outline: none; 
+}
+
+.search-box:focus { 
+    border-color: #10b981; 
+    box-shadow: 0 0 0 3px rgba(16, 185, 129, 0.1); 
+}
+
+/* Filter Indicator */
+.filter-indicator {
+    background: white;
+    border: 1px solid #e5e7eb;
+    border-radius: 8px;
+    padding: 12px 16px;
+    margin-top: 20px;
+    font-size: 13px;
+    color: #6b7280;
+    display: none;
+    align-items: center;
+    gap: 10px;
+    flex-wrap: wrap;
+}
+
+.filter-indicator.show {
+    display: flex;
+}
+
+.filter-tag {
+    display: inline-flex;
+    align-items: center;
+    gap: 6px;
+    background: #f3f4f6;
+    padding: 6px 10px;
+    border-radius: 6px;
+    font-weight: 600;
+    color: #374151;
+    font-size: 13px;
+}
+
+.filter-tag-remove {
+    cursor: pointer;
+    color: #6b7280;
+    font-weight: 700;
+    font-size: 16px;
+    line-height: 1;
+    transition: 0.15s;
+    margin-left: 2px;
+}
+
+.filter-tag-remove:hover {
+    color: #ef4444;
+}
+
+.clear-all-btn {
+    background: #ef4444;
+    color: white;
+    border: none;
+    padding: 6px 12px;
+    border-radius: 6px;
+    cursor: pointer;
+    font-weight: 600;
+    font-size: 13px;
+    transition: 0.15s;
+    margin-left: auto;
+}
+
+.clear-all-btn:hover {
+    background: #dc2626;
+}
+
+/* FAVORITES/SALES SECTIONS */
+.favorites-section, .sales-section {
+    margin-top: 30px;
+    scroll-margin-top: 100px;
+    background: white;
+    border-radius: 12px;
+    padding: 20px 25px;
+    border: 1px solid #e5e7eb;
+    box-shadow: 0 1px 3px rgba(0,0,0,0.05);
+}
+
+.sales-section {
+    border-color: #fee2e2;
+}
+
+.favorites-section {
+    display: none;
+}
+
+.section-title {
+    font-size: 16px;
+    font-weight: 700;
+    color: #374151;
+    margin-bottom: 5px;
+    display: flex;
+    align-items: center;
+    gap: 8px;
+}
+
+.section-subtitle {
+    color: #9ca3af;
+    font-size: 13px;
+    margin-bottom: 20px;
+}
+
+.sale-badge {
+    background: #fee2e2;
+    color: #991b1b;
+    font-size: 11px;
+    font-weight: 700;
+    padding: 3px 8px;
+    border-radius: 4px;
+}
+
+.carousel-container {
+    position: relative;
+    overflow: hidden;
+    touch-action: pan-y pinch-zoom;
+    cursor: grab;
+}
+
+.carousel-container:active {
+    cursor: grabbing;
+}
 
-    <div class="main">
-        <div class="header" id="header">
-            <div class="controls">
-                <div>
-                    <button class="btn" id="sort-unit" onclick="setSort('price_per_unit')" data-i18n="best_value">Best Value</button>
-                    <button class="btn btn-active" id="sort-total" onclick="setSort('latest_price')" data-i18n="price">Price</button>
-                </div>
-                <input type="text" id="search" class="search-box" data-i18n-placeholder="search_placeholder" placeholder="Search products..." oninput="handleSearch()">
-            </div>
-        </div>
-        
-        <div class="filter-indicator" id="filter-indicator"></div>
-        
-        <div id="search-results-title" data-i18n="search_results">Search Results</div>
-        <div id="search-grid" class="grid" style="margin-top: 20px;"></div>
+.carousel-track {
+    display: flex;
+    gap: 15px;
+    transition: transform 0.3s ease;
+    user-select: none;
+}
 
-        <div id="content"></div>
-    </div>
+.carousel-card {
+    min-width: 300px;
+    flex-shrink: 0;
+}
 
-    <div id="historyModal" class="modal">
-        <div class="modal-content">
-            <span class="modal-close" onclick="closeHistory()">&times;</span>
-            <h3 id="modalTitle" style="margin-top: 0; padding-right: 30px;">Product History</h3>
-            <div style="display: flex; align-items: center; gap: 15px; margin: 15px 0;">
-                <img id="modalImg" src="" style="width: 80px; height: 80px; object-fit: contain;">
-                <div>
-                    <div id="modalStore" class="store-label-sm" style="margin-left: 0; margin-bottom: 5px;"></div>
-                    <div id="modalCurrentPrice" style="font-size: 20px; font-weight: 700;"></div>
-                </div>
-            </div>
-            <table class="history-table">
-                <thead>
-                    <tr>
-                        <th data-i18n="date">Date</th>
-                        <th data-i18n="price">Price</th>
-                    </tr>
-                </thead>
-                <tbody id="historyBody"></tbody>
-            </table>
-            <a id="modalStoreLink" href="#" target="_blank" class="view-store-btn" data-i18n="view_store">View on Store</a>
-        </div>
-    </div>
+.carousel-btn {
+    position: absolute;
+    top: 50%;
+    transform: translateY(-50%);
+    background: white;
+    border: 1px solid #e5e7eb;
+    border-radius: 50%;
+    width: 36px;
+    height: 36px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    cursor: pointer;
+    font-size: 18px;
+    color: #6b7280;
+    transition: 0.15s;
+    z-index: 2;
+}
+
+.carousel-btn:hover {
+    background: #f9fafb;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+}
+
+.carousel-btn-left { left: -15px; }
+.carousel-btn-right { right: -15px; }
+
+.carousel-btn:disabled {
+    opacity: 0.3;
+    cursor: not-allowed;
+}
+
+.expand-sales-btn {
+    background: white;
+    border: 1px solid #e5e7eb;
+    color: #6b7280;
+    padding: 8px 14px;
+    border-radius: 8px;
+    cursor: pointer;
+    font-weight: 600;
+    font-size: 13px;
+    transition: 0.15s;
+}
+
+.expand-sales-btn:hover {
+    background: #f9fafb;
+    color: #374151;
+}
+
+.discount-badge {
+    position: absolute;
+    top: 8px;
+    left: 8px;
+    background: #ef4444;
+    color: white;
+    font-size: 12px;
+    font-weight: 700;
+    padding: 4px 8px;
+    border-radius: 6px;
+}
+
+/* PRODUCT CATEGORY SECTIONS */
+.product-cat-section { 
+    margin-top: 30px; 
+    scroll-margin-top: 100px; 
+}
+
+.product-cat-title { 
+    font-size: 20px; 
+    font-weight: 700; 
+    color: #111827; 
+    margin-bottom: 20px; 
+    padding-left: 12px;
+    border-left: 4px solid #10b981; 
+    display: flex;
+    align-items: center;
+    gap: 10px;
+}
+
+.grid { 
+    display: grid; 
+    grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); 
+    gap: 15px; 
+    width: 100%;
+}
+
+.card { 
+    background:white; 
+    border-radius:10px; 
+    padding:15px; 
+    box-shadow:0 1px 3px rgba(0,0,0,0.05); 
+    display:flex; 
+    gap:15px; 
+    text-decoration:none; 
+    color:inherit; 
+    height: 130px; 
+    position: relative; 
+    transition: 0.15s; 
+    border: 1px solid #e5e7eb; 
+    cursor: pointer;
+}
+
+.card:hover { 
+    transform: translateY(-2px); 
+    box-shadow: 0 4px 12px rgba(0,0,0,0.08);
+    border-color: #d1d5db;
+}
+
+.store-badge { 
+    position: absolute; 
+    top: 8px; 
+    right: 8px; 
+    font-size: 9px; 
+    padding: 3px 6px; 
+    border-radius: 4px; 
+    font-weight: 700; 
+    text-transform: uppercase; 
+}
+
+.store-Barbora { background: #1e3a8a; color: #ffffff; }
+.store-Selver { background: #fef3c7; color: #92400e; }
+.store-Rimi { background: #fee2e2; color: #991b1b; }
+.store-Coop { background: #dbeafe; color: #1e40af; }
+
+.card img { width:70px; height:100%; object-fit:contain; }
+.card picture { display: contents; }
+.info { flex: 1; display: flex; flex-direction: column; justify-content: center; }
+.name { font-size:13px; font-weight:600; line-height:1.4; max-height: 2.8em; overflow: hidden; margin-bottom: 5px; color: #1f2937; }
+
+.fav-btn {
+    position: absolute;
+    bottom: 8px;
+    right: 8px;
+    background: white;
+    border: 1px solid #e5e7eb;
+    border-radius: 50%;
+    width: 32px;
+    height: 32px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    cursor: pointer;
+    font-size: 14px;
+    transition: 0.15s;
+    z-index: 5;
+    pointer-events: auto;
+}
+
+.fav-btn:hover {
+    border-color: #fbbf24;
+    background: #fffbeb;
+    transform: scale(1.05);
+}
+
+.fav-btn.active {
+    background: #fef3c7;
+    border-color: #f59e0b;
+}
+
+.price-container { display: flex; align-items: baseline; gap: 6px; }
+.price { font-size:20px; font-weight:700; color: #111827; }
+.price-sale { 
+    background-color: #d1fae5;
+    color: #065f46;
+    padding: 2px 6px;
+    border-radius: 4px;
+    font-weight: 700;
+}
+
+.price-old { font-size: 14px; color: #9ca3af; text-decoration: line-through; font-weight: 500; }
+.per-l { color:#059669; font-weight:600; font-size:12px; }
+.compare-hint { color: #6b7280; font-weight: 500; }
+.compare-title { font-size: 12px; color: #6b7280; margin-top: 8px; }
+.compare-row { display: flex; align-items: center; gap: 8px; font-size: 13px; font-weight: 600; margin-top: 4px; }
+.compare-row .store-label-sm { margin-left: 0; }
+
+.expand-bar { 
+    grid-column: 1 / -1; 
+    background: #f9fafb; 
+    border: 1px solid #e5e7eb; 
+    color: #6b7280; 
+    text-align: center; 
+    padding: 12px; 
+    border-radius: 8px; 
+    cursor: pointer; 
+    font-weight: 600; 
+    margin-top: 10px; 
+    transition: 0.15s;
+}
+
+.expand-bar:hover {
+    background: white;
+    color: #374151;
+}
+
+.hidden { display: none; }
+
+#search-results-title { 
+    display: none; 
+    margin-top: 30px; 
+    color: #374151; 
+    border-left: 3px solid #10b981; 
+    padding-left: 12px; 
+    font-size: 18px; 
+    font-weight: 700; 
+}
+
+.empty-state {
+    text-align: center;
+    padding: 60px 20px;
+    color: #9ca3af;
+}
+
+.empty-state-icon {
+    font-size: 48px;
+    margin-bottom: 16px;
+}
+
+/* MODAL STYLES */
+.modal {
+    display: none;
+    position: fixed;
+    z-index: 2000;
+    top: 0; left: 0;
+    width: 100%; height: 100%;
+    background: rgba(0,0,0,0.8);
+    align-items: center;
+    justify-content: center;
+    backdrop-filter: blur(4px);
+}
+.modal-content {
+    width: 90%;
+    max-width: 500px;
+    background: white;
+    padding: 25px;
+    border-radius: 16px;
+    position: relative;
+    max-height: 85vh;
+    overflow-y: auto;
+    box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.1);
+}
+.modal-close {
+    position: absolute;
+    top: 15px; right: 20px;
+    font-size: 28px;
+    cursor: pointer;
+    color: #9ca3af;
+    transition: 0.15s;
+}
+.modal-close:hover { color: #111827; }
+.history-table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-top: 20px;
+}
+.history-table th {
+    text-align: left;
+    font-size: 12px;
+    text-transform: uppercase;
+    color: #6b7280;
+    padding: 10px;
+    border-bottom: 2px solid #f3f4f6;
+}
+.history-table td {
+    padding: 12px 10px;
+    border-bottom: 1px solid #f3f4f6;
+    font-size: 14px;
+}
+.price-up { color: #ef4444; font-weight: 600; }
+.price-down { color: #10b981; font-weight: 600; }
+.view-store-btn {
+    display: block;
+    width: 100%;
+    text-align: center;
+    background: #111827;
+    color: white;
+    text-decoration: none;
+    padding: 12px;
+    border-radius: 8px;
+    font-weight: 600;
+    margin-top: 25px;
+    transition: 0.15s;
+}
+.view-store-btn:hover { background: #374151; }
+
+/* MOBILE RESPONSIVE */
+@media (max-width: 768px) {
+    body { display: block; }
+    .hamburger { display: flex; }
+
+    .sidebar {
+        position: fixed;
+        left: -260px;
+        transition: left 0.3s ease;
+        z-index: 1000;
+    }
+
+    .sidebar.active { left: 0; }
+    .sidebar-overlay.active { display: block; }
+
+    .main {
+        margin-left: 0;
+        padding: 80px 15px 40px 15px;
+        width: 100%;
+    }
+
+    .header { padding: 15px 0; }
+
+    .controls {
+        flex-direction: column;
+        gap: 12px;
+        padding: 12px;
+    }
+
+    .controls > div {
+        width: 100%;
+        display: flex;
+        gap: 8px;
+    }
+
+    .btn {
+        flex: 1;
+        padding: 12px 10px;
+        font-size: 15px;
+    }
+
+    .search-box {
+        width: 100%;
+        padding: 12px 15px;
+        font-size: 16px;
+    }
+
+    .grid {
+        grid-template-columns: 1fr;
+        gap: 12px;
+    }
+
+    .card {
+        height: 140px;
+        padding: 15px;
+        gap: 12px;
+    }
+
+    .card img { width: 80px; }
+    .name { font-size: 14px; line-height: 1.5; }
+    .price { font-size: 22px; }
+    .price-old { font-size: 16px; }
+    .per-l { font-size: 13px; }
+
+    .fav-btn {
+        width: 38px;
+        height: 38px;
+        font-size: 16px;
+    }
+
+    .carousel-card {
+        min-width: calc(100% - 70px);
+        max-width: calc(100% - 70px);
+    }
+
+    .carousel-track { padding: 0 5px; }
+
+    .carousel-btn {
+        width: 32px;
+        height: 32px;
+        font-size: 16px;
+    }
+
+    .carousel-btn-left { left: 0; }
+    .carousel-btn-right { right: 0; }
+}
+
+/* Desktop responsiveness fixes */
+@media (min-width: 769px) and (max-width: 1400px) {
+    .main {
+        padding: 0 30px 40px 30px;
+    }
+
+    .grid {
+        grid-template-columns: repeat(auto-fill, minmax(280px, 1fr));
+    }
+}
+
+@media (min-width: 1401px) {
+    .main {
+        padding: 0 50px 40px 50px;
+    }
+}
+"""
 
-<script>
-const translations = {json.dumps(TRANSLATIONS)};
-const products = {json.dumps(products)};
-const sources = {json.dumps(sources)};
-const productCategories = {json.dumps(product_categories)};
-const saleProducts = {json.dumps(sale_products)};
+# Data-independent, so the hashed script only changes when the code does; values the
+# builder owns are passed in through SITE_CONFIG
+APP_JS = r"""
+// Catalogue data is sharded per productCategory and store under data/, see data/manifest.json
+let manifest = null;
+let translations = {};
+let sources = [];
+let productCategories = [];
+let saleProducts = [];
+let saleByName = new Map();
+
+// Products of the shards the catalogue worker has sent so far
+const productsByName = new Map();
+const loadedShards = new Set();
+let shardObserver = null;
 
 let currentSort = 'latest_price';
 let favorites = [];
+let favoriteShards = {}; // product name -> shard file (null if the product is gone)
 let carouselPosition = 0;
 let touchStartX = 0;
 let touchEndX = 0;
-let activeStores = new Set({json.dumps([source['store'] for source in sources])});
-let activeProductCategories = new Set(productCategories);
+let activeStores = new Set();
+let activeProductCategories = new Set();
 let currentLang = 'et'; // Default language
 
 // Scroll behavior variables for mobile
@@ -1154,63 +1811,180 @@ let scrollTimeout;
 let ticking = false;
 
 // Language functions
-function setLanguage(lang) {{
+function setLanguage(lang) {
     currentLang = lang;
     localStorage.setItem('priceTrackerLang', lang);
     
     // Update active button
-    document.querySelectorAll('.lang-btn').forEach(btn => {{
+    document.querySelectorAll('.lang-btn').forEach(btn => {
         btn.classList.toggle('active', btn.dataset.lang === lang);
-    }});
+    });
     
     // Translate all elements
-    document.querySelectorAll('[data-i18n]').forEach(el => {{
+    document.querySelectorAll('[data-i18n]').forEach(el => {
         const key = el.dataset.i18n;
-        if (translations[lang] && translations[lang][key]) {{
+        if (translations[lang] && translations[lang][key]) {
             el.textContent = translations[lang][key];
-        }}
-    }});
+        }
+    });
     
     // Translate placeholders
-    document.querySelectorAll('[data-i18n-placeholder]').forEach(el => {{
+    document.querySelectorAll('[data-i18n-placeholder]').forEach(el => {
         const key = el.dataset.i18nPlaceholder;
-        if (translations[lang] && translations[lang][key]) {{
+        if (translations[lang] && translations[lang][key]) {
             el.placeholder = translations[lang][key];
-        }}
-    }});
+        }
+    });
     
     // Re-render to update dynamic content
     render();
-}}
+}
 
-function t(key) {{
+function t(key) {
     return translations[currentLang] && translations[currentLang][key] 
         ? translations[currentLang][key] 
         : key;
-}}
+}
 
-function loadLanguage() {{
+function loadLanguage() {
     const savedLang = localStorage.getItem('priceTrackerLang');
-    if (savedLang && translations[savedLang]) {{
+    if (savedLang && translations[savedLang]) {
         setLanguage(savedLang);
-    }} else {{
+    } else {
         setLanguage('et');
-    }}
-}}
+    }
+}
 
 // Helper function to display store name
-function getDisplayStoreName(store) {{
+function getDisplayStoreName(store) {
     return store === 'Barbora' ? 'Maxima' : store;
-}}
+}
+
+// DATA LOADING
+function dataUrl(path) {
+    return `data/${path}?v=${manifest.version}`;
+}
+
+async function fetchJson(path) {
+    const response = await fetch(dataUrl(path));
+    if (!response.ok) throw new Error(`${path}: HTTP ${response.status}`);
+    return response.json();
+}
+
+// CATALOGUE WORKER
+// Filtering, sorting and search run in catalog-worker.js (see CATALOG_WORKER_JS in
+// build_site.py). The page asks for ordered product names and paints them.
+let catalogWorker = null;
+let catalogHandle = null; // in-page catalogue where workers are unavailable
+let catalogFallback = null;
+let catalogSeq = 0;
+const catalogPending = new Map(); // request id -> {message, resolve, reject}
+
+function catalogRequest(type, payload = {}) {
+    return new Promise((resolve, reject) => {
+        const message = { id: ++catalogSeq, type, payload };
+        catalogPending.set(message.id, { message, resolve, reject });
+        if (catalogHandle) catalogHandle(message);
+        else if (catalogWorker) catalogWorker.postMessage(message);
+        // otherwise the in-page catalogue is starting and replays pending requests
+    });
+}
+
+function onCatalogMessage({ id, result, error, shards }) {
+    Object.entries(shards || {}).forEach(([file, list]) => registerShard(file, list));
+    const pending = catalogPending.get(id);
+    if (!pending) return;
+    catalogPending.delete(id);
+    if (error) pending.reject(new Error(error));
+    else pending.resolve(result);
+}
+
+function registerShard(file, list) {
+    list.forEach(p => productsByName.set(p.name, p));
+    loadedShards.add(file);
+}
+
+function startCatalog() {
+    const url = `${SITE_CONFIG.workerFile}?v=${manifest.version}`;
+    try {
+        catalogWorker = new Worker(url);
+        catalogWorker.onmessage = event => onCatalogMessage(event.data);
+        catalogWorker.onerror = () => runCatalogInPage(url);
+    } catch (err) {
+        runCatalogInPage(url);
+    }
+    return catalogRequest('init', { version: manifest.version, shards: manifest.shards });
+}
+
+// Opened from file:// or in a browser without workers: run the same script on the page
+function runCatalogInPage(url) {
+    if (catalogFallback) return catalogFallback;
+    if (catalogWorker) catalogWorker.terminate();
+    catalogWorker = null;
+    catalogFallback = new Promise(resolve => {
+        const script = document.createElement('script');
+        script.src = url;
+        script.onload = () => {
+            catalogHandle = createCatalog(message => onCatalogMessage(message));
+            // init was the first request, so replaying in order re-initializes first
+            catalogPending.forEach(({ message }) => catalogHandle(message));
+            resolve();
+        };
+        document.head.appendChild(script);
+    });
+    return catalogFallback;
+}
+
+// Filters in the form the catalogue worker takes them
+function catalogFilters(filters = currentFilters()) {
+    return {
+        ...filters,
+        stores: [...activeStores],
+        categories: [...activeProductCategories],
+        favorites,
+        sort: currentSort
+    };
+}
+
+function loadShards(shards) {
+    const files = shards.filter(s => !loadedShards.has(s.file)).map(s => s.file);
+    return files.length ? catalogRequest('load', { files }) : Promise.resolve();
+}
+
+function isLoaded(shards) {
+    return shards.every(s => loadedShards.has(s.file));
+}
+
+function activeShards() {
+    return manifest.shards.filter(s => activeStores.has(s.store));
+}
+
+function findProduct(name) {
+    return productsByName.get(name) || saleByName.get(name);
+}
+
+// Shards holding the user's favorites. Favorites saved before sharding have no
+// shard recorded yet, which means looking through everything once.
+function favoriteShardList() {
+    if (favorites.some(name => !(name in favoriteShards))) return manifest.shards;
+    const files = new Set(favorites.map(name => favoriteShards[name]));
+    return manifest.shards.filter(s => files.has(s.file));
+}
 
-// Robust helper to find source info for a product's category key
-function findSource(catKey) {{
-    if (!catKey) return null;
-    const searchKey = catKey.toLowerCase().trim();
-    return sources.find(s => s.key.toLowerCase().trim() === searchKey);
-}}
+async function loadFavoriteShards() {
+    if (favorites.length === 0) return;
+    await loadShards(favoriteShardList());
+    let changed = false;
+    favorites.forEach(name => {
+        if (name in favoriteShards) return;
+        const p = findProduct(name);
+        favoriteShards[name] = p ? p.shard : null;
+        changed = true;
+    });
+    if (changed) saveFavorites();
+}
 
-function toggleMenu() {{
+function toggleMenu() {
     const sidebar = document.getElementById('sidebar');
     const overlay = document.getElementById('sidebar-overlay');
     const hamburger = document.getElementById('hamburger');
@@ -1218,61 +1992,74 @@ function toggleMenu() {{
     sidebar.classList.toggle('active');
     overlay.classList.toggle('active');
     hamburger.classList.toggle('active');
-}}
+}
 
-function toggleCategories() {{
+function toggleCategories() {
     const categoriesDiv = document.getElementById('product-categories');
     const arrow = document.getElementById('categories-arrow');
     categoriesDiv.classList.toggle('collapsed');
     arrow.textContent = categoriesDiv.classList.contains('collapsed') ? '▶' : '▼';
-}}
+}
 
-function handleTouchStart(e) {{ touchStartX = e.touches[0].clientX; }}
-function handleTouchMove(e) {{ touchEndX = e.touches[0].clientX; }}
-function handleTouchEnd() {{
+function handleTouchStart(e) { touchStartX = e.touches[0].clientX; }
+function handleTouchMove(e) { touchEndX = e.touches[0].clientX; }
+function handleTouchEnd() {
     const swipeThreshold = 50;
     const diff = touchStartX - touchEndX;
-    if (Math.abs(diff) > swipeThreshold) {{
-        if (diff > 0) {{ moveCarousel(1); }} else {{ moveCarousel(-1); }}
-    }}
+    if (Math.abs(diff) > swipeThreshold) {
+        if (diff > 0) { moveCarousel(1); } else { moveCarousel(-1); }
+    }
     touchStartX = 0;
     touchEndX = 0;
-}}
+}
 
-function initCarouselTouch() {{
+function initCarouselTouch() {
     const carouselContainer = document.querySelector('.carousel-container');
-    if (carouselContainer) {{
-        carouselContainer.addEventListener('touchstart', handleTouchStart, {{ passive: true }});
-        carouselContainer.addEventListener('touchmove', handleTouchMove, {{ passive: true }});
+    if (carouselContainer) {
+        carouselContainer.addEventListener('touchstart', handleTouchStart, { passive: true });
+        carouselContainer.addEventListener('touchmove', handleTouchMove, { passive: true });
         carouselContainer.addEventListener('touchend', handleTouchEnd);
-    }}
-}}
+    }
+}
 
-function loadFavorites() {{
+function loadFavorites() {
     const stored = localStorage.getItem('priceTrackerFavorites');
-    if (stored) {{
-        try {{ favorites = JSON.parse(stored); }}
-        catch(e) {{ favorites = []; }}
-    }}
-}}
+    if (stored) {
+        try { favorites = JSON.parse(stored); }
+        catch(e) { favorites = []; }
+    }
+    const storedShards = localStorage.getItem('priceTrackerFavoriteShards');
+    if (storedShards) {
+        try { favoriteShards = JSON.parse(storedShards); }
+        catch(e) { favoriteShards = {}; }
+    }
+}
 
-function saveFavorites() {{
+function saveFavorites() {
     localStorage.setItem('priceTrackerFavorites', JSON.stringify(favorites));
-}}
+    localStorage.setItem('priceTrackerFavoriteShards', JSON.stringify(favoriteShards));
+}
 
-function toggleFavorite(productName, event) {{
+function toggleFavorite(productName, event) {
     event.preventDefault();
     event.stopPropagation();
     
     const index = favorites.indexOf(productName);
-    if (index > -1) {{ favorites.splice(index, 1); }} 
-    else {{ favorites.push(productName); }}
+    if (index > -1) {
+        favorites.splice(index, 1);
+        delete favoriteShards[productName];
+    } else {
+        favorites.push(productName);
+        const p = findProduct(productName);
+        if (p) favoriteShards[productName] = p.shard;
+    }
     saveFavorites();
+    grids.forEach(grid => grid.invalidate(productName));
     render();
     return false;
-}}
+}
 
-function moveCarousel(direction) {{
+function moveCarousel(direction) {
     const track = document.querySelector('.carousel-track');
     const cards = document.querySelectorAll('.carousel-card');
     if (!track || cards.length === 0) return;
@@ -1286,89 +2073,89 @@ function moveCarousel(direction) {{
     const maxPosition = Math.max(0, cards.length - visibleCards);
     carouselPosition = Math.max(0, Math.min(carouselPosition, maxPosition));
     
-    track.style.transform = `translateX(-${{carouselPosition * cardWidth}}px)`;
+    track.style.transform = `translateX(-${carouselPosition * cardWidth}px)`;
     
     const leftBtn = document.querySelector('.carousel-btn-left');
     const rightBtn = document.querySelector('.carousel-btn-right');
     if (leftBtn) leftBtn.disabled = carouselPosition === 0;
     if (rightBtn) rightBtn.disabled = carouselPosition >= maxPosition;
-}}
+}
 
-function filterByStore() {{
+function filterByStore() {
     const checkboxes = document.querySelectorAll('input[data-store]');
     activeStores.clear();
-    checkboxes.forEach(cb => {{
+    checkboxes.forEach(cb => {
         if (cb.checked) activeStores.add(cb.dataset.store);
-    }});
+    });
     render();
-}}
+}
 
-function filterByProductCategory() {{
+function filterByProductCategory() {
     const checkboxes = document.querySelectorAll('input[data-product-category]');
     activeProductCategories.clear();
-    checkboxes.forEach(cb => {{
+    checkboxes.forEach(cb => {
         if (cb.checked) activeProductCategories.add(cb.dataset.productCategory);
-    }});
+    });
     render();
-}}
+}
 
-function applyFilters() {{ render(); }}
+function applyFilters() { render(); }
 
-function setSort(key){{
+function setSort(key){
     currentSort = key;
     document.querySelectorAll('.btn').forEach(b=>b.classList.remove('btn-active'));
     document.getElementById(key==='latest_price'?'sort-total':'sort-unit').classList.add('btn-active');
     render();
-}}
+}
 
-function getActiveFilters() {{
-    const filters = {{}};
+function getActiveFilters() {
+    const filters = {};
     
     // Get active product categories
     const allCatsSelected = activeProductCategories.size === productCategories.length;
-    if (!allCatsSelected && activeProductCategories.size > 0) {{
+    if (!allCatsSelected && activeProductCategories.size > 0) {
         filters.categories = Array.from(activeProductCategories);
-    }}
+    }
     
     // Get active stores
     const allStores = new Set(sources.map(s => s.store));
     const allStoresSelected = activeStores.size === allStores.size;
-    if (!allStoresSelected && activeStores.size > 0) {{
+    if (!allStoresSelected && activeStores.size > 0) {
         filters.stores = Array.from(activeStores);
-    }}
+    }
     
     // Get quick filters
     filters.favorites = document.getElementById('filter-favorites')?.checked || false;
     filters.sales = document.getElementById('filter-sales')?.checked || false;
     
     return filters;
-}}
+}
 
-function removeFilter(type, value) {{
-    if (type === 'category') {{
+function removeFilter(type, value) {
+    if (type === 'category') {
         activeProductCategories.delete(value);
-        const checkbox = document.querySelector(`input[data-product-category="${{value}}"]`);
+        const checkbox = document.querySelector(`input[data-product-category="${value}"]`);
         if (checkbox) checkbox.checked = false;
-    }} else if (type === 'store') {{
+    } else if (type === 'store') {
         activeStores.delete(value);
-        const checkbox = document.querySelector(`input[data-store="${{value}}"]`);
+        const checkbox = document.querySelector(`input[data-store="${value}"]`);
         if (checkbox) checkbox.checked = false;
-    }} else if (type === 'favorites') {{
+    } else if (type === 'favorites') {
         const checkbox = document.getElementById('filter-favorites');
         if (checkbox) checkbox.checked = false;
-    }} else if (type === 'sales') {{
+    } else if (type === 'sales') {
         const checkbox = document.getElementById('filter-sales');
         if (checkbox) checkbox.checked = false;
-    }}
+    }
     
     render();
     
-    if (document.getElementById('search').value.length >= 2) {{
+    if (document.getElementById('search').value.length >= 2) {
         handleSearch();
-    }}
-}}
+    }
+}
 
-function clearAllFilters() {{
+function clearAllFilters() {
     document.getElementById('search').value = '';
     
     activeProductCategories = new Set(productCategories);
@@ -1384,299 +2171,544 @@ function clearAllFilters() {{
     const salesCheckbox = document.getElementById('filter-sales');
     if (salesCheckbox) salesCheckbox.checked = false;
     
-    const searchGrid = document.getElementById('search-grid');
     const searchTitle = document.getElementById('search-results-title');
     const content = document.getElementById('content');
     
-    searchGrid.innerHTML = "";
+    if (searchGrid) searchGrid.setItems([]);
     searchTitle.style.display = "none";
     content.style.display = "block";
     
     render();
-}}
+}
 
-function updateFilterIndicator(isSearchActive = false) {{
+function updateFilterIndicator(isSearchActive = false) {
     const indicator = document.getElementById('filter-indicator');
     const filters = getActiveFilters();
     
     const hasFilters = filters.categories || filters.stores || filters.favorites || filters.sales;
     
-    if (!hasFilters && !isSearchActive) {{
+    if (!hasFilters && !isSearchActive) {
         indicator.classList.remove('show');
         return;
-    }}
+    }
     
-    let html = isSearchActive ? `<strong>${{t('searching_in')}}:</strong> ` : `<strong>${{t('active_filters')}}:</strong> `;
+    let html = isSearchActive ? `<strong>${t('searching_in')}:</strong> ` : `<strong>${t('active_filters')}:</strong> `;
     const tags = [];
     
-    if (filters.categories) {{
-        tags.push(...filters.categories.map(c => {{
-            const escaped = c.replace(/'/g, "\\\\'");
-            return `<span class="filter-tag">🏷️ ${{c}} <span class="filter-tag-remove" onclick="removeFilter('category', '${{escaped}}')">×</span></span>`;
-        }}));
-    }}
+    if (filters.categories) {
+        tags.push(...filters.categories.map(c => {
+            const escaped = c.replace(/'/g, "\\'");
+            return `<span class="filter-tag">🏷️ ${c} <span class="filter-tag-remove" onclick="removeFilter('category', '${escaped}')">×</span></span>`;
+        }));
+    }
     
-    if (filters.stores) {{
-        tags.push(...filters.stores.map(s => {{
-            const escaped = s.replace(/'/g, "\\\\'");
+    if (filters.stores) {
+        tags.push(...filters.stores.map(s => {
+            const escaped = s.replace(/'/g, "\\'");
             const displayName = getDisplayStoreName(s);
-            return `<span class="filter-tag">${{displayName}} <span class="filter-tag-remove" onclick="removeFilter('store', '${{escaped}}')">×</span></span>`;
-        }}));
-    }}
+            return `<span class="filter-tag">${displayName} <span class="filter-tag-remove" onclick="removeFilter('store', '${escaped}')">×</span></span>`;
+        }));
+    }
     
-    if (filters.favorites) {{
-        tags.push(`<span class="filter-tag">⭐ ${{t('favorites')}} <span class="filter-tag-remove" onclick="removeFilter('favorites')">×</span></span>`);
-    }}
+    if (filters.favorites) {
+        tags.push(`<span class="filter-tag">⭐ ${t('favorites')} <span class="filter-tag-remove" onclick="removeFilter('favorites')">×</span></span>`);
+    }
     
-    if (filters.sales) {{
-        tags.push(`<span class="filter-tag">🔥 ${{t('on_sale')}} <span class="filter-tag-remove" onclick="removeFilter('sales')">×</span></span>`);
-    }}
+    if (filters.sales) {
+        tags.push(`<span class="filter-tag">🔥 ${t('on_sale')} <span class="filter-tag-remove" onclick="removeFilter('sales')">×</span></span>`);
+    }
     
-    if (tags.length === 0 && isSearchActive) {{
-        html += `<span class="filter-tag">${{t('all_products')}}</span>`;
-    }} else {{
+    if (tags.length === 0 && isSearchActive) {
+        html += `<span class="filter-tag">${t('all_products')}</span>`;
+    } else {
         html += tags.join(' ');
-    }}
+    }
     
-    if (hasFilters || isSearchActive) {{
-        html += `<button class="clear-all-btn" onclick="clearAllFilters()">${{t('clear_all')}}</button>`;
-    }}
+    if (hasFilters || isSearchActive) {
+        html += `<button class="clear-all-btn" onclick="clearAllFilters()">${t('clear_all')}</button>`;
+    }
     
     indicator.innerHTML = html;
     indicator.classList.add('show');
-}}
+}
 
 // HISTORY MODAL FUNCTIONS
-function showHistory(productName, event) {{
+// Full price histories live in data/history/<bucket>.json and are fetched when a modal opens
+const historyBuckets = new Map(); // bucket -> Promise of {name: entries}
+
+function loadHistory(p) {
+    if (p.history_bucket === undefined) return Promise.resolve(p.entries || []);
+    if (!historyBuckets.has(p.history_bucket)) {
+        const request = fetchJson(`history/${p.history_bucket}.json`).catch(err => {
+            historyBuckets.delete(p.history_bucket);
+            console.error('Could not load price history', err);
+            return {};
+        });
+        historyBuckets.set(p.history_bucket, request);
+    }
+    return historyBuckets.get(p.history_bucket).then(bucket => bucket[p.name] || p.entries || []);
+}
+
+async function showHistory(productName, event) {
     if (event.target.closest('.fav-btn')) return;
 
-    const p = products.find(prod => prod.name === productName);
+    const p = findProduct(productName);
     if (!p) return;
 
     const modal = document.getElementById('historyModal');
-    const body = document.getElementById('historyBody');
     
     document.getElementById('modalTitle').innerText = p.name;
     document.getElementById('modalImg').src = p.img;
-    document.getElementById('modalCurrentPrice').innerText = `€${{p.latest_price.toFixed(2)}}`;
+    document.getElementById('modalCurrentPrice').innerText = `€${p.latest_price.toFixed(2)}`;
+    renderPriceStats(p);
+    renderComparison(p);
     document.getElementById('modalStoreLink').href = p.url;
     
     const storeLabel = document.getElementById('modalStore');
-    storeLabel.className = `store-label-sm store-label-${{p.store}}`;
+    storeLabel.className = `store-label-sm store-label-${p.store}`;
     storeLabel.innerText = getDisplayStoreName(p.store);
 
-    body.innerHTML = '';
-    
-    // entries are objects {{t: "YYYY-MM-DDTHH:MM:SS", p: 12.34}}
-    // show newest first
-    const reversedEntries = [...p.entries].reverse();
-    
-    reversedEntries.forEach((entry, index) => {{
-        const price = entry.p;
-        const prevEntry = reversedEntries[index + 1];
-        let priceClass = '';
-        let indicator = '';
+    // Show the inline recent prices straight away, then the full history once fetched
+    renderHistoryRows(p.entries || []);
+    modal.dataset.product = p.name;
+    modal.style.display = 'flex';
+    document.body.style.overflow = 'hidden';
+
+    const entries = await loadHistory(p);
+    if (modal.dataset.product === p.name) renderHistoryRows(entries);
+}
+
+function renderPriceStats(p) {
+    const s = p.stats;
+    document.getElementById('modalStats').textContent = s ? [
+        `${t('typical_price')}: €${s.typical.toFixed(2)}`,
+        `${t('lowest_price')}: €${s.low.toFixed(2)}`,
+        `${t('days_at_price')}: ${Math.floor(s.days_at_price)}`,
+    ].join(' · ') : '';
+}
+
+function renderComparison(p) {
+    const others = p.compare || [];
+    document.getElementById('modalCompare').innerHTML = others.length ? `
+        <div class="compare-title">${t('other_stores')}</div>
+        ${others.map(o => `<div class="compare-row">
+            <span class="store-label-sm store-label-${o.store}">${getDisplayStoreName(o.store)}</span>
+            <span>€${(o.latest_price || 0).toFixed(2)}</span>
+        </div>`).join('')}` : '';
+}
+
+function renderHistoryRows(entries) {
+    // entries are objects {t: "YYYY-MM-DDTHH:MM:SS", p: 12.34}
+    // show newest first
+    const reversedEntries = [...entries].reverse();
+    
+    document.getElementById('historyBody').innerHTML = reversedEntries.map((entry, index) => {
+        const price = entry.p;
+        const prevEntry = reversedEntries[index + 1];
+        let priceClass = '';
+        let indicator = '';
+
+        if (prevEntry) {
+            if (price > prevEntry.p) {
+                priceClass = 'price-up';
+                indicator = ' ▲';
+            } else if (price < prevEntry.p) {
+                priceClass = 'price-down';
+                indicator = ' ▼';
+            }
+        }
+
+        // Format timestamp to DD-MM-YYYY
+        const timestamp = entry.t || entry.d; // Support both 't' and 'd' for backwards compatibility
+        let formattedDate = 'Unknown';
+        if (timestamp) {
+            const date = new Date(timestamp);
+            const day = String(date.getDate()).padStart(2, '0');
+            const month = String(date.getMonth() + 1).padStart(2, '0');
+            const year = date.getFullYear();
+            formattedDate = `${day}-${month}-${year}`;
+        }
+
+        return `<tr>
+            <td>${formattedDate}</td>
+            <td class="${priceClass}">€${price.toFixed(2)}${indicator}</td>
+        </tr>`;
+    }).join('');
+}
+
+function closeHistory() {
+    const modal = document.getElementById('historyModal');
+    delete modal.dataset.product;
+    modal.style.display = 'none';
+    document.body.style.overflow = 'auto';
+}
+
+window.onclick = function(event) {
+    const modal = document.getElementById('historyModal');
+    if (event.target == modal) closeHistory();
+}
+
+// Filters shared by search and the category sections
+function currentFilters() {
+    return {
+        favoritesOnly: document.getElementById('filter-favorites')?.checked || false,
+        salesOnly: document.getElementById('filter-sales')?.checked || false
+    };
+}
+
+function categoryActive(p) {
+    return !p.productCategory || activeProductCategories.has(p.productCategory);
+}
+
+function passesFilters(p, filters) {
+    if (!activeStores.has(p.store)) return false;
+    if (filters.favoritesOnly && !favorites.includes(p.name)) return false;
+    if (filters.salesOnly && !p.on_sale) return false;
+    return true;
+}
+
+// SEARCH
+// Typing is debounced; the lookup itself runs against the prebuilt index in the worker
+const SEARCH_DEBOUNCE_MS = 150;
+let searchTimer = null;
+
+function scheduleSearch() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(handleSearch, SEARCH_DEBOUNCE_MS);
+}
+
+// VIRTUALIZED GRIDS
+// A grid only materializes the cards of the rows near the viewport and pads the rest.
+// Card elements are keyed by product name and reused, so filter and sort changes move
+// existing nodes instead of re-parsing HTML.
+const CARD_HEIGHT = { desktop: 130, mobile: 140 };
+const GRID_GAP = { desktop: 15, mobile: 12 };
+const MIN_CARD_WIDTH = 300;
+const OVERSCAN_ROWS = 3;
+const SECTION_PREVIEW = 10;
+const SALES_PREVIEW = 3;
+const grids = new Set();
+
+class VirtualGrid {
+    constructor(renderCard = card, el = document.createElement('div')) {
+        this.el = el;
+        this.el.classList.add('grid');
+        this.renderCard = renderCard;
+        this.items = [];
+        this.limit = Infinity;
+        this.nodes = new Map(); // product name -> card element
+        this.window = null;
+        grids.add(this);
+    }
+
+    setItems(items, limit = Infinity) {
+        this.items = items;
+        this.limit = limit;
+        // Forget cards of products that left the grid
+        const names = new Set(items.map(p => p.name));
+        this.nodes.forEach((_, name) => { if (!names.has(name)) this.nodes.delete(name); });
+        this.window = null;
+        this.update();
+    }
+
+    invalidate(name) {
+        if (this.nodes.delete(name)) this.window = null;
+    }
+
+    metrics() {
+        const mobile = window.innerWidth <= 768;
+        const gap = mobile ? GRID_GAP.mobile : GRID_GAP.desktop;
+        const rowHeight = (mobile ? CARD_HEIGHT.mobile : CARD_HEIGHT.desktop) + gap;
+        const template = window.getComputedStyle(this.el).getPropertyValue('grid-template-columns');
+        const columns = template && template !== 'none'
+            ? template.trim().split(/\s+/).length
+            : Math.max(1, Math.floor((this.el.clientWidth + gap) / (MIN_CARD_WIDTH + gap)));
+        return { columns, rowHeight };
+    }
+
+    update() {
+        if (!this.el.isConnected) return;
+        const count = Math.min(this.items.length, this.limit);
+        const { columns, rowHeight } = this.metrics();
+        const rows = Math.ceil(count / columns);
+        const top = this.el.getBoundingClientRect().top;
+        const first = Math.min(rows, Math.max(0, Math.floor(-top / rowHeight) - OVERSCAN_ROWS));
+        const last = Math.min(rows, Math.max(first, Math.ceil((window.innerHeight - top) / rowHeight) + OVERSCAN_ROWS));
+        const key = `${columns}:${first}:${last}:${count}`;
+        if (this.window === key) return;
+        this.window = key;
+
+        const visible = this.items.slice(first * columns, Math.min(count, last * columns));
+        this.el.style.paddingTop = `${first * rowHeight}px`;
+        this.el.style.paddingBottom = `${(rows - last) * rowHeight}px`;
+        this.el.replaceChildren(...visible.map(p => this.node(p)));
+    }
+
+    node(p) {
+        let node = this.nodes.get(p.name);
+        if (!node) {
+            const holder = document.createElement('div');
+            holder.innerHTML = this.renderCard(p);
+            node = holder.firstElementChild;
+            this.nodes.set(p.name, node);
+        }
+        return node;
+    }
+}
+
+function refreshGrids(force = false) {
+    grids.forEach(grid => {
+        if (force) grid.window = null;
+        grid.update();
+    });
+}
 
-        if (prevEntry) {{
-            if (price > prevEntry.p) {{
-                priceClass = 'price-up';
-                indicator = ' ▲';
-            }} else if (price < prevEntry.p) {{
-                priceClass = 'price-down';
-                indicator = ' ▼';
-            }}
-        }}
+let gridFrame = 0;
+function scheduleGridRefresh() {
+    if (gridFrame) return;
+    gridFrame = requestAnimationFrame(() => {
+        gridFrame = 0;
+        refreshGrids();
+    });
+}
 
-        // Format timestamp to DD-MM-YYYY
-        const timestamp = entry.t || entry.d; // Support both 't' and 'd' for backwards compatibility
-        let formattedDate = 'Unknown';
-        if (timestamp) {{
-            const date = new Date(timestamp);
-            const day = String(date.getDate()).padStart(2, '0');
-            const month = String(date.getMonth() + 1).padStart(2, '0');
-            const year = date.getFullYear();
-            formattedDate = `${{day}}-${{month}}-${{year}}`;
-        }}
+window.addEventListener('scroll', scheduleGridRefresh, { passive: true });
+window.addEventListener('resize', () => {
+    grids.forEach(grid => { grid.window = null; });
+    scheduleGridRefresh();
+});
+
+// SECTIONS
+// Section elements persist across renders, keyed by category (or source), and are
+// re-ordered and updated in place.
+const sectionViews = new Map();
+let renderedViews = [];
+let sectionsSeq = 0;
+let salesView = null;
+let searchGrid = null;
+let emptyState = null;
+
+function getSectionView(key, title, { collapsible = true, tip = '' } = {}) {
+    let view = sectionViews.get(key);
+    if (!view) {
+        const el = document.createElement('div');
+        el.className = 'product-cat-section';
+        el.dataset.sectionKey = key;
+        el.innerHTML = `
+            <div class="product-cat-title"${collapsible ? '' : ' style="border-left-color: #9ca3af;"'}>
+                <span class="section-name"></span>
+                <span class="section-count" style="font-size:14px; font-weight:normal; color:#9ca3af"></span>
+            </div>
+            <div class="expand-bar hidden"></div>
+            <div class="section-tip" style="font-size: 11px; color: #9ca3af; margin-top: 8px;"></div>`;
+        view = { key, el, grid: new VirtualGrid(), collapsible, expanded: false, items: null, count: 0 };
+        const bar = el.querySelector('.expand-bar');
+        el.insertBefore(view.grid.el, bar);
+        bar.addEventListener('click', () => {
+            view.expanded = !view.expanded;
+            setSectionItems(view, view.items, view.count);
+            refreshGrids();
+        });
+        sectionViews.set(key, view);
+    }
+    view.el.querySelector('.section-name').textContent = title;
+    view.el.querySelector('.section-tip').textContent = tip;
+    return view;
+}
 
-        const row = `<tr>
-            <td>${{formattedDate}}</td>
-            <td class="${{priceClass}}">€${{price.toFixed(2)}}${{indicator}}</td>
-        </tr>`;
-        body.innerHTML += row;
-    }});
+// items is null while the section's shards are loading; count is then the manifest count
+function setSectionItems(view, items, count) {
+    view.items = items;
+    view.count = count;
+    view.el.classList.toggle('hidden', count === 0);
+    view.el.querySelector('.section-count').textContent = `(${count} ${t('products')})`;
+    view.grid.el.style.minHeight = items ? '' : `${CARD_HEIGHT.desktop}px`;
 
-    modal.style.display = 'flex';
-    document.body.style.overflow = 'hidden';
-}}
+    const hiddenCount = items && view.collapsible ? items.length - SECTION_PREVIEW : 0;
+    view.grid.setItems(items || [], view.collapsible && !view.expanded ? SECTION_PREVIEW : Infinity);
 
-function closeHistory() {{
-    document.getElementById('historyModal').style.display = 'none';
-    document.body.style.overflow = 'auto';
-}}
+    const bar = view.el.querySelector('.expand-bar');
+    bar.classList.toggle('hidden', hiddenCount <= 0);
+    bar.textContent = view.expanded ? `${t('collapse')} ▴` : `${t('show_more')} ${hiddenCount} ▾`;
+}
 
-window.onclick = function(event) {{
-    const modal = document.getElementById('historyModal');
-    if (event.target == modal) closeHistory();
-}}
+// Section of one productCategory ('' collects products without one). Its items come
+// from the worker; until its shards are loaded it shows the count from the manifest.
+function categorySectionView(prodCat, title, filters) {
+    const shards = sectionShards(prodCat, filters);
+    if (shards.length === 0) return null;
+    const uncategorized = prodCat === '';
+    const view = getSectionView(`cat:${prodCat}`, title, {
+        collapsible: !uncategorized,
+        tip: uncategorized ? t('tip_categories') : ''
+    });
+    view.group = prodCat;
+    view.shards = shards;
+    if (view.items === null || (!filters.salesOnly && !isLoaded(shards))) {
+        setSectionItems(view, null, shards.reduce((n, s) => n + s.count, 0));
+    }
+    return view;
+}
+
+// Ask the worker for the items of every rendered section it can answer for
+async function fillSections() {
+    const seq = ++sectionsSeq;
+    const filters = currentFilters();
+    const ready = renderedViews.filter(v => filters.salesOnly || isLoaded(v.shards));
+    if (ready.length === 0) return;
+    let groups;
+    try {
+        groups = await catalogRequest('sections', {
+            groupBy: productCategories.length > 0 ? 'productCategory' : 'category',
+            files: [...new Set(ready.flatMap(v => v.shards.map(s => s.file)))],
+            filters: catalogFilters(filters)
+        });
+    } catch (err) {
+        console.error('Could not fill sections', err);
+        return;
+    }
+    if (seq !== sectionsSeq) return; // superseded by a newer render or shard load
+    ready.forEach(view => {
+        const items = (groups[view.group] || []).map(findProduct).filter(Boolean);
+        setSectionItems(view, items, items.length);
+    });
+    getEmptyState().classList.toggle('hidden', renderedViews.some(v => v.count > 0));
+    refreshGrids();
+}
+
+function getEmptyState() {
+    if (!emptyState) {
+        emptyState = document.createElement('div');
+        emptyState.className = 'empty-state';
+        emptyState.innerHTML = `<div class="empty-state-icon">🔍</div><p></p>`;
+    }
+    emptyState.querySelector('p').textContent = t('no_products');
+    return emptyState;
+}
 
-function handleSearch() {{
-    const query = document.getElementById('search').value.toLowerCase();
-    const searchGrid = document.getElementById('search-grid');
+async function handleSearch() {
+    clearTimeout(searchTimer);
+    const query = document.getElementById('search').value.trim();
     const searchTitle = document.getElementById('search-results-title');
     const content = document.getElementById('content');
+    if (!searchGrid) searchGrid = new VirtualGrid(card, document.getElementById('search-grid'));
 
-    if (query.length < 2) {{
-        searchGrid.innerHTML = "";
+    if (query.length < 2) {
+        searchGrid.setItems([]);
         searchTitle.style.display = "none";
         content.style.display = "block";
         updateFilterIndicator(false);
+        refreshGrids(true);
         return;
-    }}
+    }
 
-    let searchResults = products.filter(p => {{
-        if (!p.name.toLowerCase().includes(query)) return false;
-        if (!activeStores.has(p.store)) return false;
-        
-        const source = findSource(p.category);
-        if (source && source.productCategory) {{
-            if (!activeProductCategories.has(source.productCategory)) return false;
-        }}
-        
-        const showFavoritesOnly = document.getElementById('filter-favorites')?.checked || false;
-        if (showFavoritesOnly && !favorites.includes(p.name)) return false;
-        
-        const showSalesOnly = document.getElementById('filter-sales')?.checked || false;
-        if (showSalesOnly) {{
-            const isOnSale = saleProducts.some(sp => sp.name === p.name);
-            if (!isOnSale) return false;
-        }}
-        
-        return true;
-    }}).sort((a,b) => (a[currentSort] || 999) - (b[currentSort] || 999));
+    const superseded = () => document.getElementById('search').value.trim() !== query;
+    let names;
+    try {
+        names = await catalogRequest('search', { query, filters: catalogFilters() });
+    } catch (err) {
+        console.error('Search failed', err);
+        return;
+    }
+    if (superseded()) return;
+    const searchResults = names.map(findProduct).filter(Boolean);
 
     content.style.display = "none";
     searchTitle.style.display = "block";
     updateFilterIndicator(true);
-    searchGrid.innerHTML = searchResults.map(p => card(p)).join('');
-}}
+    searchGrid.setItems(searchResults);
+}
 
-function render() {{
+function render() {
+    if (!manifest) return;
     const container = document.getElementById("content");
-    container.innerHTML = "";
     carouselPosition = 0;
+    if (shardObserver) shardObserver.disconnect();
     
     updateFilterIndicator(false);
     
-    const showFavoritesOnly = document.getElementById('filter-favorites')?.checked || false;
-    const showSalesOnly = document.getElementById('filter-sales')?.checked || false;
-    
+    const filters = currentFilters();
     const allCategoriesSelected = activeProductCategories.size === productCategories.length;
     const hasCategoryFilter = !allCategoriesSelected && activeProductCategories.size > 0;
     
-    let filteredProducts = products.filter(p => {{
-        if (!activeStores.has(p.store)) return false;
-        
-        const source = findSource(p.category);
-        if (source && source.productCategory) {{
-            if (!activeProductCategories.has(source.productCategory)) return false;
-        }}
-        
-        return true;
-    }});
-    
-    if (showFavoritesOnly) {{
-        filteredProducts = filteredProducts.filter(p => favorites.includes(p.name));
-    }}
+    const children = [renderFavorites(filters)];
     
-    if (showSalesOnly) {{
-        const saleNames = new Set(saleProducts.map(p => p.name));
-        filteredProducts = filteredProducts.filter(p => saleNames.has(p.name));
-    }}
-    
-    renderFavorites(container, filteredProducts);
-    
-    if (saleProducts.length > 0 && !showFavoritesOnly && !hasCategoryFilter && !showSalesOnly) {{
-        renderSales(container, filteredProducts);
-    }}
+    if (saleProducts.length > 0 && !filters.favoritesOnly && !hasCategoryFilter && !filters.salesOnly) {
+        const sales = renderSales();
+        if (sales) children.push(sales);
+    }
     
-    const categorizedProductNames = new Set();
-
-    if (productCategories.length > 0) {{
-        productCategories.forEach(prodCat => {{
+    const views = [];
+    if (productCategories.length > 0) {
+        productCategories.forEach(prodCat => {
             if (!activeProductCategories.has(prodCat)) return;
-            
-            const catProducts = filteredProducts.filter(p => {{
-                const source = findSource(p.category);
-                const matches = source && source.productCategory.trim().toLowerCase() === prodCat.trim().toLowerCase();
-                if (matches) categorizedProductNames.add(p.name);
-                return matches;
-            }});
-            
-            if (catProducts.length === 0) return;
-            
-            const sorted = catProducts.sort((a,b)=> (a[currentSort] || 999) - (b[currentSort] || 999));
-            const top10 = sorted.slice(0, 10);
-            const rest = sorted.slice(10);
-            const safeId = "hidden_" + prodCat.replace(/[^a-z0-9]/gi, '_');
-            
-            let html = `<div class="product-cat-section">
-                <div class="product-cat-title">
-                    <span>${{prodCat}}</span>
-                    <span style="font-size:14px; font-weight:normal; color:#9ca3af">(${{catProducts.length}} ${{t('products')}})</span>
-                </div>
-                <div class="grid">${{top10.map(p=>card(p)).join('')}}</div>`;
-            
-            if (rest.length > 0) {{
-                html += `<div id="${{safeId}}" class="grid hidden" style="margin-top:15px">${{rest.map(p=>card(p)).join('')}}</div>
-                         <div class="expand-bar" onclick="toggle('${{safeId}}', this)">${{t('show_more')}} ${{rest.length}} ▾</div>`;
-            }}
-            
-            html += `</div>`;
-            container.innerHTML += html;
-        }});
-
-        const uncategorized = filteredProducts.filter(p => !categorizedProductNames.has(p.name));
-        if (uncategorized.length > 0 && !hasCategoryFilter) {{
-            const sorted = uncategorized.sort((a,b)=> (a[currentSort] || 999) - (b[currentSort] || 999));
-            container.innerHTML += `
-                <div class="product-cat-section">
-                    <div class="product-cat-title" style="border-left-color: #9ca3af;">
-                        <span>${{t('uncategorized')}}</span>
-                        <span style="font-size:14px; font-weight:normal; color:#9ca3af">(${{uncategorized.length}} ${{t('products')}})</span>
-                    </div>
-                    <div class="grid">${{sorted.map(p=>card(p)).join('')}}</div>
-                    <div style="font-size: 11px; color: #9ca3af; margin-top: 8px;">
-                        ${{t('tip_categories')}}
-                    </div>
-                </div>`;
-        }}
-    }} else {{
-        renderBySources(container, filteredProducts);
-    }}
-    
-    if (filteredProducts.length === 0) {{
-        container.innerHTML += `
-            <div class="empty-state">
-                <div class="empty-state-icon">🔍</div>
-                <p>${{t('no_products')}}</p>
-            </div>`;
-    }}
+            const view = categorySectionView(prodCat, prodCat, filters);
+            if (view) views.push(view);
+        });
+
+        if (!hasCategoryFilter) {
+            const view = categorySectionView('', t('uncategorized'), filters);
+            if (view) views.push(view);
+        }
+    } else {
+        // Without product categories everything is grouped by source, which needs all shards
+        const shards = activeShards();
+        if (!isLoaded(shards)) {
+            loadShards(shards).then(render);
+            return;
+        }
+        views.push(...renderBySources(shards));
+    }
+
+    renderedViews = views;
+    children.push(...views.map(v => v.el), getEmptyState());
+    getEmptyState().classList.toggle('hidden', views.length > 0);
+    container.replaceChildren(...children);
+    refreshGrids(true);
+    fillSections();
+
+    // Sections whose shards aren't loaded yet fill in once they scroll near the viewport
+    shardObserver = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            shardObserver.unobserve(entry.target);
+            loadShards(sectionViews.get(entry.target.dataset.sectionKey).shards).then(fillSections);
+        });
+    }, { rootMargin: '600px' });
+    if (!filters.salesOnly) views.filter(v => !isLoaded(v.shards)).forEach(v => shardObserver.observe(v.el));
     
     if (document.getElementById('search').value.length >= 2) handleSearch();
-}}
+}
+
+// Shards a category section needs under the current filters
+function sectionShards(prodCat, filters) {
+    let shards = manifest.shards.filter(s => s.productCategory === prodCat && activeStores.has(s.store));
+    if (filters.favoritesOnly) {
+        const favShards = new Set(favoriteShardList().map(s => s.file));
+        shards = shards.filter(s => favShards.has(s.file));
+    }
+    return shards;
+}
+
+// Missing or zero prices sort last
+function byPrice(a, b) {
+    const price = p => (p.latest_price > 0 ? p.latest_price : Infinity);
+    return price(a) - price(b) || (a.name < b.name ? -1 : a.name > b.name ? 1 : 0);
+}
 
-function renderFavorites(container, filteredProducts) {{
+function renderFavorites(filters) {
     const favSection = document.getElementById('favorites-section') || document.createElement('div');
     favSection.id = 'favorites-section';
     favSection.className = 'favorites-section';
     
-    if (favorites.length > 0) {{
-        const favoriteProducts = filteredProducts
-            .filter(p => favorites.includes(p.name))
-            .sort((a, b) => (a.latest_price || 999) - (b.latest_price || 999));
+    if (favorites.length > 0) {
+        const favoriteProducts = favorites
+            .map(findProduct)
+            .filter(p => p && passesFilters(p, filters) && categoryActive(p))
+            .sort(byPrice);
         
-        if (favoriteProducts.length > 0) {{
-            const favCardsHtml = favoriteProducts.map(p => `<div class="carousel-card">${{card(p)}}</div>`).join('');
+        if (favoriteProducts.length > 0) {
+            const favCardsHtml = favoriteProducts.map(p => `<div class="carousel-card">${card(p)}</div>`).join('');
             
             const isMobile = window.innerWidth <= 768;
             const cardsVisible = isMobile ? 1 : 3;
@@ -1685,235 +2717,485 @@ function renderFavorites(container, filteredProducts) {{
             favSection.innerHTML = `
                 <div class="section-title">
                     <span>⭐</span>
-                    <span>${{t('favorites')}}</span>
+                    <span>${t('favorites')}</span>
                 </div>
                 <div class="section-subtitle">
-                    ${{favoriteProducts.length}} ${{t('tracked')}} · ${{t('sorted_by_price')}}
+                    ${favoriteProducts.length} ${t('tracked')} · ${t('sorted_by_price')}
                 </div>
                 <div class="carousel-container">
                     <button class="carousel-btn carousel-btn-left" onclick="moveCarousel(-1)" disabled>←</button>
                     <div class="carousel-track">
-                        ${{favCardsHtml}}
+                        ${favCardsHtml}
                     </div>
-                    <button class="carousel-btn carousel-btn-right" onclick="moveCarousel(1)" ${{hasMultiplePages ? '' : 'disabled'}}>→</button>
+                    <button class="carousel-btn carousel-btn-right" onclick="moveCarousel(1)" ${hasMultiplePages ? '' : 'disabled'}>→</button>
                 </div>
             `;
             favSection.style.display = 'block';
             
             carouselPosition = 0;
-            setTimeout(() => {{
+            setTimeout(() => {
                 initCarouselTouch();
                 moveCarousel(0);
-            }}, 100);
-        }} else {{
+            }, 100);
+        } else {
             favSection.style.display = 'none';
-        }}
-    }} else {{
+        }
+    } else {
         favSection.style.display = 'none';
-    }}
-    container.appendChild(favSection);
-}}
+    }
+    return favSection;
+}
 
-function renderSales(container, filteredProducts) {{
-    const filteredSaleNames = new Set(filteredProducts.map(p => p.name));
-    const filteredSales = saleProducts.filter(p => filteredSaleNames.has(p.name) && activeStores.has(p.store));
-    
-    if (filteredSales.length === 0) return;
+function renderSales() {
+    const filteredSales = saleProducts.filter(p => activeStores.has(p.store) && categoryActive(p));
     
-    const top3Sales = filteredSales.slice(0, 3);
-    const restSales = filteredSales.slice(3);
-    
-    const salesHtml = `
-        <div class="sales-section" id="sales-section">
+    if (filteredSales.length === 0) return null;
+
+    if (!salesView) {
+        const el = document.createElement('div');
+        el.className = 'sales-section';
+        el.id = 'sales-section';
+        el.innerHTML = `
             <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;">
                 <div class="section-title">
                     <span>🔥</span>
-                    <span>${{t('on_sale')}}</span>
-                    <span class="sale-badge">${{filteredSales.length}}</span>
+                    <span class="sales-title"></span>
+                    <span class="sale-badge"></span>
                 </div>
-                ${{restSales.length > 0 ? 
-                    `<button class="expand-sales-btn" onclick="toggleAllSales()">${{t('show_all')}}</button>` 
-                    : ''}}
-            </div>
-            <div class="grid" id="top-sales-grid">${{top3Sales.map(p => cardWithDiscount(p)).join('')}}</div>
-            <div class="grid hidden" id="all-sales-grid" style="margin-top:15px">${{restSales.map(p => cardWithDiscount(p)).join('')}}</div>
-        </div>
-    `;
-    container.innerHTML += salesHtml;
-}}
-
-function renderBySources(container, filteredProducts) {{
-    const byCat = {{}};
-    filteredProducts.forEach(p => {{
-        if(!byCat[p.category]) byCat[p.category] = [];
-        byCat[p.category].push(p);
-    }});
-
-    sources.forEach((source, index) => {{
-        if (!byCat[source.key] || !activeStores.has(source.store)) return;
-        
-        const sorted = byCat[source.key].sort((a,b)=> (a[currentSort] || 999) - (b[currentSort] || 999));
-        const top10 = sorted.slice(0, 10);
-        const rest = sorted.slice(10);
-        const hiddenId = `hidden_source_${{index}}`;
-
-        let html = `
-            <div class="product-cat-section">
-                <div class="product-cat-title">${{source.name}} <span style="font-size:14px; font-weight:normal; color:#9ca3af">(${{sorted.length}})</span></div>
-                <div class="grid">${{top10.map(p=>card(p)).join('')}}</div>
-        `;
-        if (rest.length > 0) {{
-            html += `<div id="${{hiddenId}}" class="grid hidden" style="margin-top:15px">${{rest.map(p=>card(p)).join('')}}</div>
-                     <div class="expand-bar" onclick="toggle('${{hiddenId}}', this)">${{t('show_more')}} ${{rest.length}} ▾</div>`;
-        }}
-        html += `</div>`;
-        container.innerHTML += html;
-    }});
-}}
-
-function toggleAllSales() {{
-    const allSalesGrid = document.getElementById('all-sales-grid');
-    const btn = event.target;
-    const isHidden = allSalesGrid.classList.toggle('hidden');
-    btn.textContent = isHidden ? t('show_all') : t('show_less');
-}}
-
-function toggle(id, btn) {{
-    const el = document.getElementById(id);
-    const isHidden = el.classList.toggle('hidden');
-    btn.innerHTML = isHidden ? `${{t('show_more')}} ▾` : `${{t('collapse')}} ▴`;
-}}
-
-function cardWithDiscount(p) {{
+                <button class="expand-sales-btn" onclick="toggleAllSales()"></button>
+            </div>`;
+        salesView = { el, grid: new VirtualGrid(cardWithDiscount), expanded: false, items: [] };
+        el.appendChild(salesView.grid.el);
+    }
+    salesView.items = filteredSales;
+    salesView.el.querySelector('.sales-title').textContent = t('on_sale');
+    salesView.el.querySelector('.sale-badge').textContent = filteredSales.length;
+    const btn = salesView.el.querySelector('.expand-sales-btn');
+    btn.classList.toggle('hidden', filteredSales.length <= SALES_PREVIEW);
+    btn.textContent = salesView.expanded ? t('show_less') : t('show_all');
+    salesView.grid.setItems(filteredSales, salesView.expanded ? Infinity : SALES_PREVIEW);
+    return salesView.el;
+}
+
+// Sections per source, used when categories.json defines no product categories
+function renderBySources(shards) {
+    return sources.filter(source => activeStores.has(source.store)).map(source => {
+        const view = getSectionView(`source:${source.key}`, source.name);
+        view.group = source.key;
+        view.shards = shards.filter(s => s.store === source.store);
+        if (view.items === null) setSectionItems(view, null, 0);
+        return view;
+    });
+}
+
+function toggleAllSales() {
+    salesView.expanded = !salesView.expanded;
+    renderSales();
+    refreshGrids();
+}
+
+// Local thumbnails (build_site.py --images) where the build made them, store images otherwise.
+// Fixed dimensions keep the layout stable while lazy images load.
+const NO_IMAGE = "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='70' height='100'%3E%3Crect width='70' height='100' rx='6' fill='%23f3f4f6'/%3E%3C/svg%3E";
+
+function cardImage(p) {
+    const img = `<img src="${p.thumb || p.img || NO_IMAGE}" width="${SITE_CONFIG.cardImage.width}" height="${SITE_CONFIG.cardImage.height}" loading="lazy" decoding="async" alt="" onerror="imageFailed(this)">`;
+    return p.thumb_avif ? `<picture><source type="image/avif" srcset="${p.thumb_avif}">${img}</picture>` : img;
+}
+
+function imageFailed(img) {
+    img.onerror = null;
+    img.parentElement.querySelectorAll('source').forEach(source => source.remove());
+    img.src = NO_IMAGE;
+}
+
+// The cheapest matching product at another store, when it beats this one (see product_matching.py)
+function compareHint(p) {
+    const cheapest = (p.compare || [])[0];
+    if (!cheapest || !(cheapest.latest_price < p.latest_price)) return '';
+    return ` <span class="compare-hint">· ${t('cheaper_at')} ${getDisplayStoreName(cheapest.store)} €${cheapest.latest_price.toFixed(2)}</span>`;
+}
+
+function cardWithDiscount(p) {
     const unitLabel = p.unit_label || 'L';
     const unitPrice = p.price_per_unit || p.price_per_litre || 0;
-    const discountPct = p.discount_pct || 0;
+    const discountPct = p.stats.discount_pct;
     const isFav = favorites.includes(p.name);
-    const safeName = p.name.replace(/'/g, "\\\\'").replace(/"/g, '&quot;');
+    const safeName = p.name.replace(/'/g, "\\'").replace(/"/g, '&quot;');
     const displayStore = getDisplayStoreName(p.store);
     
-    return `<div class="card" onclick="showHistory('${{safeName}}', event)">
-        <span class="discount-badge">-${{discountPct.toFixed(0)}}%</span>
-        <span class="store-badge store-${{p.store}}">${{displayStore}}</span>
-        <button class="fav-btn ${{isFav ? 'active' : ''}}" onclick="toggleFavorite('${{safeName}}', event); return false;">
-            ${{isFav ? '⭐' : '☆'}}
+    return `<div class="card" onclick="showHistory('${safeName}', event)">
+        <span class="discount-badge">-${discountPct.toFixed(0)}%</span>
+        <span class="store-badge store-${p.store}">${displayStore}</span>
+        <button class="fav-btn ${isFav ? 'active' : ''}" onclick="toggleFavorite('${safeName}', event); return false;">
+            ${isFav ? '⭐' : '☆'}
         </button>
-        <img src="${{p.img}}" onerror="this.src='https://via.placeholder.com/60x90?text=No+Img'">
+        ${cardImage(p)}
         <div class="info">
-            <div class="name">${{p.name}}</div>
+            <div class="name">${p.name}</div>
             <div class="price-container">
-                <span class="price price-sale">€${{p.latest_price.toFixed(2)}}</span>
-                <span class="price-old">€${{p.previous_price.toFixed(2)}}</span>
+                <span class="price price-sale">€${p.latest_price.toFixed(2)}</span>
+                <span class="price-old">€${p.stats.typical.toFixed(2)}</span>
             </div>
-            <div class="per-l">€${{unitPrice.toFixed(2)}} / ${{unitLabel}}</div>
+            <div class="per-l">€${unitPrice.toFixed(2)} / ${unitLabel}${compareHint(p)}</div>
         </div>
     </div>`;
-}}
+}
 
-function card(p) {{
+function card(p) {
     const unitLabel = p.unit_label || 'L';
     const unitPrice = p.price_per_unit || p.price_per_litre || 0;
     const entries = p.entries || [];
     const isFav = favorites.includes(p.name);
-    const safeName = p.name.replace(/'/g, "\\\\'").replace(/"/g, '&quot;');
+    const safeName = p.name.replace(/'/g, "\\'").replace(/"/g, '&quot;');
     const displayStore = getDisplayStoreName(p.store);
     
-    let priceDisplay = `<div class="price">€${{p.latest_price.toFixed(2)}}</div>`;
+    let priceDisplay = `<div class="price">€${p.latest_price.toFixed(2)}</div>`;
     
-    if (entries.length > 1) {{
+    // Sales are judged against the typical price (see price_stats.py), not the previous one
+    if (p.on_sale) {
+        priceDisplay = `
+            <div class="price-container">
+                <span class="price price-sale">€${p.latest_price.toFixed(2)}</span>
+                <span class="price-old">€${p.stats.typical.toFixed(2)}</span>
+            </div>`;
+    } else if (entries.length > 1) {
         const currentP = p.latest_price;
         const previousP = entries[entries.length - 2].p;
         
-        if (currentP < previousP) {{
-            priceDisplay = `
-                <div class="price-container">
-                    <span class="price price-sale">€${{currentP.toFixed(2)}}</span>
-                    <span class="price-old">€${{previousP.toFixed(2)}}</span>
-                </div>`;
-        }} else if (currentP > previousP) {{
+        if (currentP > previousP) {
             priceDisplay = `
                 <div class="price-container">
-                    <span class="price">€${{currentP.toFixed(2)}}</span>
+                    <span class="price">€${currentP.toFixed(2)}</span>
                     <span style="font-size: 10px; color: #ef4444;">▲</span>
                 </div>`;
-        }}
-    }}
+        }
+    }
 
-    return `<div class="card" onclick="showHistory('${{safeName}}', event)">
-        <span class="store-badge store-${{p.store}}">${{displayStore}}</span>
-        <button class="fav-btn ${{isFav ? 'active' : ''}}" onclick="toggleFavorite('${{safeName}}', event); return false;">
-            ${{isFav ? '⭐' : '☆'}}
+    return `<div class="card" onclick="showHistory('${safeName}', event)">
+        <span class="store-badge store-${p.store}">${displayStore}</span>
+        <button class="fav-btn ${isFav ? 'active' : ''}" onclick="toggleFavorite('${safeName}', event); return false;">
+            ${isFav ? '⭐' : '☆'}
         </button>
-        <img src="${{p.img}}" onerror="this.src='https://via.placeholder.com/60x90?text=No+Img'">
+        ${cardImage(p)}
         <div class="info">
-            <div class="name">${{p.name}}</div>
-            ${{priceDisplay}}
-            <div class="per-l">€${{unitPrice.toFixed(2)}} / ${{unitLabel}}</div>
+            <div class="name">${p.name}</div>
+            ${priceDisplay}
+            <div class="per-l">€${unitPrice.toFixed(2)} / ${unitLabel}${compareHint(p)}</div>
         </div>
     </div>`;
-}}
+}
 
 // Mobile scroll behavior: hide header when scrolling down, show when scrolling up
-function handleScroll() {{
+function handleScroll() {
     // Only apply this behavior on mobile
     if (window.innerWidth > 768) return;
     
-    if (!ticking) {{
-        window.requestAnimationFrame(() => {{
+    if (!ticking) {
+        window.requestAnimationFrame(() => {
             const header = document.getElementById('header');
             const hamburger = document.getElementById('hamburger');
             const currentScroll = window.pageYOffset || document.documentElement.scrollTop;
             
             // Prevent negative scrolling
-            if (currentScroll <= 0) {{
+            if (currentScroll <= 0) {
                 header.classList.remove('hide');
                 hamburger.classList.remove('hide');
                 lastScrollTop = currentScroll;
                 ticking = false;
                 return;
-            }}
+            }
             
             const scrollDifference = Math.abs(currentScroll - lastScrollTop);
             
             // Only trigger if scrolled more than 5px (reduces jitter)
-            if (scrollDifference > 5) {{
+            if (scrollDifference > 5) {
                 // Scrolling down - hide header
-                if (currentScroll > lastScrollTop && currentScroll > 80) {{
+                if (currentScroll > lastScrollTop && currentScroll > 80) {
                     header.classList.add('hide');
                     hamburger.classList.add('hide');
-                }} 
+                } 
                 // Scrolling up - show header
-                else if (currentScroll < lastScrollTop) {{
+                else if (currentScroll < lastScrollTop) {
                     header.classList.remove('hide');
                     hamburger.classList.remove('hide');
-                }}
+                }
                 
                 lastScrollTop = currentScroll;
-            }}
+            }
             
             ticking = false;
-        }});
+        });
         
         ticking = true;
-    }}
-}}
+    }
+}
 
 // Initialize scroll listener
-window.addEventListener('scroll', handleScroll, {{ passive: true }});
+window.addEventListener('scroll', handleScroll, { passive: true });
+
+// Returning visitors get data patched from the per-build deltas, see sw.js
+function registerServiceWorker() {
+    if (!('serviceWorker' in navigator) || !location.protocol.startsWith('http')) return;
+    navigator.serviceWorker.register(SITE_CONFIG.serviceWorkerFile).catch(err => {
+        console.error('Service worker registration failed', err);
+    });
+}
+
+// The sidebar counts, which the page shell leaves out so it only changes with the template
+function showCounts() {
+    document.querySelectorAll('[data-count-category]').forEach(el => {
+        el.textContent = `(${manifest.counts.categories[el.dataset.countCategory] || 0})`;
+    });
+    document.querySelectorAll('[data-count-store]').forEach(el => {
+        el.textContent = `(${manifest.counts.stores[el.dataset.countStore] || 0})`;
+    });
+}
+
+async function init() {
+    loadFavorites();
+    const response = await fetch('data/manifest.json', { cache: 'no-cache' });
+    manifest = await response.json();
+    activeStores = new Set(manifest.sources.map(s => s.store));
+    startCatalog();
+    registerServiceWorker();
+    translations = manifest.translations;
+    sources = manifest.sources;
+    productCategories = manifest.productCategories;
+    activeProductCategories = new Set(productCategories);
+    document.getElementById('last-run').textContent = (manifest.lastRun || '').slice(0, 10);
+    showCounts();
+
+    const sales = await fetchJson('sales.json');
+    saleProducts = sales.products;
+    saleByName = new Map(saleProducts.map(p => [p.name, p]));
+
+    await loadFavoriteShards();
+    loadLanguage();
+}
+
+init();
+"""
+
+def app_script():
+    config = {
+        "workerFile": WORKER_FILE,
+        "serviceWorkerFile": SERVICE_WORKER_FILE,
+        "cardImage": {"width": image_pipeline.CARD_IMAGE_WIDTH, "height": image_pipeline.CARD_IMAGE_HEIGHT},
+    }
+    return f"const SITE_CONFIG = {json.dumps(config)};\n" + site_assets.minify_js(APP_JS)
+
+def payload_sizes():
+    """Uncompressed bytes of the published site by part: the page with its assets, the
+    data the page fetches up front (manifest and sales) and the data it fetches on demand"""
+    assets = [name for name in os.listdir(".") if re.match(r"^app\.[0-9a-f]{10}\.(css|js)$", name)]
+    parts = {"page": [OUTPUT_FILE, *assets], "initial_data": [MANIFEST_FILE, SALES_FILE],
+             "search": [SEARCH_FILE], "shards": [], "history": [], "deltas": []}
+    for part, directory in (("shards", SHARD_DIR), ("history", HISTORY_DIR), ("deltas", DELTA_DIR)):
+        if os.path.isdir(directory):
+            parts[part] = [os.path.join(directory, name) for name in os.listdir(directory)]
+    return {part: sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+            for part, paths in parts.items()}
+
+def build(images=False, image_source=None):
+    """Build the static site. images=True adds local thumbnails (see image_pipeline).
+    Returns False when the site was already up to date."""
+    started = time.perf_counter()
+    built = _build(images, image_source)
+    metrics.inc("build_runs_total", result="built" if built else "up_to_date")
+    # Up-to-date checks would drag the build time down to nothing
+    if built:
+        metrics.set_gauge("build_seconds", round(time.perf_counter() - started, 3))
+    for part, size in payload_sizes().items():
+        metrics.set_gauge("site_payload_bytes", size, part=part)
+    return built
+
+def _build(images, image_source):
+    """build() without the metrics; returns whether anything was built"""
+    cache = BuildCache()
+    inputs = input_digest(images, image_source)
+    if cache.is_current(inputs):
+        print("Static site is up to date, nothing to rebuild")
+        return False
+
+    products, sources, product_categories, last_run = load_data()
+    assign_product_categories(products, sources, product_categories)
+    price_stats.add_stats(products, last_run)
+    matches = product_matching.update_matches(products)
+    product_matching.add_comparisons(products, matches["groups"])
+    if images:
+        image_pipeline.add_thumbnails(products, image_source)
+    
+    agg = aggregate(products, sources)
+    manifest = write_data_files(cache, agg, sources, product_categories, last_run)
+    
+    # Generate sidebar with collapsible categories
+    sidebar_links = ""
+    
+    # Product Categories Section (collapsible)
+    if product_categories:
+        sidebar_links += '''
+        <div class="filter-section">
+            <div class="filter-title" onclick="toggleCategories()" style="cursor: pointer; display: flex; justify-content: space-between; align-items: center;">
+                <span data-i18n="categories">🏷️ Categories</span>
+                <span id="categories-arrow">▼</span>
+            </div>
+            <div id="product-categories" class="product-categories">'''
+        
+        # Counts change with every scrape, so showCounts() fills them in from the manifest
+        for cat in product_categories:
+            sidebar_links += f'''
+                <label class="filter-checkbox">
+                    <input type="checkbox" checked onchange="filterByProductCategory()" data-product-category="{cat}">
+                    <span>{cat}</span>
+                    <span class="count" data-count-category="{cat}"></span>
+                </label>'''
+        
+        sidebar_links += '''
+            </div>
+        </div>'''
+    
+    # Stores Filter Section
+    stores = list(set([source['store'] for source in sources]))
+    stores.sort()
+    
+    sidebar_links += '<div class="filter-section">'
+    sidebar_links += '<div class="filter-title" data-i18n="stores">Stores</div>'
+    for store in stores:
+        display_name = "Maxima" if store == "Barbora" else store
+        sidebar_links += f'''
+        <label class="filter-checkbox">
+            <input type="checkbox" checked onchange="filterByStore()" data-store="{store}">
+            <span class="store-label-sm store-label-{store}">{display_name}</span>
+            <span class="count" data-count-store="{store}"></span>
+        </label>'''
+    sidebar_links += '</div>'
+    
+    # Quick Filters
+    sidebar_links += '<div class="filter-section">'
+    sidebar_links += '<div class="filter-title" data-i18n="quick_filters">Quick Filters</div>'
+    sidebar_links += '''
+        <label class="filter-checkbox">
+            <input type="checkbox" id="filter-favorites" onchange="applyFilters()">
+            <span data-i18n="favorites_only">⭐ Favorites only</span>
+        </label>
+        <label class="filter-checkbox">
+            <input type="checkbox" id="filter-sales" onchange="applyFilters()">
+            <span data-i18n="on_sale">🔥 On sale</span>
+        </label>
+    </div>'''
+    
+    # Admin link at bottom
+    sidebar_links += '''
+    <div class="filter-section" style="border-bottom: none; padding-top: 20px;">
+        <a href="admin.html" class="admin-link">
+            <span style="font-size: 18px;">⚙️</span>
+            <span data-i18n="admin">Admin</span>
+        </a>
+    </div>'''
+    
+    css_file = site_assets.write_asset("", "app", "css", site_assets.minify_css(APP_CSS))
+    js_file = site_assets.write_asset("", "app", "js", app_script())
+
+    html_template = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <title data-i18n="title">Price Tracker</title>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <link rel="stylesheet" href="{css_file}">
+    <script src="{js_file}" defer></script>
+</head>
+<body>
+    <button class="hamburger" id="hamburger" onclick="toggleMenu()">
+        <span></span>
+        <span></span>
+        <span></span>
+    </button>
+    
+    <div class="sidebar-overlay" id="sidebar-overlay" onclick="toggleMenu()"></div>
+    
+    <div class="sidebar" id="sidebar">
+        <h2>📊 <span data-i18n="title">Price Tracker</span></h2>
+        <span class="last-run"><span data-i18n="updated">Updated</span>: <span id="last-run"></span></span>
+        
+        <div class="lang-switcher">
+            <button class="lang-btn" data-lang="et" onclick="setLanguage('et')" title="Eesti">🇪🇪</button>
+            <button class="lang-btn" data-lang="en" onclick="setLanguage('en')" title="English">🇬🇧</button>
+        </div>
+        
+        {sidebar_links}
+    </div>
+
+    <div class="main">
+        <div class="header" id="header">
+            <div class="controls">
+                <div>
+                    <button class="btn" id="sort-unit" onclick="setSort('price_per_unit')" data-i18n="best_value">Best Value</button>
+                    <button class="btn btn-active" id="sort-total" onclick="setSort('latest_price')" data-i18n="price">Price</button>
+                </div>
+                <input type="text" id="search" class="search-box" data-i18n-placeholder="search_placeholder" placeholder="Search products..." oninput="scheduleSearch()">
+            </div>
+        </div>
+        
+        <div class="filter-indicator" id="filter-indicator"></div>
+        
+        <div id="search-results-title" data-i18n="search_results">Search Results</div>
+        <div id="search-grid" class="grid" style="margin-top: 20px;"></div>
+
+        <div id="content"></div>
+    </div>
+
+    <div id="historyModal" class="modal">
+        <div class="modal-content">
+            <span class="modal-close" onclick="closeHistory()">&times;</span>
+            <h3 id="modalTitle" style="margin-top: 0; padding-right: 30px;">Product History</h3>
+            <div style="display: flex; align-items: center; gap: 15px; margin: 15px 0;">
+                <img id="modalImg" src="" style="width: 80px; height: 80px; object-fit: contain;">
+                <div>
+                    <div id="modalStore" class="store-label-sm" style="margin-left: 0; margin-bottom: 5px;"></div>
+                    <div id="modalCurrentPrice" style="font-size: 20px; font-weight: 700;"></div>
+                    <div id="modalStats" style="font-size: 12px; color: #6b7280; margin-top: 4px;"></div>
+                    <div id="modalCompare"></div>
+                </div>
+            </div>
+            <table class="history-table">
+                <thead>
+                    <tr>
+                        <th data-i18n="date">Date</th>
+                        <th data-i18n="price">Price</th>
+                    </tr>
+                </thead>
+                <tbody id="historyBody"></tbody>
+            </table>
+            <a id="modalStoreLink" href="#" target="_blank" class="view-store-btn" data-i18n="view_store">View on Store</a>
+        </div>
+    </div>
 
-loadLanguage();
-loadFavorites();
-render();
-</script>
 </body>
 </html>
 """
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        f.write(html_template)
-    print(f"Static site built: {OUTPUT_FILE}")
-    print(f"Found {len(sale_products)} products on sale")
+    cache.emit(OUTPUT_FILE, digest(html_template), lambda: html_template)
+    cache.save(inputs)
+    metrics.set_gauge("build_files_written", cache.written)
+    print(f"Static site built: {OUTPUT_FILE} ({len(manifest['shards'])} data shards in {SHARD_DIR})")
+    print(f"Outputs rewritten: {cache.written}, unchanged inputs reused: {cache.reused}")
+    print(f"Found {len(agg['sale_products'])} products on sale")
+    print(f"Cross-store matches: {len(matches['groups'])} groups ({matches['new']} products newly matched)")
     print(f"Product categories: {', '.join(product_categories) if product_categories else 'None'}")
+    return True
 
 if __name__ == "__main__":
-    build()
+    parser = argparse.ArgumentParser(description="Build the static site")
+    parser.add_argument("--images", action="store_true", help="generate local card thumbnails (needs Pillow)")
+    parser.add_argument("--image-source", help="read original images from this directory instead of the network")
+    parser.add_argument("--serve", action="store_true", help="serve the site locally after building")
+    args = parser.parse_args()
+    # A build that found nothing to do isn't a run worth a summary (or a commit)
+    if build(images=args.images, image_source=args.image_source):
+        print(f"Metrics: {metrics.write_run('build')}")
+    if args.serve:
+        import static_server
+        static_server.serve()
 
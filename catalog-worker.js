@@ -0,0 +1,240 @@
+// Catalogue worker for index.html, written by build_site.py.
+// Holds the loaded shards, the sale list and the search index, and answers filter, sort
+// and search queries with ordered lists of product names, so the page only paints.
+// Shards are sent to the page once, with the first response after they load.
+// Where workers are unavailable (e.g. file://) the page runs createCatalog() itself.
+
+function createCatalog(post) {
+    const SEARCH_EXACT_SCORE = 3;
+    const SEARCH_PREFIX_SCORE = 1;
+
+    let version = '';
+    let shards = [];                  // manifest.shards
+    const shardOrders = new Map();    // shard file -> {sortKey: products pre-sorted by the builder}
+    const shardProducts = new Map();  // shard file -> products in published (name) order
+    const shardRequests = new Map();  // shard file -> pending/settled Promise
+    const undelivered = new Map();    // shard file -> products not yet sent to the page
+    let salesRequest = null;
+    let searchIndexRequest = null;
+
+    function dataUrl(path) {
+        return `data/${path}?v=${version}`;
+    }
+
+    async function fetchJson(path) {
+        const response = await fetch(dataUrl(path));
+        if (!response.ok) throw new Error(`${path}: HTTP ${response.status}`);
+        return response.json();
+    }
+
+    function loadShard(shard) {
+        if (!shardRequests.has(shard.file)) {
+            const request = fetchJson(`shards/${shard.file}`).then(data => {
+                data.products.forEach(p => {
+                    p.shard = shard.file;
+                    p.productCategory = shard.productCategory;
+                });
+                const orders = {};
+                Object.entries(data.order).forEach(([key, indexes]) => {
+                    orders[key] = indexes.map(i => data.products[i]);
+                });
+                shardOrders.set(shard.file, orders);
+                shardProducts.set(shard.file, data.products);
+                undelivered.set(shard.file, data.products);
+            }).catch(err => {
+                shardRequests.delete(shard.file); // allow a retry on the next request
+                console.error('Could not load shard', shard.file, err);
+            });
+            shardRequests.set(shard.file, request);
+        }
+        return shardRequests.get(shard.file);
+    }
+
+    function loadShards(files) {
+        const wanted = new Set(files);
+        return Promise.all(shards.filter(s => wanted.has(s.file)).map(loadShard));
+    }
+
+    function loadSearchIndex() {
+        if (!searchIndexRequest) {
+            searchIndexRequest = fetchJson('search.json').then(index => {
+                // Postings are delta-encoded
+                index.postings = index.postings.map(deltas => {
+                    let id = 0;
+                    return deltas.map(d => (id += d));
+                });
+                return index;
+            }).catch(err => {
+                searchIndexRequest = null;
+                throw err;
+            });
+        }
+        return searchIndexRequest;
+    }
+
+    // FILTERS AND SORTING
+    // filters: {stores, categories, favorites, favoritesOnly, salesOnly, sort}
+    function matcher(filters) {
+        const stores = new Set(filters.stores);
+        const categories = new Set(filters.categories);
+        const favorites = new Set(filters.favorites);
+        return p => stores.has(p.store)
+            && (!p.productCategory || categories.has(p.productCategory))
+            && (!filters.favoritesOnly || favorites.has(p.name))
+            && (!filters.salesOnly || p.on_sale);
+    }
+
+    // Missing or zero prices sort last, as in the builder's pre-sorted orders
+    function comparator(sort) {
+        const value = p => (p[sort] > 0 ? p[sort] : Infinity);
+        return (a, b) => value(a) - value(b) || (a.name < b.name ? -1 : a.name > b.name ? 1 : 0);
+    }
+
+    // Merge the builder's per-shard orders for one sort key (no re-sorting)
+    function mergeShards(files, sort) {
+        const compare = comparator(sort);
+        const lists = files.map(file => shardOrders.get(file)[sort]);
+        if (lists.length === 1) return lists[0].slice();
+        const merged = [];
+        const pos = lists.map(() => 0);
+        for (;;) {
+            let best = -1;
+            for (let i = 0; i < lists.length; i++) {
+                if (pos[i] < lists[i].length && (best < 0 || compare(lists[i][pos[i]], lists[best][pos[best]]) < 0)) best = i;
+            }
+            if (best < 0) return merged;
+            merged.push(lists[best][pos[best]++]);
+        }
+    }
+
+    // SEARCH
+    // Mirrors fold_text()/search_tokens() in build_site.py
+    function foldText(text) {
+        return text.normalize('NFKD').replace(/\p{M}/gu, '').toLowerCase();
+    }
+
+    function searchTokens(text) {
+        const folded = foldText(text).replace(/(\d),(\d)/g, '$1.$2').replace(/(\d) (c?l|ml)\b/g, '$1$2');
+        return (folded.match(/[a-z0-9.%]+/g) || []).map(t => t.replace(/^\.+|\.+$/g, '')).filter(Boolean);
+    }
+
+    // First index in a sorted array whose value is >= target
+    function lowerBound(values, target) {
+        let lo = 0, hi = values.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (values[mid] < target) lo = mid + 1; else hi = mid;
+        }
+        return lo;
+    }
+
+    // Doc ids number products shard by shard, in the order the shards list them
+    function docShard(index, id) {
+        const i = lowerBound(index.offsets, id + 1) - 1;
+        return { shard: shards[i], position: id - index.offsets[i] };
+    }
+
+    // Doc ids matching every query token (as a word prefix), with their scores
+    function searchIndex(index, query) {
+        let scores = null;
+        for (const q of new Set(searchTokens(query))) {
+            const matches = new Map();
+            for (let i = lowerBound(index.tokens, q); i < index.tokens.length && index.tokens[i].startsWith(q); i++) {
+                const score = index.tokens[i] === q ? SEARCH_EXACT_SCORE : SEARCH_PREFIX_SCORE;
+                index.postings[i].forEach(id => {
+                    if (!(matches.get(id) >= score)) matches.set(id, score);
+                });
+            }
+            if (scores) {
+                scores.forEach((score, id) => {
+                    if (matches.has(id)) scores.set(id, score + matches.get(id)); else scores.delete(id);
+                });
+            } else {
+                scores = matches;
+            }
+            if (scores.size === 0) break;
+        }
+        return scores || new Map();
+    }
+
+    // REQUESTS
+    const handlers = {
+        init(payload) {
+            version = payload.version;
+            shards = payload.shards;
+            salesRequest = fetchJson('sales.json').then(data => data.products);
+            return null;
+        },
+
+        async load({ files }) {
+            await loadShards(files);
+            return null;
+        },
+
+        // Product names per group (productCategory or source key), in sort order.
+        // Sections of shards that aren't loaded yet are left out.
+        async sections({ groupBy, files, filters }) {
+            const keep = matcher(filters);
+            let ordered;
+            if (filters.salesOnly) {
+                // The sale list is complete on its own
+                const wanted = new Set(files);
+                ordered = (await salesRequest).filter(p => wanted.has(p.shard)).sort(comparator(filters.sort));
+            } else {
+                ordered = mergeShards(files.filter(file => shardOrders.has(file)), filters.sort);
+            }
+            const groups = {};
+            ordered.forEach(p => {
+                if (!keep(p)) return;
+                const key = p[groupBy] || '';
+                (groups[key] || (groups[key] = [])).push(p.name);
+            });
+            return groups;
+        },
+
+        // Product names matching the query, best match first, then in sort order.
+        // Only the shards holding hits (in active stores and categories) are loaded.
+        async search({ query, filters }) {
+            const index = await loadSearchIndex();
+            const scores = searchIndex(index, query);
+            const stores = new Set(filters.stores);
+            const categories = new Set(filters.categories);
+            const files = new Set();
+            scores.forEach((_, id) => {
+                const { shard } = docShard(index, id);
+                if (stores.has(shard.store) && (!shard.productCategory || categories.has(shard.productCategory))) {
+                    files.add(shard.file);
+                }
+            });
+            await loadShards([...files]);
+
+            const keep = matcher(filters);
+            const score = new Map();
+            scores.forEach((value, id) => {
+                const { shard, position } = docShard(index, id);
+                const p = shardProducts.has(shard.file) && shardProducts.get(shard.file)[position];
+                if (p && keep(p)) score.set(p, value);
+            });
+            const compare = comparator(filters.sort);
+            return [...score.keys()].sort((a, b) => score.get(b) - score.get(a) || compare(a, b)).map(p => p.name);
+        },
+    };
+
+    return async function handle({ id, type, payload }) {
+        let message;
+        try {
+            message = { id, result: await handlers[type](payload) };
+        } catch (err) {
+            message = { id, error: String((err && err.message) || err) };
+        }
+        // Results may name products of shards the page hasn't seen yet, so send those along
+        message.shards = Object.fromEntries(undelivered);
+        undelivered.clear();
+        post(message);
+    };
+}
+
+if (typeof WorkerGlobalScope !== 'undefined' && self instanceof WorkerGlobalScope) {
+    const handle = createCatalog(message => self.postMessage(message));
+    self.onmessage = event => handle(event.data);
+}
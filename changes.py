@@ -0,0 +1,136 @@
+"""Per-run change sets: what a scrape changed, so later steps needn't diff the history.
+
+scraper2.py writes CHANGES_DIR/<run_id>.json after every run and stores the run ID in
+the history's meta. A change set lists:
+
+    new                  products seen for the first time
+    price_changes        {name, category, store, old, new}
+    unit_price_changes   the same for price_per_unit
+    missing              products of the fully scraped categories that weren't seen this run
+    categories           per category key: seen, new, price_changes, unit_price_changes,
+                         missing, the pages and seconds it took to scrape and the
+                         browser's peak memory meanwhile (peak_rss_mb)
+    stores               per store health, see store_health.py
+
+Only the last KEEP_RUNS change sets are kept.
+"""
+import json, os
+from datetime import datetime
+
+CHANGES_DIR = "changes"
+KEEP_RUNS = 60
+# Unit prices are derived and carry float noise; smaller differences aren't changes
+UNIT_PRICE_EPSILON = 0.005
+
+def new_run_id(moment):
+    return moment.strftime("%Y%m%dT%H%M%S")
+
+def run_id_for(generated_at):
+    """The run ID of a history's generated_at, or None if it isn't a timestamp"""
+    try:
+        return new_run_id(datetime.fromisoformat(generated_at))
+    except (TypeError, ValueError):
+        return None
+
+def path_for(run_id):
+    return os.path.join(CHANGES_DIR, f"{run_id}.json")
+
+def load(run_id):
+    """The change set of a run, or None if it wasn't recorded (or has been pruned)"""
+    if not run_id:
+        return None
+    try:
+        with open(path_for(run_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def changed_names(change_set):
+    """Products that are new or changed price or unit price in a run"""
+    return {c["name"] for key in ("new", "price_changes", "unit_price_changes") for c in change_set[key]}
+
+class ChangeSet:
+    """Collects the changes of one scrape as products are recorded"""
+    def __init__(self, run_id, generated_at, previous_run_id=None):
+        self.run_id = run_id
+        self.generated_at = generated_at
+        self.previous_run_id = previous_run_id
+        self.seen = set()
+        self.scraped_categories = set()
+        self.incomplete = set()
+        self.new, self.price_changes, self.unit_price_changes, self.missing = [], [], [], []
+        self.categories = {}
+        self.stores = {}
+
+    def counts(self, category):
+        self.scraped_categories.add(category)
+        return self.categories.setdefault(category, {
+            "seen": 0, "new": 0, "price_changes": 0, "unit_price_changes": 0, "missing": 0,
+            "pages": 0, "seconds": 0.0})
+
+    def timing(self, category, pages, seconds, complete=True, peak_rss_mb=None):
+        counts = self.counts(category)
+        if peak_rss_mb is not None:
+            counts["peak_rss_mb"] = max(counts.get("peak_rss_mb", 0), peak_rss_mb)
+        if not complete:
+            self.incomplete.add(category)
+        counts["pages"] += pages
+        counts["seconds"] = round(counts["seconds"] + seconds, 1)
+
+    def record(self, name, category, store, old_price, old_unit_price, price, unit_price):
+        """One scraped product; old_price is None for a product not in the history yet"""
+        if name in self.seen:
+            return
+        self.seen.add(name)
+        counts = self.counts(category)
+        counts["seen"] += 1
+        base = {"name": name, "category": category, "store": store}
+        if old_price is None:
+            self.new.append({**base, "price": price, "price_per_unit": unit_price})
+            counts["new"] += 1
+            return
+        if old_price != price:
+            self.price_changes.append({**base, "old": old_price, "new": price})
+            counts["price_changes"] += 1
+        if abs((old_unit_price or 0) - (unit_price or 0)) > UNIT_PRICE_EPSILON:
+            self.unit_price_changes.append({**base, "old": old_unit_price, "new": unit_price})
+            counts["unit_price_changes"] += 1
+
+    def record_missing(self, products):
+        """Products of the categories scraped to the end this run that weren't seen"""
+        for name, prod in products.items():
+            category = prod.get("category")
+            if category in self.scraped_categories - self.incomplete and name not in self.seen:
+                self.missing.append({"name": name, "category": category, "store": prod.get("store", ""),
+                                     "last_price": prod.get("latest_price")})
+                self.categories[category]["missing"] += 1
+
+    def to_dict(self):
+        return {
+            "run_id": self.run_id,
+            "generated_at": self.generated_at,
+            "previous_run_id": self.previous_run_id,
+            "categories": self.categories,
+            "new": self.new,
+            "price_changes": self.price_changes,
+            "unit_price_changes": self.unit_price_changes,
+            "missing": self.missing,
+            "stores": self.stores,
+        }
+
+    def write(self):
+        os.makedirs(CHANGES_DIR, exist_ok=True)
+        with open(path_for(self.run_id), "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+        prune()
+        return path_for(self.run_id)
+
+    def summary(self):
+        return (f"{len(self.new)} new, {len(self.price_changes)} price changes, "
+                f"{len(self.unit_price_changes)} unit price changes, {len(self.missing)} not seen")
+
+def prune(keep=KEEP_RUNS):
+    # Run IDs are timestamps, so name order is run order
+    runs = sorted(name for name in os.listdir(CHANGES_DIR) if name.endswith(".json"))
+    for name in runs[:-keep]:
+        os.remove(os.path.join(CHANGES_DIR, name))
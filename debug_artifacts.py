@@ -0,0 +1,90 @@
+"""Debug artifacts (screenshot + HTML) from scraped pages, sampled and size-capped.
+
+Modes, from the DEBUG_ARTIFACTS environment variable:
+
+    off          never capture
+    anomalies    only pages that went wrong (no product cards), the default
+    sample       anomalies, plus 1 in SAMPLE_EVERY loaded pages (DEBUG_MODE=true)
+
+The page is read on the scraper's thread (Playwright's sync API isn't thread safe)
+as a viewport JPEG and at most MAX_HTML_BYTES of HTML; writing them happens on a
+background thread. At most MAX_ANOMALIES anomalies are captured per run, and the
+oldest files in ARTIFACT_DIR are removed once it holds more than BUDGET_BYTES.
+"""
+import os, time
+from concurrent.futures import ThreadPoolExecutor
+
+ARTIFACT_DIR = "debug_artifacts"
+MODES = ("off", "anomalies", "sample")
+SAMPLE_EVERY = 25
+MAX_ANOMALIES = 10
+MAX_HTML_BYTES = 512 * 1024
+JPEG_QUALITY = 50
+BUDGET_BYTES = 20 * 1024 * 1024
+
+def rotate(directory, budget):
+    """Remove the oldest files until the directory fits in budget bytes"""
+    files = [os.path.join(directory, name) for name in os.listdir(directory)]
+    files = sorted((os.path.getmtime(path), os.path.getsize(path), path) for path in files if os.path.isfile(path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= budget:
+            break
+        os.remove(path)
+        total -= size
+
+class DebugArtifacts:
+    def __init__(self, mode="anomalies", directory=ARTIFACT_DIR, sample_every=SAMPLE_EVERY,
+                 max_anomalies=MAX_ANOMALIES, budget=BUDGET_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"debug artifact mode must be one of {', '.join(MODES)}, got {mode!r}")
+        self.mode = mode
+        self.directory = directory
+        self.sample_every = sample_every
+        self.max_anomalies = max_anomalies
+        self.budget = budget
+        self.pages = 0
+        self.anomalies = 0
+        self.captured = 0
+        self.writer = ThreadPoolExecutor(max_workers=1) if mode != "off" else None
+
+    def sample(self):
+        """Count a loaded page; True for the pages that should be captured"""
+        self.pages += 1
+        return self.mode == "sample" and self.pages % self.sample_every == 1
+
+    def anomaly(self, page, label):
+        """Capture a page that went wrong, within the per-run limit"""
+        if self.mode == "off" or self.anomalies >= self.max_anomalies:
+            return
+        self.anomalies += 1
+        self.capture(page, label)
+
+    def capture(self, page, label):
+        if self.writer is None:
+            return
+        try:
+            screenshot = page.screenshot(type="jpeg", quality=JPEG_QUALITY)
+            html = page.content().encode("utf-8")[:MAX_HTML_BYTES]
+        except Exception as e:
+            print(f"  Could not capture debug artifacts: {e}")
+            return
+        stem = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{self.captured:03d}-{label}")
+        self.captured += 1
+        self.writer.submit(self.write, stem, screenshot, html)
+        print(f"  Debug artifacts -> {stem}.jpg/.html")
+
+    def write(self, stem, screenshot, html):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for suffix, body in ((".jpg", screenshot), (".html", html)):
+                with open(stem + suffix, "wb") as f:
+                    f.write(body)
+            rotate(self.directory, self.budget)
+        except OSError as e:
+            print(f"  Could not write debug artifacts: {e}")
+
+    def close(self):
+        """Wait for pending writes"""
+        if self.writer is not None:
+            self.writer.shutdown(wait=True)
@@ -0,0 +1,155 @@
+"""History retention: keeps the price history bounded over years of daily scrapes.
+
+    python history_retention.py                   # compact with the default policy
+    python history_retention.py --dry-run         # report what would change
+    python history_retention.py --full-months 3 --bucket day
+
+The policy (DEFAULT_POLICY, overridable from the command line):
+
+    full_months   entries from the last N months are kept as scraped, except for flaps
+    bucket        older entries are summarised per "day" or "week"; prices that held
+                  for no longer than a bucket there are folded like flaps
+    flap_hours    an A-B-A where B held for less than this is folded into A as a flap
+
+A summary is an ordinary entry - "p" is the price the bucket closed at, so the
+history stays a step function for the site and price_stats.py - plus "lo" and "hi"
+when the price moved within the bucket:
+
+    {"t": "2025-03-03T06:01:12", "p": 4.99, "lo": 3.99, "hi": 4.99}
+
+Neighbouring summaries with the same range are merged, so a promotion that
+alternates every week ends up as a single range rather than one entry per change. Compaction never changes a product's current price or its all-time
+low, and the history is only replaced after the result has been checked; the
+previous files are kept in history_store.BACKUP_DIR.
+"""
+import argparse
+from datetime import datetime, timedelta
+import history_store
+from price_stats import parse_time
+
+DEFAULT_POLICY = {"full_months": 6, "bucket": "week", "flap_hours": 12}
+BUCKET_SECONDS = {"day": 86400, "week": 7 * 86400}
+MONTH = 30 * 86400
+
+def bucket_key(timestamp, bucket):
+    day = datetime.fromisoformat(timestamp).date()
+    if bucket == "week":
+        day -= timedelta(days=day.weekday())
+    return day.isoformat()
+
+def low(entry):
+    return entry.get("lo", entry["p"])
+
+def high(entry):
+    return entry.get("hi", entry["p"])
+
+def fold_flaps(entries, flap_seconds):
+    """Fold A-B-A bounces where B held for less than flap_seconds into the first A,
+    which keeps B in its range"""
+    out = []
+    for e in entries:
+        out.append(dict(e))
+        while (len(out) >= 3 and out[-3]["p"] == out[-1]["p"] != out[-2]["p"]
+               and parse_time(out[-1]["t"]) - parse_time(out[-2]["t"]) < flap_seconds):
+            first = out[-3]
+            lo, hi = min(map(low, out[-3:])), max(map(high, out[-3:]))
+            del out[-2:]
+            if (lo, hi) != (first["p"], first["p"]):
+                first.update(lo=lo, hi=hi)
+    return out
+
+def summarise(entries, bucket):
+    """One entry per bucket: first timestamp, closing price, range if it moved"""
+    buckets = {}
+    for e in entries:
+        buckets.setdefault(bucket_key(e["t"], bucket), []).append(e)
+    out = []
+    for group in buckets.values():
+        entry = {"t": group[0]["t"], "p": group[-1]["p"]}
+        lo, hi = min(low(e) for e in group), max(high(e) for e in group)
+        if (lo, hi) != (entry["p"], entry["p"]):
+            entry.update(lo=lo, hi=hi)
+        out.append(entry)
+    return out
+
+def merge_runs(entries):
+    """Fold entries that add nothing to the one before: the same price with no range,
+    or a summary with the same range (the flapping weeks of a recurring promotion)"""
+    out = []
+    for e in entries:
+        prev = out[-1] if out else None
+        if prev and "lo" not in e and e["p"] == prev["p"]:
+            continue
+        if prev and "lo" in e and "lo" in prev and (low(e), high(e)) == (low(prev), high(prev)):
+            prev["p"] = e["p"]
+            continue
+        out.append(e)
+    return out
+
+def compact_entries(entries, now, policy):
+    """Entries under the retention policy; now is the history's scrape time in seconds"""
+    entries = fold_flaps(entries, policy["flap_hours"] * 3600)
+    cutoff = now - policy["full_months"] * MONTH
+    old = [e for e in entries if parse_time(e["t"]) < cutoff]
+    if not old:
+        return entries
+    recent = entries[len(old):]
+    # Past the cutoff a price that held for no longer than one bucket is below the
+    # resolution, so a weekly on-off promotion folds into a single range. Summarising
+    # can line up new flaps, so repeat until nothing changes and a rerun is a no-op.
+    while True:
+        folded = fold_flaps(old, BUCKET_SECONDS[policy["bucket"]] + policy["flap_hours"] * 3600)
+        folded = merge_runs(summarise(folded, policy["bucket"]))
+        if folded == old:
+            return folded + recent
+        old = folded
+
+def check(before, after):
+    """Raise ValueError unless compaction kept every product, its current price and its low"""
+    if before.keys() != after.keys():
+        raise ValueError("product set changed")
+    for name, prod in before.items():
+        old, new = prod.get("entries") or [], after[name].get("entries") or []
+        if not old:
+            continue
+        if not new or new[-1]["p"] != old[-1]["p"]:
+            raise ValueError(f"current price of {name} changed")
+        if min(map(low, new)) != min(map(low, old)):
+            raise ValueError(f"lowest price of {name} changed")
+        times = [parse_time(e["t"]) for e in new]
+        if times != sorted(times):
+            raise ValueError(f"entries of {name} out of order")
+
+def compact(data, policy):
+    """Compacted copy of a history document, with (entries before, entries after)"""
+    products = data.get("products", {})
+    try:
+        now = parse_time(data.get("meta", {}).get("generated_at"))
+    except (TypeError, ValueError):
+        now = int(datetime.now().timestamp())
+    compacted = {}
+    for name, prod in products.items():
+        entries = prod.get("entries")
+        compacted[name] = {**prod, "entries": compact_entries(entries, now, policy)} if entries else prod
+    check(products, compacted)
+    count = lambda products: sum(len(p.get("entries") or []) for p in products.values())
+    return {**data, "products": compacted}, (count(products), count(compacted))
+
+def run(policy=DEFAULT_POLICY, dry_run=False):
+    compacted, (before, after) = compact(history_store.load_history(), policy)
+    print(f"History entries: {before} -> {after} "
+          f"(full resolution for {policy['full_months']} months, then per {policy['bucket']})")
+    if after != before and not dry_run:
+        history_store.backup()
+        history_store.save_history(compacted)
+    return before, after
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the retention policy to the price history")
+    parser.add_argument("--full-months", type=int, default=DEFAULT_POLICY["full_months"])
+    parser.add_argument("--bucket", choices=sorted(BUCKET_SECONDS), default=DEFAULT_POLICY["bucket"])
+    parser.add_argument("--flap-hours", type=float, default=DEFAULT_POLICY["flap_hours"])
+    parser.add_argument("--dry-run", action="store_true", help="report only, don't rewrite the history")
+    args = parser.parse_args()
+    run({"full_months": args.full_months, "bucket": args.bucket, "flap_hours": args.flap_hours},
+        dry_run=args.dry_run)
@@ -0,0 +1,174 @@
+"""Price history storage: one shard per store and category, presented as one dataset.
+
+    history/meta.json                  {"generated_at": ..., "run_id": ...}
+    history/<store>/<category>.json    the products of one category key ("Rimi:Õlled")
+
+A shard holds one product per line, sorted by name, with sorted keys:
+
+    {
+    "Hele õlu SAKU Originaal 4.7% 500ml prk": {"category": "Barbora:Õlled", "entries": [...], ...},
+    ...
+    }
+
+so a scrape that changes a few prices rewrites a few lines of a few files and the
+daily commit stays small. Shards whose content didn't change aren't written at all.
+
+load_history() and save_history() read and write the {"meta": ..., "products": ...}
+document the scraper, app and site build have always used. Until the history has
+been sharded they fall back to the single LEGACY_FILE, which save_history() removes.
+
+meta["category_runs"] counts the scans of each category that found products, and
+every product found carries the count it was last seen at ("seen_run") and when
+("last_seen"). A product that missed STALE_RUNS scans of its category in a row is
+stale: it stays in the history but isn't published. A store outage, where the scan
+finds nothing, doesn't age anything.
+
+    python history_store.py --migrate    # split alcohol_history.json into shards
+"""
+import argparse, json, os, re, shutil, unicodedata
+
+HISTORY_DIR = "history"
+META_FILE = os.path.join(HISTORY_DIR, "meta.json")
+LEGACY_FILE = "alcohol_history.json"
+BACKUP_DIR = HISTORY_DIR + ".bak"
+# Scans of its category a product may miss before it stops being published
+STALE_RUNS = 3
+
+def slug(text):
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return re.sub(r"[^a-z0-9]+", "-", ascii_text).strip("-") or "unknown"
+
+def shard_path(category):
+    """Shard file for a category key; products without one share history/unknown/unknown.json"""
+    store, _, name = (category or "").partition(":")
+    return os.path.join(HISTORY_DIR, slug(store), slug(name) + ".json")
+
+def is_sharded():
+    return os.path.exists(META_FILE)
+
+def shard_files():
+    files = []
+    for root, dirs, names in os.walk(HISTORY_DIR):
+        dirs.sort()
+        files += [os.path.join(root, n) for n in sorted(names) if n.endswith(".json") and root != HISTORY_DIR]
+    return files
+
+def history_files():
+    """Every file the history is read from, for versioning and cache digests"""
+    if is_sharded():
+        return [META_FILE] + shard_files()
+    return [LEGACY_FILE] if os.path.exists(LEGACY_FILE) else []
+
+def exists():
+    return bool(history_files())
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_history():
+    """The whole history as {"meta": {...}, "products": {name: {...}}}"""
+    if not is_sharded():
+        if not os.path.exists(LEGACY_FILE):
+            return {"meta": {}, "products": {}}
+        data = read_json(LEGACY_FILE)
+        data.setdefault("meta", {})
+        data.setdefault("products", {})
+        return data
+    products = {}
+    for path in shard_files():
+        products.update(read_json(path))
+    return {"meta": read_json(META_FILE), "products": products}
+
+def record_product(data, name, observed, run_changes=None):
+    """Fold one scraped product into the history: a new entry (stamped with the run's
+    generated_at) when its price is new or different, then its latest fields.
+    observed holds the product fields a scrape sets (latest_price, price_per_unit,
+    unit_label, url, img, category, store, is_sale). Returns the previous price, or
+    None for a product without one."""
+    prod = data["products"].setdefault(name, {"category": observed["category"], "entries": []})
+    # Self-healing: the product existed but had no usable entries
+    if not isinstance(prod.get("entries"), list):
+        prod["entries"] = []
+    old_price = prod["entries"][-1].get("p") if prod["entries"] else None
+    old_unit_price = prod.get("price_per_unit")
+    price = observed["latest_price"]
+    if old_price != price:
+        prod["entries"].append({"t": data["meta"]["generated_at"], "p": price})
+    prod.update(observed)
+    if run_changes is not None:
+        run_changes.record(name, observed["category"], observed["store"], old_price, old_unit_price,
+                           price, observed["price_per_unit"])
+    return old_price
+
+def mark_seen(data, category, names):
+    """Count a scan of category and mark the products it found as seen in it"""
+    runs = data["meta"].setdefault("category_runs", {})
+    runs[category] = runs.get(category, 0) + 1
+    for name in names:
+        data["products"][name].update(seen_run=runs[category], last_seen=data["meta"]["generated_at"])
+
+def missed_runs(prod, meta):
+    """Scans of its category since a product was last seen (products from before
+    the markers count as seen at scan 0)"""
+    return meta.get("category_runs", {}).get(prod.get("category"), 0) - prod.get("seen_run", 0)
+
+def is_stale(prod, meta, stale_runs=STALE_RUNS):
+    return missed_runs(prod, meta) >= stale_runs
+
+def render_shard(products):
+    lines = [f"{json.dumps(name, ensure_ascii=False)}: {json.dumps(products[name], ensure_ascii=False, sort_keys=True)}"
+             for name in sorted(products)]
+    return "{\n" + ",\n".join(lines) + "\n}\n"
+
+def write_if_changed(path, text):
+    """Atomically replace path with text unless it already holds it. Returns whether it wrote."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return True
+
+def save_history(data):
+    """Write the history as shards. Returns the number of files written or removed."""
+    shards = {}
+    for name, prod in data.get("products", {}).items():
+        shards.setdefault(shard_path(prod.get("category")), {})[name] = prod
+    changed = sum(write_if_changed(path, render_shard(products)) for path, products in shards.items())
+    for path in shard_files():
+        if path not in shards:
+            os.remove(path)
+            changed += 1
+    # The meta file goes last: it is what marks the history as sharded
+    changed += write_if_changed(META_FILE, json.dumps(data.get("meta", {}), ensure_ascii=False, sort_keys=True, indent=1) + "\n")
+    if os.path.exists(LEGACY_FILE):
+        os.remove(LEGACY_FILE)
+    return changed
+
+def backup():
+    """Copy the current history files to BACKUP_DIR (replacing an older backup)"""
+    shutil.rmtree(BACKUP_DIR, ignore_errors=True)
+    for path in history_files():
+        target = os.path.join(BACKUP_DIR, os.path.relpath(path, HISTORY_DIR) if is_sharded() else path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(path, target)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price history storage")
+    parser.add_argument("--migrate", action="store_true", help=f"split {LEGACY_FILE} into shards under {HISTORY_DIR}/")
+    args = parser.parse_args()
+    if args.migrate:
+        data = load_history()
+        save_history(data)
+        print(f"{len(data['products'])} products in {len(shard_files())} shards under {HISTORY_DIR}/")
+    else:
+        parser.print_help()
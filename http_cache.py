@@ -0,0 +1,107 @@
+import gzip, hashlib, os, zlib
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/x-ndjson", "image/svg+xml")
+
+def file_version(*paths):
+    """Cheap version string for a set of files, based on size and mtime"""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def last_modified(*paths):
+    """Newest mtime of the given files as a unix timestamp (0 if none exist)"""
+    mtimes = [os.path.getmtime(p) for p in paths if os.path.exists(p)]
+    return int(max(mtimes)) if mtimes else 0
+
+def http_date(timestamp):
+    return formatdate(timestamp, usegmt=True)
+
+def make_etag(*parts):
+    """Strong ETag from any number of version parts"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best content-coding the client accepts: br, then gzip, else identity"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return "identity"
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison as required for If-None-Match (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return any(t.removeprefix("W/") == etag for t in tags)
+
+def not_modified_since(if_modified_since, timestamp):
+    if not if_modified_since or not timestamp:
+        return False
+    try:
+        return int(timestamp) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+def is_fresh(headers, etag, timestamp):
+    """True if the client's cached copy is still valid. If-None-Match wins over If-Modified-Since."""
+    if headers.get("If-None-Match"):
+        return etag_matches(headers.get("If-None-Match"), etag)
+    return not_modified_since(headers.get("If-Modified-Since"), timestamp)
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of str/bytes chunks on the fly, flushing after each chunk"""
+    if encoding == "br":
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            yield compressor.process(data) + compressor.flush()
+        yield compressor.finish()
+    else:
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            yield compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
@@ -0,0 +1,159 @@
+"""Optional build stage: card-sized local thumbnails for product images.
+
+    python build_site.py --images [--image-source DIR]
+
+Originals are downloaded once into a content-addressed cache (.image_cache/), then
+resized to card size and written under img/ as WebP, plus AVIF where Pillow supports it.
+Thumbnails are named by the digest of their original, so unchanged images are never
+re-encoded. With --image-source, originals are read from DIR (by the file name in the
+image URL) instead of the network, e.g. for tests. Needs Pillow; without it the stage
+is skipped and cards keep the store URLs.
+"""
+import hashlib, json, os, threading, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlparse
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+CACHE_DIR = ".image_cache"
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+OUTPUT_DIR = "img"
+
+# Card images are laid out in a 70x100 CSS px box (80x110 on mobile); thumbnails are 2x for HiDPI
+CARD_IMAGE_WIDTH, CARD_IMAGE_HEIGHT = 70, 100
+THUMB_SIZE = (160, 220)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+MAX_WORKERS = 8
+FETCH_TIMEOUT = 15
+USER_AGENT = "Mozilla/5.0 (compatible; price-tracker-thumbnails)"
+
+def available():
+    return Image is not None
+
+def formats():
+    """Output formats, best first"""
+    return ("avif", "webp") if features.check("avif") else ("webp",)
+
+def digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+def read_original(url, source_dir=None):
+    if source_dir:
+        with open(os.path.join(source_dir, os.path.basename(urlparse(url).path)), "rb") as f:
+            return f.read()
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        return response.read()
+
+def write_atomic(path, data):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def encode_thumbnails(data, paths):
+    """Resize an original to fit THUMB_SIZE and write it in every format in paths"""
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    image.thumbnail(THUMB_SIZE, Image.LANCZOS)
+    for fmt, path in paths.items():
+        out = BytesIO()
+        if fmt == "avif":
+            image.save(out, "AVIF", quality=AVIF_QUALITY)
+        else:
+            image.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+        write_atomic(path, out.getvalue())
+
+class ThumbnailBuilder:
+    """Maps image URLs to thumbnails, downloading and encoding only what isn't cached yet"""
+    def __init__(self, source_dir=None):
+        self.source_dir = source_dir
+        self.formats = formats()
+        self.lock = threading.Lock()
+        try:
+            with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                self.index = json.load(f)  # url -> digest of the original
+        except (OSError, ValueError):
+            self.index = {}
+        self.downloaded = self.encoded = self.failed = 0
+
+    def thumbnail_paths(self, original_digest):
+        # Also keyed by the encoding settings, so changing them re-encodes everything
+        settings = f"{original_digest}:{THUMB_SIZE}:{WEBP_QUALITY}:{AVIF_QUALITY}"
+        name = digest(settings.encode("ascii"))[:16]
+        return {fmt: os.path.join(OUTPUT_DIR, f"{name}.{fmt}") for fmt in self.formats}
+
+    def original(self, url):
+        """Bytes and digest of the original, from the cache or freshly downloaded"""
+        with self.lock:
+            known = self.index.get(url)
+        if known:
+            try:
+                with open(os.path.join(CACHE_DIR, known), "rb") as f:
+                    return f.read(), known
+            except FileNotFoundError:
+                pass
+        data = read_original(url, self.source_dir)
+        original_digest = digest(data)
+        write_atomic(os.path.join(CACHE_DIR, original_digest), data)
+        with self.lock:
+            self.index[url] = original_digest
+            self.downloaded += 1
+        return data, original_digest
+
+    def thumbnail(self, url):
+        """{"thumb": path, "thumb_avif": path} for url, or None if it can't be fetched or decoded"""
+        with self.lock:
+            known = self.index.get(url)
+        paths = self.thumbnail_paths(known) if known else None
+        try:
+            if not paths or not all(os.path.exists(p) for p in paths.values()):
+                data, original_digest = self.original(url)
+                paths = self.thumbnail_paths(original_digest)
+                encode_thumbnails(data, paths)
+                with self.lock:
+                    self.encoded += 1
+        except Exception as e:
+            with self.lock:
+                self.failed += 1
+            print(f"  Thumbnail failed for {url}: {e}")
+            return None
+        thumb = {"thumb": paths["webp"].replace(os.sep, "/")}
+        if "avif" in paths:
+            thumb["thumb_avif"] = paths["avif"].replace(os.sep, "/")
+        return thumb
+
+    def build(self, urls):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            results = dict(zip(urls, pool.map(self.thumbnail, urls)))
+        with open(INDEX_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, sort_keys=True, indent=0)
+        return {url: thumb for url, thumb in results.items() if thumb}
+
+def remove_stale_thumbnails(keep):
+    for name in os.listdir(OUTPUT_DIR):
+        if os.path.join(OUTPUT_DIR, name).replace(os.sep, "/") not in keep:
+            os.remove(os.path.join(OUTPUT_DIR, name))
+
+def add_thumbnails(products, source_dir=None):
+    """Set thumb (and thumb_avif) on every product whose image could be processed"""
+    if not available():
+        print("Pillow is not installed, skipping thumbnails")
+        return
+    urls = sorted({p["img"] for p in products if (p.get("img") or "").startswith(("http://", "https://"))})
+    builder = ThumbnailBuilder(source_dir)
+    thumbs = builder.build(urls)
+    for p in products:
+        p.update(thumbs.get(p.get("img"), {}))
+    remove_stale_thumbnails({path for thumb in thumbs.values() for path in thumb.values()})
+    print(f"Thumbnails: {len(thumbs)} ready, {builder.downloaded} downloaded, "
+          f"{builder.encoded} encoded, {builder.failed} failed")
@@ -0,0 +1,272 @@
+"""Counters, gauges and histograms for the scraper, the site build and app.py.
+
+    metrics.inc("scrape_pages_total", store="Rimi", result="ok")
+    metrics.observe("scrape_page_seconds", 3.2, store="Rimi")
+    metrics.set_gauge("site_payload_bytes", 48213, part="manifest")
+    with metrics.timer("build_seconds"):
+        ...
+
+Every metric is declared in METRICS (kind, help text, and for histograms the
+bucket bounds), so a misspelt name fails loudly instead of exporting a new series.
+Values live in this process's REGISTRY and are exported two ways:
+
+    render_prometheus()          the Prometheus text format; app.py serves it at /metrics
+    write_run(name, run_id)      METRICS_DIR/<name>.prom for a node_exporter textfile
+                                 collector, and METRICS_DIR/<name>-<run_id>.json, the run's
+                                 summary, kept for the last KEEP_RUNS runs of each name
+
+A summary holds counters and gauges as numbers and histograms as count, sum, mean
+and bucket-estimated p50/p95, per label set:
+
+    {"name": "scrape", "run_id": "20250101T060000", "metrics": {
+        "scrape_products_per_second": [{"labels": {"store": "Rimi"}, "value": 4.1}], ...}}
+
+    python metrics.py scrape build    # the latest run of each against the runs before it
+
+compares a run with the median of the RECENT_RUNS before it and exits with status 1
+when a metric got more than REGRESSION_FACTOR times worse.
+"""
+import argparse, glob, json, os, statistics, sys, threading, time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_DIR = "metrics"
+PREFIX = "tracker_"
+KEEP_RUNS = 60
+RECENT_RUNS = 7
+REGRESSION_FACTOR = 1.5
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PAGE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+CATEGORY_BUCKETS = (5, 10, 30, 60, 120, 300, 600, 1200, 1800)
+
+# name: (kind, help, buckets). Metrics whose growth is a regression say which way
+# is worse in REGRESSIONS.
+METRICS = {
+    "scrape_page_seconds": ("histogram", "Time to load a category page, retries included", PAGE_BUCKETS),
+    "scrape_category_seconds": ("histogram", "Time to scrape a whole category", CATEGORY_BUCKETS),
+    "scrape_pages_total": ("counter", "Category pages requested, by outcome (ok, failed, blocked)", None),
+    "scrape_products_total": ("counter", "Products scraped", None),
+    "scrape_products_per_second": ("gauge", "Products scraped per second of category scraping", None),
+    "scrape_bytes_total": ("counter", "Response bytes downloaded by the browser (from Content-Length)", None),
+    "scrape_run_seconds": ("gauge", "Duration of the last scrape run", None),
+    "build_seconds": ("gauge", "Duration of the last site build", None),
+    "build_runs_total": ("counter", "Site builds, by result (built, up_to_date)", None),
+    "build_files_written": ("gauge", "Output files the last site build rewrote", None),
+    "site_payload_bytes": ("gauge", "Size of the published site, by part", None),
+    "app_request_seconds": ("histogram", "app.py request latency", SECONDS_BUCKETS),
+    "app_requests_total": ("counter", "app.py requests, by endpoint and status", None),
+    "app_cache_total": ("counter", "app.py cache lookups, by cache (http, products) and result (hit, miss)", None),
+}
+REGRESSIONS = {
+    "scrape_page_seconds": "higher",
+    "scrape_category_seconds": "higher",
+    "scrape_products_per_second": "lower",
+    "scrape_bytes_total": "higher",
+    "scrape_run_seconds": "higher",
+    "build_seconds": "higher",
+    "site_payload_bytes": "higher",
+}
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escape = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def quantile(buckets, counts, count, q):
+    """Estimate a quantile from histogram buckets by linear interpolation, like
+    Prometheus' histogram_quantile()"""
+    if not count:
+        return None
+    rank = q * count
+    lower, seen = 0.0, 0
+    for bound, n in zip(buckets, counts):
+        if seen + n >= rank:
+            return round(lower + (bound - lower) * ((rank - seen) / n if n else 0), 4)
+        lower, seen = bound, seen + n
+    # Past the last bound: all that is known is that it's above it
+    return buckets[-1]
+
+class Registry:
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def series(self, name, kind):
+        declared = self.metrics[name][0]
+        if declared != kind:
+            raise TypeError(f"{name} is a {declared}, not a {kind}")
+        return self.values.setdefault(name, {})
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            series = self.series(name, "counter")
+            key = label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.series(name, "gauge")[label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self.metrics[name][2]
+        with self.lock:
+            series = self.series(name, "histogram")
+            state = series.setdefault(label_key(labels), {"counts": [0] * len(buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the block into a histogram, or a gauge for one-off durations"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if self.metrics[name][0] == "histogram":
+                self.observe(name, seconds, **labels)
+            else:
+                self.set_gauge(name, round(seconds, 3), **labels)
+
+    def value(self, name, **labels):
+        """A counter or gauge's value (a histogram's sum), 0 if never recorded"""
+        with self.lock:
+            value = self.values.get(name, {}).get(label_key(labels), 0)
+        return value["sum"] if isinstance(value, dict) else value
+
+    def label_values(self, name, label):
+        """The values label takes across the series of name"""
+        with self.lock:
+            keys = list(self.values.get(name, {}))
+        return sorted({dict(key)[label] for key in keys if label in dict(key)})
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            for name in sorted(self.values):
+                kind, help_text, buckets = self.metrics[name]
+                full = PREFIX + name
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} {kind}"]
+                for key, value in sorted(self.values[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{full}{format_labels(key)} {format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(buckets, value["counts"]):
+                        cumulative += n
+                        lines.append(f"{full}_bucket{format_labels(key, [('le', format_value(bound))])} {cumulative}")
+                    lines.append(f"{full}_bucket{format_labels(key, [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{full}_sum{format_labels(key)} {round(value['sum'], 6)}")
+                    lines.append(f"{full}_count{format_labels(key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{name: [{"labels": {...}, ...}, ...]} for the JSON run summary"""
+        result = {}
+        with self.lock:
+            for name in sorted(self.values):
+                kind, _, buckets = self.metrics[name]
+                rows = []
+                for key, value in sorted(self.values[name].items()):
+                    row = {"labels": dict(key)}
+                    if kind == "histogram":
+                        count = value["count"]
+                        row.update(count=count, sum=round(value["sum"], 3),
+                                   mean=round(value["sum"] / count, 4) if count else None,
+                                   p50=quantile(buckets, value["counts"], count, 0.5),
+                                   p95=quantile(buckets, value["counts"], count, 0.95))
+                    else:
+                        row["value"] = value
+                    rows.append(row)
+                result[name] = rows
+        return result
+
+REGISTRY = Registry()
+inc, set_gauge, observe, timer, value = REGISTRY.inc, REGISTRY.set_gauge, REGISTRY.observe, REGISTRY.timer, REGISTRY.value
+render_prometheus, summary = REGISTRY.render_prometheus, REGISTRY.summary
+
+def summary_path(name, run_id):
+    return os.path.join(METRICS_DIR, f"{name}-{run_id}.json")
+
+def summaries(name):
+    """Paths of the stored summaries of name, oldest first"""
+    # Spelling the run id out tells "scrape-<run id>" from "scrape-1-of-3-<run id>"
+    run_id = "[0-9]" * 8 + "T" + "[0-9]" * 6
+    return sorted(glob.glob(os.path.join(METRICS_DIR, f"{glob.escape(name)}-{run_id}.json")))
+
+def write_run(name, run_id=None, registry=REGISTRY):
+    """Write the Prometheus text file and the JSON summary of a run. Returns the summary's path."""
+    run_id = run_id or datetime.now().strftime("%Y%m%dT%H%M%S")
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    prom = os.path.join(METRICS_DIR, f"{name}.prom")
+    # Textfile collectors may read at any moment, so the file is replaced whole
+    with open(prom + ".tmp", "w", encoding="utf-8") as f:
+        f.write(registry.render_prometheus())
+    os.replace(prom + ".tmp", prom)
+    path = summary_path(name, run_id)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"name": name, "run_id": run_id, "metrics": registry.summary()}, f,
+                  ensure_ascii=False, sort_keys=True, indent=1)
+    for old in summaries(name)[:-KEEP_RUNS]:
+        os.remove(old)
+    return path
+
+def headline(row):
+    """The number a summary row is compared by"""
+    return row["mean"] if "mean" in row else row["value"]
+
+def regressions(latest, previous, factor=REGRESSION_FACTOR):
+    """[(metric, labels, value, baseline)] for the series of latest that got more than
+    factor times worse than their median over the previous summaries"""
+    found = []
+    for name, worse in REGRESSIONS.items():
+        for row in latest["metrics"].get(name, []):
+            value = headline(row)
+            history = [headline(r) for s in previous for r in s["metrics"].get(name, [])
+                       if r["labels"] == row["labels"] and headline(r)]
+            if value is None or not history:
+                continue
+            baseline = statistics.median(history)
+            if (value > baseline * factor) if worse == "higher" else (value * factor < baseline):
+                found.append((name, row["labels"], value, baseline))
+    return found
+
+def compare(name):
+    paths = summaries(name)
+    if not paths:
+        print(f"No {name} runs in {METRICS_DIR}/")
+        return 0
+    runs = []
+    for path in paths[-(RECENT_RUNS + 1):]:
+        with open(path, "r", encoding="utf-8") as f:
+            runs.append(json.load(f))
+    latest, previous = runs[-1], runs[:-1]
+    found = regressions(latest, previous)
+    print(f"{name} run {latest['run_id']} against {len(previous)} earlier runs: "
+          f"{len(found)} regression{'s' if len(found) != 1 else ''}")
+    for metric, labels, value, baseline in found:
+        where = ", ".join(f"{k}={v}" for k, v in sorted(labels.items()))
+        print(f"  {metric}{' (' + where + ')' if where else ''}: {value:g} vs median {baseline:g}")
+    return 1 if found else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the latest run's metrics with the runs before it")
+    parser.add_argument("names", nargs="+", metavar="name", help="which runs: scrape, build, ...")
+    args = parser.parse_args()
+    sys.exit(max(compare(name) for name in args.names))
@@ -0,0 +1,219 @@
+"""Price alerts: watchlist rules checked against the products that changed in a scrape.
+
+    python price_alerts.py              # check the latest scrape (run by scraper2.py)
+    python price_alerts.py --all        # check every product, e.g. after adding rules
+    python price_alerts.py --receive    # local stand-in for a webhook endpoint
+
+Rules live in WATCHLIST_FILE:
+
+    {
+      "rules": [
+        {"id": "cheap-vodka", "productCategory": "Viinad", "max_unit_price": 10},
+        {"id": "heineken", "name": "heineken", "max_price": 1.20},
+        {"id": "saku-can", "product": "Hele õlu SAKU Originaal 4.7% 500ml prk", "store": "Barbora", "max_price": 1.0}
+      ],
+      "sinks": [
+        {"type": "jsonl", "path": "alerts.jsonl"},
+        {"type": "webhook", "url": "http://127.0.0.1:8765/alerts"}
+      ]
+    }
+
+A rule selects products by exact "product" name, by "productCategory", by "name"
+(words that must all appear, ignoring case and diacritics) and/or by "store", and
+fires when the price is at most "max_price" and/or the unit price at most
+"max_unit_price". Rules are indexed by product, category and name word, so a run
+only looks at the rules that could apply to each changed product.
+"""
+import argparse, json, os, re, urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import changes
+from build_site import assign_product_categories, fold_text, load_data
+
+WATCHLIST_FILE = "watchlist.json"
+# Remembers the last scrape that was checked, so a run is never alerted twice
+STATE_FILE = ".alert_state.json"
+DEFAULT_SINKS = [{"type": "jsonl", "path": "alerts.jsonl"}]
+WEBHOOK_TIMEOUT = 10
+RECEIVER_PORT = 8765
+RECEIVED_FILE = "received_alerts.jsonl"
+
+def name_words(text):
+    """Words of a name, so "coca cola" finds Coca-Cola and "olu" finds Õlu"""
+    return re.findall(r"[a-z0-9]+", fold_text(text))
+
+class RuleIndex:
+    """Watchlist rules keyed by what they select on"""
+    def __init__(self, rules):
+        self.by_key = {}
+        for rule in rules:
+            self.by_key.setdefault(self.index_key(rule), []).append(rule)
+
+    @staticmethod
+    def index_key(rule):
+        # The most selective condition decides where a rule is filed; matches() checks the rest
+        if rule.get("product"):
+            return ("product", rule["product"])
+        if name_words(rule.get("name") or ""):
+            return ("word", name_words(rule["name"])[0])
+        if rule.get("productCategory"):
+            return ("category", rule["productCategory"])
+        return ("any", None)
+
+    def candidates(self, p):
+        keys = [("product", p["name"]), ("category", p.get("productCategory", "")), ("any", None)]
+        keys += [("word", w) for w in set(name_words(p["name"]))]
+        return [rule for key in keys for rule in self.by_key.get(key, ())]
+
+def matches(rule, p):
+    if rule.get("product") and rule["product"] != p["name"]:
+        return False
+    if rule.get("productCategory") and rule["productCategory"] != p.get("productCategory"):
+        return False
+    if rule.get("store") and rule["store"] != p.get("store"):
+        return False
+    if rule.get("name") and not set(name_words(rule["name"])) <= set(name_words(p["name"])):
+        return False
+    price, unit_price = p.get("latest_price") or 0, p.get("price_per_unit") or 0
+    if "max_price" in rule and not 0 < price <= rule["max_price"]:
+        return False
+    if "max_unit_price" in rule and not 0 < unit_price <= rule["max_unit_price"]:
+        return False
+    return True
+
+def previous_price(p):
+    entries = p.get("entries") or []
+    return entries[-2]["p"] if len(entries) > 1 else None
+
+def alert(rule, p, run):
+    return {
+        "rule": rule.get("id", ""),
+        "product": p["name"],
+        "store": p.get("store", ""),
+        "productCategory": p.get("productCategory", ""),
+        "price": p.get("latest_price"),
+        "previous_price": previous_price(p),
+        "unit_price": p.get("price_per_unit"),
+        "unit_label": p.get("unit_label", ""),
+        "url": p.get("url", ""),
+        "run": run,
+    }
+
+def evaluate(index, products):
+    """(rule, product) for every rule a product satisfies. Each rule is filed under a
+    single key, so it is never a candidate twice for the same product."""
+    return [(rule, p) for p in products for rule in index.candidates(p) if matches(rule, p)]
+
+# --- sinks ---
+
+class JsonlSink:
+    """Appends one JSON object per alert"""
+    def __init__(self, path="alerts.jsonl"):
+        self.path = path
+
+    def send(self, alerts):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for a in alerts:
+                f.write(json.dumps(a, ensure_ascii=False) + "\n")
+
+class WebhookSink:
+    """POSTs the run's alerts as one JSON document: {"alerts": [...]}"""
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        body = json.dumps({"alerts": alerts}, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+# Sink "type" -> class; other sinks can be registered here
+SINKS = {"jsonl": JsonlSink, "webhook": WebhookSink}
+
+def make_sink(config):
+    options = {k: v for k, v in config.items() if k != "type"}
+    return SINKS[config["type"]](**options)
+
+# --- runs ---
+
+def load_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+def changed_in_run(products, run):
+    """Products that are new or changed price or unit price in the given scrape. Read
+    from the run's change set; without one, products whose last entry carries the
+    run's timestamp."""
+    change_set = changes.load(changes.run_id_for(run))
+    if change_set is not None:
+        names = changes.changed_names(change_set)
+        return [p for p in products if p["name"] in names]
+    return [p for p in products if (p.get("entries") or [{}])[-1].get("t") == run]
+
+def run(check_all=False):
+    """Check the watchlist against the latest scrape. Returns the alerts sent."""
+    watchlist = load_json(WATCHLIST_FILE, None)
+    if not watchlist or not watchlist.get("rules"):
+        print(f"No watchlist rules in {WATCHLIST_FILE}, skipping price alerts")
+        return []
+    products, sources, product_categories, last_run = load_data()
+    state = load_json(STATE_FILE, {})
+    if not check_all and state.get("last_run") == last_run:
+        print(f"Price alerts already checked for run {last_run}")
+        return []
+    assign_product_categories(products, sources, product_categories)
+    candidates = products if check_all else changed_in_run(products, last_run)
+    index = RuleIndex(watchlist["rules"])
+    alerts = [alert(rule, p, last_run) for rule, p in evaluate(index, candidates)]
+
+    for config in watchlist.get("sinks") or DEFAULT_SINKS:
+        if not alerts:
+            break
+        try:
+            make_sink(config).send(alerts)
+        except Exception as e:
+            print(f"  Alert sink {config.get('type')} failed: {e}")
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"last_run": last_run, "checked_at": datetime.now().isoformat()}, f)
+    print(f"Price alerts: {len(alerts)} from {len(candidates)} products checked against {len(watchlist['rules'])} rules")
+    return alerts
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    """Accepts webhook POSTs and appends their alerts to RECEIVED_FILE"""
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            alerts = json.loads(body)["alerts"]
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400, "expected {\"alerts\": [...]}")
+            return
+        JsonlSink(RECEIVED_FILE).send(alerts)
+        for a in alerts:
+            print(f"  🔔 {a['product']} ({a['store']}): €{a['price']} [{a['rule']}]")
+        self.send_response(204)
+        self.end_headers()
+
+def receive(port=RECEIVER_PORT):
+    server = HTTPServer(("127.0.0.1", port), ReceiverHandler)
+    print(f"Receiving alerts at http://127.0.0.1:{port}/alerts, saving to {os.path.abspath(RECEIVED_FILE)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check watchlist rules against the latest scrape")
+    parser.add_argument("--all", action="store_true", help="check every product, not just this run's changes")
+    parser.add_argument("--receive", action="store_true", help="run a local webhook receiver instead")
+    parser.add_argument("--port", type=int, default=RECEIVER_PORT)
+    args = parser.parse_args()
+    if args.receive:
+        receive(args.port)
+    else:
+        run(check_all=args.all)
@@ -0,0 +1,157 @@
+"""Price statistics over every product history at once, for sale detection and deal quality.
+
+A history is a list of price changes ({"t": iso timestamp, "p": price}); each price
+holds until the next change, or until `now` for the latest one. Window statistics
+are therefore time-weighted: the 90-day median is the price the product sat at for
+the middle of the last 90 days, so a one-day price bounce doesn't move it. Entries
+summarised by history_retention.py also carry their period's lowest price as "lo",
+which counts towards the lows.
+
+Per product (see FIELDS):
+    low                  all-time lowest price
+    low_30, median_30    lowest and time-weighted median price over the last 30 days
+    low_90, median_90    the same over the last 90 days
+    typical              the price the product usually sells at (median_90)
+    discount_pct         how far the current price is below typical, in percent
+    days_at_price        days since the price last changed
+    changes_90           price changes in the last 90 days
+
+Uses NumPy when it is installed; otherwise the same numbers are computed per
+product in plain Python, which is fine for a few thousand products.
+"""
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WINDOWS = (30, 90)
+DAY = 86400
+# A product counts as on sale when it is at least this far below its typical price
+SALE_MIN_DISCOUNT = 5.0
+
+FIELDS = ("low", "low_30", "median_30", "low_90", "median_90", "typical",
+          "discount_pct", "days_at_price", "changes_90")
+
+def parse_time(timestamp):
+    """Whole seconds since the epoch; naive timestamps are taken as UTC"""
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def price_entries(product):
+    return [e for e in (product.get("entries") or []) if e.get("t") and e.get("p") is not None]
+
+def is_on_sale(stats):
+    return bool(stats) and stats["discount_pct"] >= SALE_MIN_DISCOUNT
+
+def finish(current, low, windows, days_at_price, changes_90):
+    """Round and assemble one product's stats; windows maps days -> (low, median)"""
+    stats = {"low": round(low, 2)}
+    for days in WINDOWS:
+        window_low, window_median = windows[days]
+        stats[f"low_{days}"] = round(window_low, 2)
+        stats[f"median_{days}"] = round(window_median, 2)
+    typical = stats["median_90"]
+    stats["typical"] = typical
+    stats["discount_pct"] = round(max(0.0, (typical - current) / typical * 100), 1) if typical > 0 else 0.0
+    stats["days_at_price"] = round(days_at_price / DAY, 1)
+    stats["changes_90"] = int(changes_90)
+    return stats
+
+def product_stats(entries, now):
+    """Stats for one history, in plain Python. entries must be non-empty and in time order."""
+    times = [parse_time(e["t"]) for e in entries]
+    prices = [float(e["p"]) for e in entries]
+    lows = [float(e.get("lo", e["p"])) for e in entries]
+    ends = times[1:] + [now]
+    current = prices[-1]
+    windows = {}
+    for days in WINDOWS:
+        start = now - days * DAY
+        # Segments overlapping the window; the current one always does
+        held = [(p, max(0, end - max(t, start))) for t, p, end in zip(times, prices, ends) if end >= start]
+        total = sum(d for _, d in held)
+        median = current
+        if total > 0:
+            running = 0
+            for p, d in sorted(held):
+                running += d
+                if 2 * running >= total:
+                    median = p
+                    break
+        windows[days] = (min(lo for lo, end in zip(lows, ends) if end >= start), median)
+    changes = sum(1 for t in times[1:] if t >= now - 90 * DAY)
+    return finish(current, min(lows), windows, now - times[-1], changes)
+
+def _compute_numpy(histories, now):
+    counts = np.array([len(h) for h in histories])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    lasts = starts + counts - 1
+    pid = np.repeat(np.arange(len(histories)), counts)
+    times = np.array([e["t"] for h in histories for e in h], dtype="datetime64[us]")
+    times = times.astype("datetime64[s]").astype(np.int64)
+    prices = np.array([e["p"] for h in histories for e in h], dtype=np.float64)
+    lows = np.array([e.get("lo", e["p"]) for h in histories for e in h], dtype=np.float64)
+    ends = np.empty_like(times)
+    ends[:-1] = times[1:]
+    ends[lasts] = now
+
+    current = prices[lasts]
+    low = np.minimum.reduceat(lows, starts)
+    order = np.lexsort((prices, pid))  # grouped by product, by price within a product
+    first = np.zeros(len(prices), dtype=bool)
+    first[starts] = True
+
+    windows = {}
+    for days in WINDOWS:
+        start = now - days * DAY
+        overlaps = ends >= start
+        window_low = np.minimum.reduceat(np.where(overlaps, lows, np.inf), starts)
+        # Integer seconds keep the running sums exact, so ties resolve like product_stats
+        held = np.where(overlaps, np.maximum(0, ends - np.maximum(times, start)), 0)
+        total = np.add.reduceat(held, starts)
+        running = np.cumsum(held[order])
+        running -= np.repeat(running[starts] - held[order][starts], counts)
+        reached = 2 * running >= np.repeat(total, counts)
+        pick = np.minimum.reduceat(np.where(reached, np.arange(len(prices)), len(prices)), starts)
+        median = np.where(total > 0, prices[order][np.minimum(pick, len(prices) - 1)], current)
+        windows[days] = (window_low, median)
+
+    changes = np.add.reduceat((~first & (times >= now - 90 * DAY)).astype(np.int64), starts)
+    days_at_price = now - times[lasts]
+    return [finish(float(current[i]), float(low[i]),
+                   {days: (float(windows[days][0][i]), float(windows[days][1][i])) for days in WINDOWS},
+                   int(days_at_price[i]), changes[i])
+            for i in range(len(histories))]
+
+def compute_stats(products, now=None):
+    """{name: stats} for every product with a price history.
+
+    now is an ISO timestamp (normally the scrape time of the history file); when
+    it is missing or not a timestamp, the latest entry in any history is used.
+    """
+    named = [(p["name"], price_entries(p)) for p in products]
+    named = [(name, entries) for name, entries in named if entries]
+    if not named:
+        return {}
+    names, histories = zip(*named)
+    try:
+        now = parse_time(now)
+    except (TypeError, ValueError):
+        now = max(parse_time(h[-1]["t"]) for h in histories)
+    if np is not None:
+        results = _compute_numpy(histories, now)
+    else:
+        results = [product_stats(h, now) for h in histories]
+    return dict(zip(names, results))
+
+def add_stats(products, now=None):
+    """Set p["stats"] on every product with a price history"""
+    stats = compute_stats(products, now)
+    for p in products:
+        if p["name"] in stats:
+            p["stats"] = stats[p["name"]]
+    return stats
@@ -0,0 +1,191 @@
+"""Cross-store product matching: groups the same item sold by different stores.
+
+Names are normalised into size (ml or g), pack count, ABV, container and the
+remaining words, e.g.
+
+    "Hele õlu Lager Beer, HEINEKEN, 500 ml purk"  -> 500 ml, 1 pack, can, {hele, olu, lager, beer, heineken}
+    "Õlu Heineken 5%vol 0,5l prk"                 -> 500 ml, 1 pack, can, 5%, {olu, heineken}
+
+Only products that share a blocking key - (size, pack, word) for every word that is
+rare enough to be distinctive - are ever compared, so the cost grows with the number
+of plausible pairs rather than with all pairs. A pair matches when the shared
+words carry most of the IDF weight of both names and nothing known conflicts (ABV,
+container, own-label brands). Groups hold at most one product per store and are only
+merged when every cross pair matches, so a generic name can't chain two different
+variants together.
+
+Groups are persisted in MATCHES_FILE. update_matches() keeps existing groups, drops
+products that disappeared and only matches products it hasn't seen before; a change
+to MATCHER_VERSION (the matching rules) regroups everything.
+"""
+import json, math, os, re, unicodedata
+
+MATCHES_FILE = "product_matches.json"
+# Bump when the parsing or scoring rules change
+MATCHER_VERSION = 1
+
+# Share of the IDF weight of both names that must be in common
+MATCH_THRESHOLD = 0.7
+# Words in more than this share of products (õlu, viin, 500) never form a block
+MAX_BLOCK_SHARE = 0.05
+
+UNIT_SCALE = {"ml": 1, "cl": 10, "l": 1000, "g": 1, "kg": 1000}
+SIZE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(ml|cl|l|kg|g)(?![a-z])")
+PACK_RE = re.compile(r"(\d+)\s*-?\s*(?:pakk|pk)(?![a-z])|(\d+)\s*[x*]\s*(?=\d)")
+ABV_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*%")
+WORD_RE = re.compile(r"[a-z][a-z0-9]+")
+CONTAINERS = {"prk": "can", "purk": "can", "pdl": "bottle", "pudel": "bottle"}
+IGNORED_WORDS = {"vol", "pakk", "pk", "tk"}
+# Store own-label products ("Penne Rigate Rimi") exist in one store only
+OWN_LABELS = {"barbora", "maxima", "selver", "rimi", "coop", "prisma"}
+
+def fold(text):
+    """Lowercase ASCII, diacritics removed (Õlu -> olu)"""
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+
+def number(text):
+    return float(text.replace(",", "."))
+
+def parse_name(name):
+    """Size, pack, ABV, container and the remaining words of a product name"""
+    text = fold(name)
+    sizes = SIZE_RE.findall(text)
+    size = round(number(sizes[-1][0]) * UNIT_SCALE[sizes[-1][1]]) if sizes else None
+    pack = PACK_RE.search(text)
+    abv = ABV_RE.search(text)
+    words = set(WORD_RE.findall(ABV_RE.sub(" ", SIZE_RE.sub(" ", PACK_RE.sub(" ", text))))) - IGNORED_WORDS
+    containers = {CONTAINERS[w] for w in words if w in CONTAINERS}
+    return {
+        "size": size,
+        "pack": int(pack.group(1) or pack.group(2)) if pack else 1,
+        "abv": number(abv.group(1)) if abv else None,
+        "container": containers.pop() if len(containers) == 1 else None,
+        "words": words - CONTAINERS.keys(),
+    }
+
+class Matcher:
+    """Blocking index and pair scoring over one snapshot of the products"""
+    def __init__(self, products):
+        self.store = {p["name"]: p.get("store", "Unknown") for p in products}
+        self.parsed = {name: parse_name(name) for name in self.store}
+        counts = {}
+        for parsed in self.parsed.values():
+            for word in parsed["words"]:
+                counts[word] = counts.get(word, 0) + 1
+        total = max(len(self.parsed), 1)
+        self.idf = {word: math.log(total / count) for word, count in counts.items()}
+        self.blocks = {}
+        for name, parsed in self.parsed.items():
+            for key in self.block_keys(parsed, counts, total):
+                self.blocks.setdefault(key, []).append(name)
+
+    @staticmethod
+    def block_keys(parsed, counts, total):
+        if parsed["size"] is None:
+            return []
+        return [(parsed["size"], parsed["pack"], word) for word in parsed["words"]
+                if counts[word] <= MAX_BLOCK_SHARE * total]
+
+    def candidates(self, name):
+        """Products from other stores sharing at least one block with name"""
+        found = set()
+        parsed = self.parsed[name]
+        for word in parsed["words"]:
+            for other in self.blocks.get((parsed["size"], parsed["pack"], word), ()):
+                if self.store[other] != self.store[name]:
+                    found.add(other)
+        return found
+
+    def score(self, a, b):
+        """0..1 similarity; 0 when a known attribute conflicts"""
+        pa, pb = self.parsed[a], self.parsed[b]
+        if (pa["size"], pa["pack"]) != (pb["size"], pb["pack"]):
+            return 0.0
+        if pa["abv"] is not None and pb["abv"] is not None and abs(pa["abv"] - pb["abv"]) > 0.05:
+            return 0.0
+        if pa["container"] and pb["container"] and pa["container"] != pb["container"]:
+            return 0.0
+        if (pa["words"] | pb["words"]) & OWN_LABELS:
+            return 0.0
+        weight = lambda words: sum(self.idf[w] for w in words)
+        larger = max(weight(pa["words"]), weight(pb["words"]))
+        return weight(pa["words"] & pb["words"]) / larger if larger else 0.0
+
+def load_matches(path=MATCHES_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MATCHER_VERSION, "seen": [], "groups": []}
+    if state.get("version") != MATCHER_VERSION:
+        return {"version": MATCHER_VERSION, "seen": [], "groups": []}
+    return state
+
+def save_matches(state, path=MATCHES_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def match_new(matcher, groups, new_names):
+    """Merge new_names into groups (lists of names), best-scoring pairs first"""
+    group_of = {}
+    for group in groups:
+        for name in group:
+            group_of[name] = group
+    pairs = []
+    for name in new_names:
+        for other in matcher.candidates(name):
+            # Pairs of two new products are found from both sides; score them once
+            if other in new_names and other < name:
+                continue
+            score = matcher.score(name, other)
+            if score >= MATCH_THRESHOLD:
+                pairs.append((score, name, other))
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    for _, a, b in pairs:
+        ga, gb = group_of.get(a, [a]), group_of.get(b, [b])
+        if ga is gb:
+            continue
+        if {matcher.store[n] for n in ga} & {matcher.store[n] for n in gb}:
+            continue
+        if any(matcher.score(x, y) < MATCH_THRESHOLD for x in ga for y in gb):
+            continue
+        merged = sorted(ga + gb)
+        for name in merged:
+            group_of[name] = merged
+    unique = {id(group): group for group in group_of.values() if len(group) > 1}
+    return sorted(unique.values())
+
+def update_matches(products, path=MATCHES_FILE):
+    """Bring the persisted groups up to date with products and save them.
+    Returns {"groups": [[name, ...]], "new": number of products not seen before that
+    ended up in a group}."""
+    state = load_matches(path)
+    current = {p["name"] for p in products}
+    seen = set(state["seen"]) & current
+    groups = [[n for n in group if n in current] for group in state["groups"]]
+    groups = [group for group in groups if len(group) > 1]
+    new_names = current - seen
+    if new_names:
+        groups = match_new(Matcher(products), groups, new_names)
+    state.update(seen=sorted(current), groups=groups)
+    save_matches(state, path)
+    grouped = {name for group in groups for name in group}
+    return {"groups": groups, "new": len(new_names & grouped)}
+
+def add_comparisons(products, groups):
+    """Set p["compare"] on every grouped product: the other products of its group,
+    cheapest first, with the fields a price comparison needs"""
+    by_name = {p["name"]: p for p in products}
+    for group in groups:
+        members = [by_name[n] for n in group if n in by_name]
+        for p in members:
+            others = sorted((o for o in members if o is not p),
+                            key=lambda o: (o.get("latest_price") or float("inf"), o["name"]))
+            p["compare"] = [{
+                "name": o["name"],
+                "store": o.get("store", "Unknown"),
+                "latest_price": o.get("latest_price"),
+                "price_per_unit": o.get("price_per_unit"),
+            } for o in others]
@@ -0,0 +1,151 @@
+"""Sharded scrapes: split the categories over N runners and merge their results.
+
+    python scraper2.py --shard 1/3        # on each of three runners (shards count from 1)
+    python scrape_shards.py --plan 3      # show which categories each shard gets
+    python scrape_shards.py --merge       # fold the partials into the history
+
+Every runner works from the same checkout, so partition() gives every one of them
+the same assignment without coordinating. Categories are balanced by their cost -
+the average time they took over the last RECENT_RUNS change sets, or an estimate
+from their page or product counts when they have no timings yet - largest first,
+each onto the shard with the least work so far.
+
+A shard doesn't touch the history: it writes PARTIALS_DIR/shard-<i>-of-<N>.json with
+what it scraped. --merge checks that all N partials are there, applies them in
+shard order, products sorted by name, so the result doesn't depend on which runner
+finished first, then writes the history and the run's change set and removes the
+partials.
+"""
+import argparse, glob, json, os
+from datetime import datetime
+import changes, history_store, store_health
+
+PARTIALS_DIR = "partials"
+# Change sets the category costs are averaged over
+RECENT_RUNS = 7
+# Estimates for categories without timings
+SECONDS_PER_PAGE = 15.0
+PRODUCTS_PER_PAGE = 40
+
+def parse_shard(text):
+    """Parse "2/4" into (2, 4)"""
+    index, _, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {text!r}")
+    if not 1 <= index <= count:
+        raise ValueError(f"shard {index} is out of range 1..{count}")
+    return index, count
+
+def recent_timings():
+    """{category key: [(pages, seconds), ...]} from the latest change sets"""
+    timings = {}
+    paths = sorted(glob.glob(os.path.join(changes.CHANGES_DIR, "*.json")))[-RECENT_RUNS:]
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            categories = json.load(f).get("categories", {})
+        for key, counts in categories.items():
+            if counts.get("seconds"):
+                timings.setdefault(key, []).append((counts["pages"], counts["seconds"]))
+    return timings
+
+def category_costs(keys):
+    """Estimated seconds to scrape each category key"""
+    timings = recent_timings()
+    pages = sum(p for runs in timings.values() for p, _ in runs)
+    seconds = sum(s for runs in timings.values() for _, s in runs)
+    per_page = seconds / pages if pages else SECONDS_PER_PAGE
+    product_counts = {}
+    for prod in history_store.load_history()["products"].values():
+        product_counts[prod.get("category")] = product_counts.get(prod.get("category"), 0) + 1
+    costs = {}
+    for key in keys:
+        if key in timings:
+            costs[key] = sum(s for _, s in timings[key]) / len(timings[key])
+        else:
+            costs[key] = max(1, -(-product_counts.get(key, 0) // PRODUCTS_PER_PAGE)) * per_page
+    return costs
+
+def partition(keys, count, costs):
+    """Split keys into count lists of about equal total cost, deterministically"""
+    shards = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for key in sorted(keys, key=lambda k: (-costs[k], k)):
+        target = min(range(count), key=lambda i: (loads[i], i))
+        shards[target].append(key)
+        loads[target] += costs[key]
+    return shards, loads
+
+def partial_path(index, count):
+    return os.path.join(PARTIALS_DIR, f"shard-{index}-of-{count}.json")
+
+def write_partial(partial):
+    os.makedirs(PARTIALS_DIR, exist_ok=True)
+    path = partial_path(partial["shard"], partial["shards"])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(partial, f, ensure_ascii=False, sort_keys=True)
+    return path
+
+def load_partials():
+    """All partials, in shard order. Raises ValueError unless they form a complete set."""
+    partials = []
+    for path in glob.glob(os.path.join(PARTIALS_DIR, "shard-*-of-*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            partials.append(json.load(f))
+    if not partials:
+        raise ValueError(f"no partials in {PARTIALS_DIR}/")
+    count = partials[0]["shards"]
+    found = sorted(p["shard"] for p in partials if p["shards"] == count)
+    if len(found) != len(partials) or found != list(range(1, count + 1)):
+        raise ValueError(f"expected shards 1..{count} of {count}, found "
+                         + ", ".join(f"{p['shard']}/{p['shards']}" for p in partials))
+    return sorted(partials, key=lambda p: p["shard"])
+
+def merge():
+    """Apply a complete set of partials to the history as one run. Returns the change set."""
+    partials = load_partials()
+    data = history_store.load_history()
+    # The run is as old as its earliest shard
+    started = datetime.fromisoformat(min(p["started"] for p in partials))
+    run_changes = changes.ChangeSet(changes.new_run_id(started), started.isoformat(), data["meta"].get("run_id"))
+    data["meta"].update(generated_at=run_changes.generated_at, run_id=run_changes.run_id)
+    run_changes.stores = store_health.merge_reports(p.get("stores", {}) for p in partials)
+    for partial in partials:
+        for key, timing in sorted(partial["categories"].items()):
+            run_changes.timing(key, timing["pages"], timing["seconds"], timing.get("complete", True),
+                               timing.get("peak_rss_mb"))
+        for name in sorted(partial["products"]):
+            history_store.record_product(data, name, partial["products"][name], run_changes)
+        for key in sorted(partial["categories"]):
+            names = [name for name, observed in partial["products"].items() if observed["category"] == key]
+            if names and partial["categories"][key].get("complete", True):
+                history_store.mark_seen(data, key, names)
+    history_store.save_history(data)
+    run_changes.record_missing(data["products"])
+    print(f"Merged {len(partials)} shards: {run_changes.summary()} -> {run_changes.write()}")
+    for partial in partials:
+        os.remove(partial_path(partial["shard"], partial["shards"]))
+    return run_changes
+
+def plan(keys, count):
+    costs = category_costs(keys)
+    shards, loads = partition(keys, count, costs)
+    for index, (shard, load) in enumerate(zip(shards, loads), 1):
+        print(f"Shard {index}/{count}: {len(shard)} categories, ~{load / 60:.1f} min")
+        for key in shard:
+            print(f"  {key} (~{costs[key]:.0f}s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan and merge sharded scrapes")
+    parser.add_argument("--plan", type=int, metavar="N", help="show the categories of each of N shards")
+    parser.add_argument("--merge", action="store_true", help=f"merge the partials in {PARTIALS_DIR}/ into the history")
+    args = parser.parse_args()
+    if args.merge:
+        merge()
+    elif args.plan:
+        from build_site import load_data
+        _, sources, _, _ = load_data()
+        plan({s["key"] for s in sources}, args.plan)
+    else:
+        parser.print_help()
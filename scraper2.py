@@ -1,10 +1,12 @@
 from playwright.sync_api import sync_playwright
-import json, os, re, time
+import argparse, json, os, re, time
 from datetime import datetime
+import browser_memory, changes, debug_artifacts, history_store, metrics, scrape_shards, store_health
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
-HISTORY_FILE = "alcohol_history.json"
 CONFIG_FILE = "categories.json"
+# Rimi's out-of-stock cards only show the can or bottle deposit, which reads as the price
+DEPOSIT_ONLY_PRICE = 0.10
 
 # Match ml, cl, l, g, kg, tk
 UNIT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(ml|cl|l|L|g|kg|tk)")
@@ -207,16 +209,9 @@ def scrape_selver_page(page):
 
 # ---------------- RIMI (UPDATED WITH DEBUG) ----------------
 def debug_rimi_page(page):
-    """Debug function to see what's actually on the page"""
+    """Debug function to see which product selectors match on the page"""
     print("\n=== RIMI DEBUG ===")
     
-    # Save screenshot
-    try:
-        page.screenshot(path="rimi_debug.png")
-        print("Screenshot saved to rimi_debug.png")
-    except Exception as e:
-        print(f"Could not save screenshot: {e}")
-    
     # Check for common selectors
     selectors_to_check = [
         '.card',
@@ -236,25 +231,11 @@ def debug_rimi_page(page):
         else:
             print(f"  ✗ {selector}: 0 elements")
     
-    # Get page HTML snippet
-    try:
-        html_snippet = page.evaluate("() => document.body.innerHTML.substring(0, 3000)")
-        print(f"\nFirst 3000 chars of HTML:\n{html_snippet}\n")
-        
-        # Save full HTML for inspection
-        with open("rimi_debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-        print("Full HTML saved to rimi_debug.html")
-    except Exception as e:
-        print(f"Could not get HTML: {e}")
-    
     return True
 
-def scrape_rimi_page(page, debug_mode=False):
-    """Updated Rimi scraper with better error handling and debug mode"""
-    if debug_mode:
-        debug_rimi_page(page)
-    
+def scrape_rimi_page(page, artifacts=None):
+    """Updated Rimi scraper with better error handling; pages without product cards
+    are captured as debug artifacts"""
     print("  [Rimi] Waiting for content...")
     
     # Try multiple possible selectors
@@ -280,14 +261,8 @@ def scrape_rimi_page(page, debug_mode=False):
     
     if not found_selector:
         print("  [Rimi] ERROR: No product cards found with any known selector")
-        # Save debug info
-        try:
-            page.screenshot(path="rimi_error.png")
-            with open("rimi_error.html", "w", encoding="utf-8") as f:
-                f.write(page.content())
-            print("  [Rimi] Saved rimi_error.png and rimi_error.html for debugging")
-        except:
-            pass
+        if artifacts is not None:
+            artifacts.anomaly(page, "rimi-no-cards")
         return []
     
     # Accept cookies if present
@@ -405,8 +380,56 @@ def parse_price_per_unit(text):
         return float(m.group(1).replace(",", "."))
     return 0.0
 
+def goto_with_retry(page, url, store, breaker):
+    """Load url, retrying with backoff. Returns False, with the breaker told why, if
+    the page never loaded or the store is throttling us."""
+    with metrics.timer("scrape_page_seconds", store=store):
+        result = _goto_with_retry(page, url, store, breaker)
+    metrics.inc("scrape_pages_total", store=store, result=result)
+    return result == "ok"
+
+def _goto_with_retry(page, url, store, breaker):
+    """goto_with_retry() without the metrics. Returns "ok", "failed" or "blocked"."""
+    error = None
+    for attempt in range(store_health.MAX_ATTEMPTS):
+        if attempt:
+            delay = store_health.backoff(attempt - 1)
+            print(f"  Retrying in {delay:.1f}s ({error})")
+            breaker.retry(store)
+            time.sleep(delay)
+        try:
+            response = page.goto(url, wait_until="networkidle", timeout=60000)
+        except Exception as e:
+            error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            continue
+        status = response.status if response else None
+        blocked = store_health.blocked_reason(status, page.title())
+        if blocked:
+            print(f"  Blocked: {blocked}")
+            breaker.block(store, blocked)
+            return "blocked"
+        if status and status >= 500:
+            error = f"HTTP {status}"
+            continue
+        breaker.success(store)
+        return "ok"
+    print(f"  Navigation failed: {error}")
+    breaker.failure(store, error)
+    return "failed"
+
+def record_download(response, store):
+    """Count a response's bytes toward the store being scraped. Only Content-Length
+    is looked at (reading bodies would cost a round trip each), so chunked responses
+    without one aren't counted."""
+    length = response.headers.get("content-length", "")
+    if store and length.isdigit():
+        metrics.inc("scrape_bytes_total", int(length), store=store)
+
 # ---------------- main runner ----------------
-def run_scraper():
+def run_scraper(shard=None):
+    """Scrape every category into the history, or with shard=(i, N) only the i-th of N
+    shards into a partial for scrape_shards.py --merge. Returns the run id, None if
+    nothing was scraped."""
     CATEGORIES = load_categories()
     
     if not CATEGORIES:
@@ -417,10 +440,12 @@ def run_scraper():
     
     # Check if running in GitHub Actions or locally
     is_github = os.environ.get("GITHUB_ACTIONS") == "true"
-    debug_mode = os.environ.get("DEBUG_MODE") == "true" or not is_github
+    debug_mode = os.environ.get("DEBUG_MODE") == "true"
+    artifacts = debug_artifacts.DebugArtifacts(
+        os.environ.get("DEBUG_ARTIFACTS") or ("sample" if debug_mode else "anomalies"))
     
     if debug_mode:
-        print("🔍 Running in DEBUG mode (will save screenshots and HTML)")
+        print(f"🔍 Running in DEBUG mode (sampling 1 in {artifacts.sample_every} pages to {artifacts.directory}/)")
     
     single_category_key = os.environ.get("SCRAPE_SINGLE_CATEGORY")
     if single_category_key:
@@ -432,6 +457,15 @@ def run_scraper():
             print(f"⚠️  Category key '{single_category_key}' not found in config. Skipping.")
             return
     
+    partial = None
+    if shard:
+        index, count = shard
+        keys = [get_category_key(cat["name"], cat["url"]) for cat in CATEGORIES]
+        shards, loads = scrape_shards.partition(set(keys), count, scrape_shards.category_costs(set(keys)))
+        CATEGORIES = [cat for cat, key in zip(CATEGORIES, keys) if key in shards[index - 1]]
+        print(f"🧩 Shard {index}/{count}: {len(CATEGORIES)} categories, ~{loads[index - 1] / 60:.1f} min")
+        partial = {"shard": index, "shards": count, "categories": {}, "products": {}}
+    
     with sync_playwright() as p:
         print("Starting browser...")
         
@@ -451,28 +485,35 @@ def run_scraper():
         
         browser = p.chromium.launch(**launch_options)
         
-        context = browser.new_context(
-            viewport={"width": 1280, "height": 800},
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
-        
-        page = context.new_page()
+        # The store whose category is being scraped, for counting downloaded bytes
+        active = {"store": None}
+        def new_context():
+            context = browser.new_context(
+                viewport={"width": 1280, "height": 800},
+                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+            )
+            context.on("response", lambda response: record_download(response, active["store"]))
+            return context
+        memory = browser_memory.MemoryGovernor(new_context)
         
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                except:
-                    data = {"meta": {}, "products": {}}
+        started = datetime.now()
+        if partial is None:
+            data = history_store.load_history()
+            run_changes = changes.ChangeSet(changes.new_run_id(started), started.isoformat(), data["meta"].get("run_id"))
+            data["meta"]["generated_at"] = run_changes.generated_at
+            data["meta"]["run_id"] = run_changes.run_id
         else:
-            data = {"meta": {}, "products": {}}
-        
-        if "products" not in data:
-            data["products"] = {}
-        
-        data["meta"]["generated_at"] = datetime.now().isoformat()
+            partial["started"] = started.isoformat()
         
-        for cat_entry in CATEGORIES:
+        breaker = store_health.CircuitBreaker()
+        queue, postponed = list(CATEGORIES), []
+        while queue or postponed:
+            if not queue:
+                # Stores whose breaker tripped get one more try once the others are done
+                for store in dict.fromkeys(get_store_from_url(cat["url"]) for cat in postponed):
+                    breaker.half_open(store)
+                queue, postponed = postponed, []
+            cat_entry = queue.pop(0)
             cat_name = cat_entry["name"]
             base_url = cat_entry["url"]
             target_unit = cat_entry.get("unit", "L")
@@ -480,7 +521,20 @@ def run_scraper():
             category_key = get_category_key(cat_name, base_url)
             store_name = get_store_from_url(base_url)
             
+            if not breaker.allows(store_name):
+                if breaker.can_postpone(store_name):
+                    postponed.append(cat_entry)
+                else:
+                    print(f"\n--- Skipping {cat_name} on {store_name} (circuit open) ---")
+                    breaker.skip(store_name, category_key)
+                continue
+            
             print(f"\n--- Scanning {cat_name} ({target_unit}) on {store_name} ---")
+            category_started = time.time()
+            active["store"] = store_name
+            category_names = set()
+            # Only a scan that ran to the end says anything about products it didn't find
+            complete = True
             
             page_num = 1
             seen_names = set()
@@ -501,33 +555,39 @@ def run_scraper():
                 
                 print(f"  Page {page_num} -> {target_url}")
                 
-                try:
-                    page.goto(target_url, wait_until="networkidle", timeout=60000)
-                    
-                    # Try to accept cookies for all stores
-                    try:
-                        if page.is_visible('button:has-text("Nõustun")', timeout=2000):
-                            page.click('button:has-text("Nõustun")')
-                            time.sleep(1)
-                    except:
-                        pass
-                        
-                except Exception as e:
-                    print(f"  Navigation failed: {e}")
+                page = memory.page()
+                if not goto_with_retry(page, target_url, store_name, breaker):
+                    complete = False
                     break
                 
+                # Try to accept cookies for all stores
+                try:
+                    if page.is_visible('button:has-text("Nõustun")', timeout=2000):
+                        page.click('button:has-text("Nõustun")')
+                        time.sleep(1)
+                except:
+                    pass
+                
+                if artifacts.sample():
+                    if store_name == "Rimi":
+                        debug_rimi_page(page)
+                    artifacts.capture(page, f"{store_name.lower()}-page-{page_num}")
+                
                 if store_name == "Rimi":
-                    # Enable debug mode for first page of Rimi
-                    raw_products = scrape_rimi_page(page, debug_mode=(page_num == 1 and debug_mode))
+                    raw_products = scrape_rimi_page(page, artifacts)
                 elif store_name == "Selver":
                     raw_products = scrape_selver_page(page)
                 elif store_name == "Barbora":
                     raw_products = scrape_barbora_page(page)
                 else:
                     raw_products = []
+                memory.sample(category_key)
                 
                 if not raw_products:
                     print("  Page empty. Stopping category.")
+                    # Running out of pages is normal, an empty first page isn't
+                    if page_num == 1 and store_name != "Rimi":
+                        artifacts.anomaly(page, f"{store_name.lower()}-empty")
                     break
                 
                 current_names = {p["name"] for p in raw_products}
@@ -545,42 +605,22 @@ def run_scraper():
                         continue
                     
                     price = parse_price(pdt.get("price_text", ""))
-                    if price == 0:
+                    # Not for sale right now, so not seen either
+                    if price == 0 or price == DEPOSIT_ONLY_PRICE:
                         continue
                     
-                    # 1. Initialize product and ENSURE 'entries' exists
-                    if name not in data["products"]:
-                        data["products"][name] = {"category": category_key, "entries": []}
-                    
-                    prod = data["products"][name]
-                    
-                    # Self-healing: if the product existed but had no 'entries' key
-                    if "entries" not in prod or not isinstance(prod["entries"], list):
-                        prod["entries"] = []
-
-                    # 2. Track sale info
+                    # 1. Track sale info
                     is_sale = pdt.get("is_sale", False)
                     if is_sale:
                         sale_count += 1
                     
-                    # 3. Handle Unit Price / Size
+                    # 2. Handle Unit Price / Size
                     unit_text = pdt.get("unit_text", "")
                     unit_price_val = parse_price_per_unit(unit_text)
                     size_val = extract_unit_value(name, target_unit)
                     ppu = unit_price_val if unit_price_val > 0 else (price / size_val if size_val else 0)
                     
-                    # 4. Check if price changed (logging only)
-                    if prod["entries"] and prod["entries"][-1].get("p") != price:
-                        old_price = prod["entries"][-1].get("p", 0)
-                        sale_marker = " 🏷️ SALE" if is_sale else ""
-                        print(f"  💰 {name[:50]}... {old_price:.2f} → {price:.2f}{sale_marker}")
-                    
-                    # 5. Add history entry only if price is new or different
-                    if not prod["entries"] or prod["entries"][-1].get("p") != price:
-                        prod["entries"].append({"t": data["meta"]["generated_at"], "p": price})
-                    
-                    # 6. Update general product info
-                    prod.update({
+                    observed = {
                         "latest_price": price,
                         "price_per_unit": ppu,
                         "unit_label": target_unit,
@@ -589,8 +629,21 @@ def run_scraper():
                         "category": category_key,
                         "store": store_name,
                         "is_sale": is_sale
-                    })
+                    }
                     count += 1
+                    category_names.add(name)
+                    metrics.inc("scrape_products_total", store=store_name)
+                    
+                    # 3. A shard only reports what it saw; the merge applies it
+                    if partial is not None:
+                        partial["products"][name] = observed
+                        continue
+                    
+                    # 4. Add a history entry if the price is new or different, update the rest
+                    old_price = history_store.record_product(data, name, observed, run_changes)
+                    if old_price is not None and old_price != price:
+                        sale_marker = " 🏷️ SALE" if is_sale else ""
+                        print(f"  💰 {name[:50]}... {old_price:.2f} → {price:.2f}{sale_marker}")
                 
                 # --- Replacement ends here ---
                 sale_info = f" ({sale_count} on sale)" if sale_count > 0 else ""
@@ -605,19 +658,62 @@ def run_scraper():
                 if page_num > 50:
                     print("  Safety limit reached (50 pages)")
                     break
+            
+            seconds = time.time() - category_started
+            metrics.observe("scrape_category_seconds", seconds, store=store_name)
+            peak_mb = memory.peaks.get(category_key)
+            if peak_mb is not None:
+                print(f"  Peak browser memory: {peak_mb} MB")
+            if partial is None:
+                run_changes.timing(category_key, page_num, seconds, complete, peak_mb)
+                if category_names and complete:
+                    history_store.mark_seen(data, category_key, category_names)
+            else:
+                partial["categories"][category_key] = {"pages": page_num, "seconds": round(seconds, 1),
+                                                       "complete": complete, "peak_rss_mb": peak_mb}
         
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        for store in metrics.REGISTRY.label_values("scrape_category_seconds", "store"):
+            seconds = metrics.value("scrape_category_seconds", store=store)
+            if seconds:
+                metrics.set_gauge("scrape_products_per_second",
+                                  round(metrics.value("scrape_products_total", store=store) / seconds, 3), store=store)
+        metrics.set_gauge("scrape_run_seconds", round((datetime.now() - started).total_seconds(), 1))
+        breaker.print_report()
+        print(f"Browser recycled: {memory.recycled['pages']} pages, {memory.recycled['contexts']} contexts")
+        if partial is None:
+            run_changes.stores = breaker.report()
+            history_store.save_history(data)
+            run_changes.record_missing(data["products"])
+            print(f"\nChanges: {run_changes.summary()} -> {run_changes.write()}")
+        else:
+            partial["stores"] = breaker.report()
+            print(f"\nShard {partial['shard']}/{partial['shards']}: {len(partial['products'])} products -> {scrape_shards.write_partial(partial)}")
         
+        artifacts.close()
         browser.close()
         print("\n✅ Scrape Complete!")
+        return changes.new_run_id(started)
 
 if __name__ == "__main__":
-    run_scraper()
-    try:
-        import build_site
-        build_site.build()
-        print("Success: Website updated (index.html)")
-    except ImportError:
+    parser = argparse.ArgumentParser(description="Scrape prices into the history and rebuild the site")
+    parser.add_argument("--shard", type=scrape_shards.parse_shard, metavar="i/N",
+                        help="scrape only shard i of N into a partial; merge with scrape_shards.py --merge")
+    parser.add_argument("--no-build", action="store_true",
+                        help="leave the site build to a later build_site.py run (as the CI workflow does)")
+    args = parser.parse_args()
+    run_id = run_scraper(args.shard)
+    # Sharded runs build nothing; that happens once the partials are merged
+    if not args.shard:
+        if not args.no_build:
+            try:
+                import build_site
+                build_site.build()
+                print("Success: Website updated (index.html)")
+            except ImportError:
 
-        print("Error: build_site.py not found. Website not updated.")
+                print("Error: build_site.py not found. Website not updated.")
+        import price_alerts
+        price_alerts.run()
+    # One summary per run, with the site build's metrics when it ran in this process
+    name = "scrape-{}-of-{}".format(*args.shard) if args.shard else "scrape"
+    print(f"Metrics: {metrics.write_run(name, run_id)}")
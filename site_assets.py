@@ -0,0 +1,169 @@
+"""Minified, content-hashed static assets with precompressed .gz/.br siblings.
+
+Hashed names never change content, so browsers may cache them for good
+(static_server.py serves them as immutable); index.html points at the current ones.
+"""
+import gzip, hashlib, os, re
+import http_cache
+
+JS_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+JS_REGEX_KEYWORDS = {"return", "typeof", "case", "in", "of", "new", "delete", "void", "throw", "else", "do"}
+
+def _skip_string(source, i):
+    """Index just past the quoted string starting at i"""
+    quote = source[i]
+    i += 1
+    while source[i] != quote:
+        i += 2 if source[i] == "\\" else 1
+    return i + 1
+
+def _skip_regex(source, i):
+    """Index just past the regex literal (with flags) starting at i"""
+    i += 1
+    in_class = False
+    while in_class or source[i] != "/":
+        if source[i] == "\\":
+            i += 1
+        elif source[i] == "[":
+            in_class = True
+        elif source[i] == "]":
+            in_class = False
+        i += 1
+    i += 1
+    while i < len(source) and source[i].isalpha():
+        i += 1
+    return i
+
+def _regex_allowed(out):
+    """Whether a / after the emitted code starts a regex rather than a division"""
+    code = "".join(out[-16:]).rstrip()
+    if not code:
+        return True
+    if code[-1] in JS_REGEX_PRECEDERS:
+        return True
+    word = re.search(r"[A-Za-z_$][\w$]*$", code)
+    return bool(word) and word.group(0) in JS_REGEX_KEYWORDS
+
+def minify_js(source):
+    """Strip comments, indentation and blank lines.
+
+    Line breaks are kept so automatic semicolon insertion behaves as before, and
+    strings, template literals and regex literals are copied verbatim.
+    """
+    out = []
+    templates = []  # brace depth inside each open ${...}
+    i, n = 0, len(source)
+    line_start = True
+    in_template = False
+    while i < n:
+        if in_template:
+            start = i
+            while source[i] != "`" and not source.startswith("${", i):
+                i += 2 if source[i] == "\\" else 1
+            if source[i] == "`":
+                out.append(source[start:i + 1])
+                i += 1
+                in_template = False
+            else:
+                out.append(source[start:i + 2])
+                i += 2
+                templates.append(0)
+                in_template = False
+            continue
+        c = source[i]
+        if c == "\n":
+            while out and out[-1] in (" ", "\t"):
+                out.pop()
+            if out and not out[-1].endswith("\n"):
+                out.append("\n")
+            line_start = True
+            i += 1
+        elif c in " \t\r" and (line_start or (out and out[-1] in (" ", "\t"))):
+            i += 1
+        elif source.startswith("//", i):
+            i = source.find("\n", i)
+            i = n if i < 0 else i
+        elif source.startswith("/*", i):
+            i = source.index("*/", i + 2) + 2
+        else:
+            line_start = False
+            if c in "'\"":
+                j = _skip_string(source, i)
+                out.append(source[i:j])
+                i = j
+            elif c == "`":
+                out.append(c)
+                i += 1
+                in_template = True
+            elif c == "/" and _regex_allowed(out):
+                j = _skip_regex(source, i)
+                out.append(source[i:j])
+                i = j
+            else:
+                if templates:
+                    if c == "{":
+                        templates[-1] += 1
+                    elif c == "}":
+                        if templates[-1] == 0:
+                            templates.pop()
+                            out.append(c)
+                            i += 1
+                            in_template = True
+                            continue
+                        templates[-1] -= 1
+                out.append(c)
+                i += 1
+    return "".join(out).strip() + "\n"
+
+def minify_css(source):
+    """Strip comments and collapse whitespace, leaving quoted strings alone"""
+    out = []
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if source.startswith("/*", i):
+            i = source.index("*/", i + 2) + 2
+        elif c in "'\"":
+            j = _skip_string(source, i)
+            out.append(source[i:j])
+            i = j
+        elif c.isspace():
+            while i < n and source[i].isspace():
+                i += 1
+            prev = out[-1][-1:] if out else ""
+            nxt = source[i:i + 1]
+            if prev and prev not in "{};,>:" and nxt not in "{};,>":
+                out.append(" ")
+        else:
+            if c == "}" and out and out[-1] == ";":
+                out.pop()
+            out.append(c)
+            i += 1
+    return "".join(out).strip() + "\n"
+
+def write_precompressed(path, data):
+    """Write .gz (and .br, if brotli is installed) next to path"""
+    variants = [("gzip", ".gz")] + ([("br", ".br")] if http_cache.brotli is not None else [])
+    for encoding, suffix in variants:
+        body = gzip.compress(data, compresslevel=9, mtime=0) if encoding == "gzip" else http_cache.compress(data, encoding)
+        with open(path + suffix, "wb") as f:
+            f.write(body)
+
+def hashed_name(prefix, ext, text):
+    return f"{prefix}.{hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]}.{ext}"
+
+def write_asset(directory, prefix, ext, text):
+    """Write text as <prefix>.<hash>.<ext> with compressed siblings, unless it exists.
+    Older versions of the same asset are removed. Returns the file name."""
+    name = hashed_name(prefix, ext, text)
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        data = text.encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(data)
+        write_precompressed(path, data)
+    stale = re.compile(rf"^{re.escape(prefix)}\.[0-9a-f]{{10}}\.{re.escape(ext)}(\.gz|\.br)?$")
+    for other in os.listdir(directory or "."):
+        if stale.match(other) and not other.startswith(name):
+            os.remove(os.path.join(directory, other))
+    return name
@@ -0,0 +1,116 @@
+"""Local static server for the generated site with compression and conditional GET.
+
+    python static_server.py [--port 8000] [--dir .]
+"""
+import argparse, hashlib, mimetypes, os, re, threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, unquote
+import http_cache
+
+# Files with a content hash in their name (app.1a2b3c4d.js, img/1a2b3c4d5e6f7a8b.webp) never change
+HASHED_NAME_RE = re.compile(r"(^|\.)[0-9a-f]{8,}\.")
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("application/json", ".json")
+
+class FileCache:
+    """Keeps file bodies, their ETags and compressed variants keyed by (path, size, mtime)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, path, encoding):
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(path)
+            if not entry or entry["stamp"] != stamp:
+                with open(path, "rb") as f:
+                    body = f.read()
+                entry = {
+                    "stamp": stamp,
+                    "mtime": int(st.st_mtime),
+                    "digest": hashlib.sha1(body).hexdigest()[:20],
+                    "variants": {"identity": body},
+                }
+                self._entries[path] = entry
+            if encoding not in entry["variants"]:
+                entry["variants"][encoding] = self._load_variant(path, entry, encoding)
+            return entry["mtime"], entry["digest"], entry["variants"][encoding]
+
+    def _load_variant(self, path, entry, encoding):
+        # Prefer precompressed siblings written by the build (index.html.br, index.html.gz)
+        suffix = {"br": ".br", "gzip": ".gz"}[encoding]
+        sibling = path + suffix
+        if os.path.exists(sibling) and os.path.getmtime(sibling) >= entry["mtime"]:
+            with open(sibling, "rb") as f:
+                return f.read()
+        return http_cache.compress(entry["variants"]["identity"], encoding)
+
+class CachingHandler(SimpleHTTPRequestHandler):
+    cache = FileCache()
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        path = self.translate_path(unquote(urlparse(self.path).path))
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        encoding = "identity"
+        if http_cache.is_compressible(mimetype) and os.path.getsize(path) >= http_cache.MIN_COMPRESS_SIZE:
+            encoding = http_cache.negotiate_encoding(self.headers.get("Accept-Encoding"))
+
+        mtime, digest, body = self.cache.get(path, encoding)
+        etag = http_cache.make_etag(digest, encoding)
+
+        if http_cache.is_fresh(self.headers, etag, mtime):
+            self.send_response(304)
+            self._send_cache_headers(path, etag, mtime)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", mimetype + ("; charset=utf-8" if mimetype.startswith("text/") else ""))
+        self.send_header("Content-Length", str(len(body)))
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        self._send_cache_headers(path, etag, mtime)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_cache_headers(self, path, etag, mtime):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", http_cache.http_date(mtime))
+        self.send_header("Vary", "Accept-Encoding")
+        if HASHED_NAME_RE.search(os.path.basename(path)):
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            self.send_header("Cache-Control", "no-cache")
+
+def serve(directory=".", port=8000):
+    handler = lambda *args, **kwargs: CachingHandler(*args, directory=directory, **kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    print(f"Serving {os.path.abspath(directory)} at http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the generated site locally")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--dir", default=".")
+    args = parser.parse_args()
+    serve(args.dir, args.port)
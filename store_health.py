@@ -0,0 +1,117 @@
+"""Per-store circuit breaker for the scraper, so one unhealthy store can't stall a run.
+
+Each page gets up to MAX_ATTEMPTS navigations with jittered exponential backoff in
+between. A store's breaker trips (opens) after TRIP_AFTER pages in a row failed
+every attempt, or at once when a page looks like throttling or a bot check. The
+scraper then postpones the store's remaining categories to the end of the run and
+gives it one more try (half-open); if that fails too, the rest is skipped.
+
+The report (CircuitBreaker.report()) is printed at the end of a run and stored in
+the run's change set under "stores":
+
+    {"Rimi": {"state": "open", "reason": "HTTP 429", "pages": 12, "retries": 4,
+              "failures": 2, "trips": 2, "skipped": ["Rimi:Õlled", ...]}}
+"""
+import random
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 30.0
+TRIP_AFTER = 2
+# Responses that mean "slow down" or "go away" rather than a flaky page
+BLOCKED_STATUSES = {403, 429}
+BLOCKED_TITLES = ("just a moment", "attention required", "access denied", "captcha", "are you a robot")
+
+def backoff(attempt):
+    """Seconds to wait before retry number attempt + 1 ("full jitter")"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def blocked_reason(status, title):
+    """Why a loaded page looks like throttling or a bot check, or None"""
+    if status in BLOCKED_STATUSES:
+        return f"HTTP {status}"
+    lowered = (title or "").lower()
+    for marker in BLOCKED_TITLES:
+        if marker in lowered:
+            return f"blocked page ({title.strip()[:60]})"
+    return None
+
+class CircuitBreaker:
+    """Health of every store seen in a run"""
+    def __init__(self, trip_after=TRIP_AFTER):
+        self.trip_after = trip_after
+        self.stores = {}
+
+    def store(self, name):
+        return self.stores.setdefault(name, {
+            "state": "closed", "reason": None, "pages": 0, "retries": 0,
+            "failures": 0, "consecutive": 0, "trips": 0, "skipped": []})
+
+    def allows(self, name):
+        return self.store(name)["state"] != "open"
+
+    def can_postpone(self, name):
+        """Whether an open breaker still has its second chance at the end of the run"""
+        return self.store(name)["trips"] == 1
+
+    def success(self, name):
+        s = self.store(name)
+        s.update(pages=s["pages"] + 1, consecutive=0)
+        if s["state"] == "half-open":
+            s["state"] = "closed"
+
+    def retry(self, name):
+        self.store(name)["retries"] += 1
+
+    def failure(self, name, reason):
+        s = self.store(name)
+        s.update(failures=s["failures"] + 1, consecutive=s["consecutive"] + 1)
+        if s["state"] == "half-open" or s["consecutive"] >= self.trip_after:
+            self.trip(name, reason)
+
+    def block(self, name, reason):
+        """A throttling or bot-check page: no point retrying this store for now"""
+        self.store(name)["failures"] += 1
+        self.trip(name, reason)
+
+    def trip(self, name, reason):
+        s = self.store(name)
+        if s["state"] != "open":
+            s.update(state="open", reason=reason, trips=s["trips"] + 1)
+            print(f"  ⛔ {name}: circuit open ({reason})")
+
+    def half_open(self, name):
+        s = self.store(name)
+        if s["state"] == "open":
+            s.update(state="half-open", consecutive=0)
+            print(f"\n🔁 Retrying postponed {name} categories")
+
+    def skip(self, name, category):
+        self.store(name)["skipped"].append(category)
+
+    def report(self):
+        return {name: {k: v for k, v in s.items() if k != "consecutive"} for name, s in sorted(self.stores.items())}
+
+    def print_report(self):
+        print("\nStore health:")
+        for name, s in self.report().items():
+            line = f"  {name}: {s['state']}, {s['pages']} pages, {s['retries']} retries, {s['failures']} failed pages"
+            if s["reason"]:
+                line += f", last trip: {s['reason']}"
+            if s["skipped"]:
+                line += f", skipped {len(s['skipped'])}: {', '.join(s['skipped'])}"
+            print(line)
+
+def merge_reports(reports):
+    """One report from the reports of several shards"""
+    merged = {}
+    for report in reports:
+        for name, s in report.items():
+            m = merged.setdefault(name, {"state": "closed", "reason": None, "pages": 0, "retries": 0,
+                                         "failures": 0, "trips": 0, "skipped": []})
+            for key in ("pages", "retries", "failures", "trips"):
+                m[key] += s[key]
+            m["skipped"] += s["skipped"]
+            if s["state"] != "closed":
+                m.update(state=s["state"], reason=s["reason"])
+    return merged
@@ -0,0 +1,187 @@
+// Service worker for index.html, written by build_site.py.
+// Keeps the data files a visitor has fetched in IndexedDB. When a new build is published
+// it patches them with the deltas listed in the manifest, so a returning visitor only
+// downloads what changed. Too far behind (or on a first visit) files are fetched normally.
+
+const DB_NAME = 'price-tracker-data';
+const DB_VERSION = 1;
+const FILES = 'files'; // data file path (e.g. "shards/x.json") -> JSON text at the cached version
+const META = 'meta';   // "version" -> version of the cached files, "manifest" -> last manifest seen
+
+let dbRequest = null;
+const syncs = new Map(); // target version -> Promise of bringing the cache to it
+
+self.addEventListener('install', () => self.skipWaiting());
+self.addEventListener('activate', event => event.waitUntil(self.clients.claim()));
+
+self.addEventListener('fetch', event => {
+    if (event.request.method !== 'GET') return;
+    const url = new URL(event.request.url);
+    const dataRoot = new URL('data/', self.registration.scope);
+    if (!url.href.startsWith(dataRoot.href)) return;
+    const path = url.pathname.slice(dataRoot.pathname.length);
+    if (path === 'manifest.json') {
+        event.respondWith(manifestResponse(event));
+    } else if (url.searchParams.has('v') && !path.startsWith('deltas/')) {
+        event.respondWith(dataResponse(path, url.searchParams.get('v')));
+    }
+});
+
+// INDEXEDDB
+function openDb() {
+    if (!dbRequest) {
+        dbRequest = new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, DB_VERSION);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(FILES);
+                request.result.createObjectStore(META);
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return dbRequest;
+}
+
+async function transaction(store, mode, action) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(store, mode);
+        const request = action(tx.objectStore(store));
+        tx.oncomplete = () => resolve(request ? request.result : undefined);
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+const dbGet = (store, key) => transaction(store, 'readonly', s => s.get(key));
+const dbPut = (store, key, value) => transaction(store, 'readwrite', s => s.put(value, key));
+const dbDelete = (store, key) => transaction(store, 'readwrite', s => s.delete(key));
+const dbClear = store => transaction(store, 'readwrite', s => s.clear());
+
+// RESPONSES
+function dataUrl(path, version) {
+    const url = new URL(`data/${path}`, self.registration.scope);
+    if (version) url.searchParams.set('v', version);
+    return url.href;
+}
+
+function jsonResponse(text) {
+    return new Response(text, { headers: { 'Content-Type': 'application/json' } });
+}
+
+// Always ask the network for the manifest, falling back to the last one seen (offline)
+async function manifestResponse(event) {
+    try {
+        const response = await fetch(event.request);
+        if (response.ok) {
+            const text = await response.clone().text();
+            const manifest = JSON.parse(text);
+            await dbPut(META, 'manifest', text);
+            event.waitUntil(syncTo(manifest.version).catch(err => console.error('Delta sync failed', err)));
+        }
+        return response;
+    } catch (err) {
+        const text = await dbGet(META, 'manifest');
+        if (text) return jsonResponse(text);
+        throw err;
+    }
+}
+
+async function dataResponse(path, version) {
+    try {
+        await syncTo(version);
+        if (await dbGet(META, 'version') === version) {
+            const text = await dbGet(FILES, path);
+            if (text !== undefined) return jsonResponse(text);
+            const response = await fetch(dataUrl(path, version));
+            if (response.ok) {
+                const text = await response.clone().text();
+                // A newer build may have been synced in the meantime
+                if (await dbGet(META, 'version') === version) await dbPut(FILES, path, text);
+            }
+            return response;
+        }
+    } catch (err) {
+        console.error('Data cache unavailable', path, err);
+    }
+    return fetch(dataUrl(path, version));
+}
+
+// DELTAS
+// Deltas from version `from` to `to`, or null if the manifest doesn't reach back that far
+function deltaChain(deltas, from, to) {
+    const chain = [];
+    let version = from;
+    while (version !== to) {
+        const step = deltas.find(d => d.from === version);
+        if (!step) return null;
+        chain.push(step);
+        version = step.to;
+    }
+    return chain;
+}
+
+// Bring the cached files to version, if it's the version of the newest manifest
+function syncTo(version) {
+    if (!syncs.has(version)) {
+        const sync = (async () => {
+            const cached = await dbGet(META, 'version');
+            if (cached === version) return;
+            const text = await dbGet(META, 'manifest');
+            const manifest = text ? JSON.parse(text) : null;
+            if (!manifest || manifest.version !== version) return; // an older page; leave the cache alone
+            const chain = cached ? deltaChain(manifest.deltas || [], cached, version) : null;
+            if (chain) {
+                for (const step of chain) {
+                    const response = await fetch(dataUrl(`deltas/${step.file}`));
+                    if (!response.ok) throw new Error(`deltas/${step.file}: HTTP ${response.status}`);
+                    await applyDelta(await response.json());
+                }
+            } else {
+                await dbClear(FILES); // too far behind: start over, file by file
+            }
+            await dbPut(META, 'version', version);
+        })();
+        syncs.set(version, sync);
+        sync.catch(() => syncs.delete(version)); // retry on the next request
+    }
+    return syncs.get(version);
+}
+
+async function applyDelta(delta) {
+    for (const [path, change] of Object.entries(delta.files)) {
+        const text = await dbGet(FILES, path);
+        if (text === undefined) continue; // never fetched, nothing to patch
+        const data = JSON.parse(text);
+        patchProducts(data, change);
+        if (change.order) {
+            const position = new Map(change.order.map((name, i) => [name, i]));
+            data.products.sort((a, b) => position.get(a.name) - position.get(b.name));
+        } else if (path.startsWith('shards/')) {
+            sortShard(data);
+        }
+        await dbPut(FILES, path, JSON.stringify(data));
+    }
+    for (const path of [...delta.refetch, ...delta.removed]) {
+        await dbDelete(FILES, path);
+    }
+}
+
+function patchProducts(data, change) {
+    const products = new Map(data.products.map(p => [p.name, p]));
+    change.remove.forEach(name => products.delete(name));
+    change.upsert.forEach(p => products.set(p.name, p)); // changed products keep their place
+    data.products = [...products.values()];
+}
+
+// Shards list products by name, with indexes pre-sorted per sort key as sort_orders() does
+function sortShard(data) {
+    const byName = (a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : 0);
+    data.products.sort(byName);
+    const value = (p, key) => (p[key] > 0 ? p[key] : Infinity);
+    Object.keys(data.order || {}).forEach(key => {
+        data.order[key] = data.products.map((_, i) => i).sort((i, j) =>
+            value(data.products[i], key) - value(data.products[j], key) || byName(data.products[i], data.products[j]));
+    });
+}